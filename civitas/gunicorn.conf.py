@@ -62,7 +62,15 @@ def post_fork(server, worker):
 
 def post_worker_init(worker):
     """Ejecutado después de inicializar el worker"""
-    pass
+    # Arrancar los renderers PDF del worker antes de la primera petición
+    from portaldu.desUr.pdf_pool import get_render_pool
+    pool = get_render_pool()
+    if pool is not None:
+        pool.warm()
+
+    # Índice espacial de geocodificación inversa
+    from portaldu.desUr.spatial_index import warm
+    warm()
 
 def on_exit(server):
     """Ejecutado al salir"""
@@ -70,6 +78,10 @@ def on_exit(server):
 
 def worker_exit(server, worker):
     """Ejecutado cuando un worker sale"""
+    from portaldu.desUr.http_pool import close_all
+    from portaldu.desUr.pdf_pool import shutdown_render_pool
+    shutdown_render_pool()
+    close_all()
     server.log.info(f"Worker {worker.pid} saliendo")
 
 # Pre-fork
@@ -15,6 +15,7 @@ import locale
 import sentry_sdk
 from sentry_sdk.integrations.django import DjangoIntegration
 from sentry_sdk.integrations.celery import CeleryIntegration
+from celery.schedules import crontab
 
 
 from django.conf.global_settings import AUTH_USER_MODEL, EMAIL_BACKEND, DEFAULT_FROM_EMAIL, AUTHENTICATION_BACKENDS, \
@@ -244,7 +245,20 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Estado compartido entre workers web y Celery (circuit breakers de GIS).
+    # Si Redis no responde se ignora el error y cada consulta sale normal.
+    'shared': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 0.2,
+            'SOCKET_TIMEOUT': 0.2,
+            'IGNORE_EXCEPTIONS': True,
+        },
+        'KEY_PREFIX': 'civitas',
+    },
 }
 
 # Session engine con Redis
@@ -271,6 +285,30 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'portaldu.desUr.tasks.cleanup_old_logs',
         'schedule': 86400.0,  # Cada 24 horas
     },
+    'purge-geocode-cache': {
+        'task': 'portaldu.desUr.tasks.purge_geocode_cache',
+        'schedule': 86400.0,  # Cada 24 horas
+    },
+    'rebuild-spatial-index': {
+        'task': 'portaldu.desUr.tasks.rebuild_spatial_index',
+        'schedule': 86400.0,  # Cada 24 horas
+    },
+    'sync-address-catalog': {
+        'task': 'portaldu.desUr.tasks.sync_address_catalog',
+        'schedule': crontab(hour=3, minute=0),  # Cada noche a las 3:00
+    },
+    'sync-colonias': {
+        'task': 'portaldu.desUr.tasks.sync_colonias',
+        'schedule': float(os.getenv('COLONIAS_REFRESH_INTERVAL', 6 * 3600)),  # Cada 6 horas
+    },
+    'warm-street-cache': {
+        'task': 'portaldu.desUr.tasks.warm_street_cache',
+        'schedule': 1800.0,  # Cada 30 minutos
+    },
+    'probe-geocoding-providers': {
+        'task': 'portaldu.desUr.tasks.probe_geocoding_providers',
+        'schedule': float(os.getenv('GIS_PROBE_INTERVAL', 60)),  # Cada minuto
+    },
 }
 
 # Internationalization
@@ -309,6 +347,89 @@ STATIC_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Generación de PDF: host interno contra el que se resuelven /static/ y /media/.
+# Los recursos se leen de disco; cualquier URL externa se bloquea en el render.
+PDF_BASE_URL = os.getenv('PDF_BASE_URL', 'http://civitas.local/')
+
+# Caché de PDFs renderizados (media/pdf_cache/). Se desalojan las entradas menos
+# usadas al superar cualquiera de los dos límites. Cambiar la versión invalida todo.
+PDF_CACHE_MAX_ENTRIES = int(os.getenv('PDF_CACHE_MAX_ENTRIES', 500))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+PDF_TEMPLATE_VERSION = os.getenv('PDF_TEMPLATE_VERSION', '1')
+
+# Pool de procesos renderer de PDF por worker web (0 = renderizar en el worker).
+# Cada proceso tiene tiempo límite por documento y techo de memoria virtual.
+PDF_RENDER_POOL_SIZE = int(os.getenv('PDF_RENDER_POOL_SIZE', 1))
+PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', 60))
+PDF_RENDER_MEMORY_MB = int(os.getenv('PDF_RENDER_MEMORY_MB', 1024))
+PDF_RENDER_MAX_JOBS = int(os.getenv('PDF_RENDER_MAX_JOBS', 100))
+
+# Entrega protegida de documentos: prefijo de la location interna de nginx
+# (X-Accel-Redirect). Vacío = Django transmite el archivo (desarrollo).
+PROTECTED_MEDIA_ACCEL_PREFIX = os.getenv('PROTECTED_MEDIA_ACCEL_PREFIX', '')
+
+# Folios: números que cada worker reserva de FolioCounter por consulta.
+FOLIO_BLOCK_SIZE = int(os.getenv('FOLIO_BLOCK_SIZE', 20))
+
+# Caché de geocodificación (LRU por proceso + tabla geocode_cache).
+# TTL en segundos; los "no encontrado" usan el TTL negativo, más corto.
+GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600))
+GEOCODE_CACHE_NEGATIVE_TTL = int(os.getenv('GEOCODE_CACHE_NEGATIVE_TTL', 3600))
+GEOCODE_CACHE_LRU_SIZE = int(os.getenv('GEOCODE_CACHE_LRU_SIZE', 2048))
+GEOCODE_REVERSE_PRECISION = int(os.getenv('GEOCODE_REVERSE_PRECISION', 4))
+
+# Sesiones HTTP keep-alive hacia ArcGIS/Nominatim: conexiones por proveedor
+# en cada proceso y reintentos ante error de conexión o 502/503/504.
+GIS_HTTP_POOL_SIZE = int(os.getenv('GIS_HTTP_POOL_SIZE', 10))
+GIS_HTTP_RETRIES = int(os.getenv('GIS_HTTP_RETRIES', 1))
+
+# Geocodificación concurrente: plazo total por búsqueda (s), escalón entre
+# consultas de respaldo a OSM (s), score para aceptar sin esperar y hilos.
+GEOCODE_DEADLINE = float(os.getenv('GEOCODE_DEADLINE', 4.0))
+GEOCODE_HEDGE_DELAY = float(os.getenv('GEOCODE_HEDGE_DELAY', 0.4))
+GEOCODE_ACCEPT_SCORE = int(os.getenv('GEOCODE_ACCEPT_SCORE', 80))
+GEOCODE_MAX_WORKERS = int(os.getenv('GEOCODE_MAX_WORKERS', 8))
+
+# Circuit breakers de ArcGIS/Nominatim: fallas consecutivas para dejar de
+# consultar al proveedor y segundos antes de volver a intentarlo.
+GIS_BREAKER_FAILURES = int(os.getenv('GIS_BREAKER_FAILURES', 3))
+GIS_BREAKER_RECOVERY = int(os.getenv('GIS_BREAKER_RECOVERY', 30))
+
+# Nominatim: consultas por segundo para toda la instalación (política de uso),
+# espera máxima por turno (s) y vigencia de sus respuestas en caché (s).
+NOMINATIM_RATE = float(os.getenv('NOMINATIM_RATE', 1.0))
+NOMINATIM_MAX_WAIT = float(os.getenv('NOMINATIM_MAX_WAIT', 1.5))
+NOMINATIM_CACHE_TTL = int(os.getenv('NOMINATIM_CACHE_TTL', 24 * 3600))
+
+# Índice espacial para geocodificación inversa local: archivo .npz generado
+# por la tarea rebuild_spatial_index y distancia máxima (m) al domicilio.
+SPATIAL_INDEX_PATH = os.getenv('SPATIAL_INDEX_PATH', os.path.join(BASE_DIR, 'data', 'spatial_index.npz'))
+SPATIAL_INDEX_MAX_DISTANCE = float(os.getenv('SPATIAL_INDEX_MAX_DISTANCE', 25))
+
+# Sugerencias de direcciones no encontradas: segundos entre actualizaciones
+# incrementales del índice y similitud mínima (0-1) para sugerir.
+SUGGESTIONS_REFRESH_INTERVAL = int(os.getenv('SUGGESTIONS_REFRESH_INTERVAL', 300))
+SUGGESTIONS_MIN_SCORE = float(os.getenv('SUGGESTIONS_MIN_SCORE', 0.45))
+
+# Caché de calles por colonia (WsDomicilios): antigüedad (s) sin actualizar,
+# antigüedad máxima servida mientras se actualiza, colonias por proceso y
+# colonias más usadas que se precargan.
+STREET_CACHE_FRESH_TTL = int(os.getenv('STREET_CACHE_FRESH_TTL', 3600))
+STREET_CACHE_STALE_TTL = int(os.getenv('STREET_CACHE_STALE_TTL', 7 * 24 * 3600))
+STREET_CACHE_SIZE = int(os.getenv('STREET_CACHE_SIZE', 256))
+STREET_CACHE_WARM_COLONIAS = int(os.getenv('STREET_CACHE_WARM_COLONIAS', 100))
+
+# Sincronización nocturna del catálogo de domicilios: colonias consultadas
+# a la vez y consultas por segundo máximas a WsDomicilios.
+CATALOG_SYNC_CONCURRENCY = int(os.getenv('CATALOG_SYNC_CONCURRENCY', 4))
+CATALOG_SYNC_RATE = float(os.getenv('CATALOG_SYNC_RATE', 5.0))
+
+# Consultas idénticas simultáneas a WsDomicilios / geocodificación: espera
+# máxima (s) por la consulta en curso y vigencia (s) del resultado compartido
+# entre workers.
+SINGLEFLIGHT_WAIT = float(os.getenv('SINGLEFLIGHT_WAIT', 20))
+SINGLEFLIGHT_RESULT_TTL = int(os.getenv('SINGLEFLIGHT_RESULT_TTL', 10))
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
     'portaldu.desUr.auth.DesUrAuthBackend',
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.db.models import AutoField
+from django.urls import reverse
 
 
 class CustomUser(BaseUserManager):
@@ -152,6 +153,17 @@ class Users(AbstractUser, PermissionsMixin):
         """
         return dict(self.ROLE_CHOICES).get(self.rol, 'Sin rol')
 
+    @property
+    def foto_avatar_url(self):
+        """
+        URL de la versión reducida de la foto de perfil
+
+        Returns:
+            str: URL del derivado 'avatar' (se genera la primera vez) o None
+        """
+        from portaldu.desUr.images import get_rendition_url
+        return get_rendition_url(self.foto, 'avatar')
+
     def can_create_user_type(self, target_is_staff, target_is_superuser):
         """
         Valida si el usuario actual puede crear un usuario del tipo especificado
@@ -485,6 +497,12 @@ class Seguimiento(models.Model):
     def __str__(self):
         return f"Seguimiento {self.seguimiento_ID} - {self.solicitud_FK.nomSolicitud}"
 
+    def get_documento_url(self):
+        """URL protegida del documento de evidencia (valida sesión y permisos)"""
+        if not self.documento:
+            return ''
+        return reverse('seguimiento_documento', args=[self.seguimiento_ID])
+
 class Close(models.Model):
     """
     Modelo para registrar el cierre formal de solicitudes.
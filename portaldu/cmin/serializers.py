@@ -48,9 +48,12 @@ class SolicitudSerializer(serializers.ModelSerializer):
         ]
 
     def get_archivo_generado(self, obj):
-        if obj.doc_FK and obj.doc_FK.nomDoc:
-            return f"/media/documents/{obj.doc_FK.nomDoc}"
-        return None
+        # URL protegida (file_download); /media/documents/ ya no se sirve directo
+        url = obj.doc_FK.get_download_url() if obj.doc_FK else ''
+        if not url:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
 
 
 class OfflineSerializer(serializers.ModelSerializer):
@@ -54,6 +54,14 @@ urlpatterns = [
     # Vista: tables() - Muestra solicitudes pendientes y enviadas con filtros
     path('tables/', view.tables, name='tablas'),
 
+    # Impresión por lotes (requiere rol administrador/delegado)
+    # Vista: print_run() - Une en un PDF los documentos seleccionados o de un rango de fechas
+    path('tables/imprimir/', view.print_run, name='print_run'),
+
+    # Expediente completo de una solicitud (requiere rol administrador/delegado)
+    # Vista: expediente() - Portada del trámite más adjuntos en un solo PDF
+    path('tables/expediente/<int:solicitud_id>/', view.expediente, name='expediente'),
+
     # Guardar solicitud pendiente para procesamiento
     # Vista: save_request() - Convierte documento en solicitud pendiente
     path('save/', view.save_request, name='saveSoli'),
@@ -68,6 +76,10 @@ urlpatterns = [
     # Vista: seguimiento() - Monitoreo completo con filtros, estadísticas y gestión de estados
     path('seguimiento/', view.seguimiento, name='seguimiento'),
 
+    # Documento de evidencia de un seguimiento (descarga protegida)
+    # Vista: seguimiento_documento() - Valida permisos y envía el archivo con soporte de Range
+    path('seguimiento/documento/<int:seguimiento_id>/', view.seguimiento_documento, name='seguimiento_documento'),
+
     # Menú principal del sistema (post-login)
     # Vista: menu() - Dashboard principal con opciones según rol del usuario
     path('menu/', view.menu, name='menu'),
@@ -25,12 +25,16 @@ from django.shortcuts import render
 from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, FileResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.template.autoreload import template_changed
 from django.urls import reverse
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from portaldu.desUr.models import Files, soli, data
+from portaldu.desUr.print_run import PrintRunError, resolve_solicitudes, build_print_run
+from portaldu.desUr.expediente import ExpedienteError, get_expediente
+from portaldu.desUr.file_delivery import serve_file
 from django.contrib import messages
 from django.core.mail import EmailMessage
 import os
@@ -359,6 +363,91 @@ def tables(request):
 
     return render(request, 'tables.html', context)
 
+@login_required
+@role_required(['administrador', 'delegado'])
+@require_POST
+def print_run(request):
+    """
+    Vista para imprimir varias solicitudes en un solo PDF.
+    Acceso restringido a administradores y delegados.
+
+    Args:
+        request (HttpRequest): POST con cualquiera de:
+            - files: IDs de documentos (Files) seleccionados en tables
+            - solicitudes: IDs de solicitudes (soli)
+            - fecha_inicio / fecha_fin: Rango de fechas (YYYY-MM-DD)
+
+    Returns:
+        FileResponse: PDF unido enviado en streaming desde un archivo temporal
+        HttpResponseRedirect: A tables con mensaje si el lote no es válido
+
+    Funcionalidad:
+        - Reutiliza el finalDoc guardado de cada solicitud
+        - Renderiza en paralelo solo las solicitudes sin documento
+        - Une todas las páginas en el orden de fecha de la solicitud
+    """
+    try:
+        file_ids = [int(i) for i in request.POST.getlist('files')]
+        soli_ids = [int(i) for i in request.POST.getlist('solicitudes')]
+        fecha_inicio = request.POST.get('fecha_inicio') or None
+        fecha_fin = request.POST.get('fecha_fin') or None
+        if fecha_inicio:
+            fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+        if fecha_fin:
+            fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, "Parámetros de impresión inválidos.")
+        return redirect('tablas')
+
+    try:
+        solicitudes = resolve_solicitudes(file_ids, soli_ids, fecha_inicio, fecha_fin)
+        output = build_print_run(solicitudes)
+    except PrintRunError as e:
+        messages.error(request, str(e))
+        return redirect('tablas')
+    except Exception as e:
+        logger.error(f"Error en impresión por lotes: {str(e)}")
+        messages.error(request, "Error al generar el documento de impresión.")
+        return redirect('tablas')
+
+    logger.info(f"Impresión por lotes de {len(solicitudes)} solicitudes por {request.user.username}")
+    filename = f"impresion_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
+    return FileResponse(output, content_type='application/pdf', filename=filename)
+
+@login_required
+@role_required(['administrador', 'delegado'])
+def expediente(request, solicitud_id):
+    """
+    Vista para descargar el expediente completo de una solicitud.
+    Acceso restringido a administradores y delegados.
+
+    Args:
+        request (HttpRequest): Objeto de solicitud HTTP
+        solicitud_id (int): ID de la solicitud (soli)
+
+    Returns:
+        FileResponse: PDF con la portada del trámite y todos sus adjuntos
+        HttpResponseRedirect: A tables con mensaje si no se pudo armar
+
+    Funcionalidad:
+        - Arma el expediente la primera vez
+        - Si hay adjuntos nuevos solo anexa sus páginas (actualización incremental)
+    """
+    solicitud = get_object_or_404(soli.objects.select_related('data_ID__fuuid'), soli_ID=solicitud_id)
+
+    try:
+        exp = get_expediente(solicitud)
+    except ExpedienteError as e:
+        messages.error(request, str(e))
+        return redirect('tablas')
+    except Exception as e:
+        logger.error(f"Error al armar expediente {solicitud_id}: {str(e)}")
+        messages.error(request, "Error al generar el expediente.")
+        return redirect('tablas')
+
+    filename = f"expediente_{solicitud.folio or solicitud.soli_ID}.pdf".replace('/', '-')
+    return FileResponse(exp.archivo.open('rb'), content_type='application/pdf', filename=filename)
+
 @login_required
 @role_required(['administrador', 'delegado'])
 def save_request(request): #saveSoli
@@ -710,6 +799,30 @@ def sendMail(request):
     return redirect('tablas')
 
 
+@login_required
+def seguimiento_documento(request, seguimiento_id):
+    """
+    Vista para entregar el documento de evidencia de un seguimiento.
+
+    Args:
+        request (HttpRequest): Objeto de solicitud HTTP
+        seguimiento_id (int): ID del seguimiento
+
+    Returns:
+        HttpResponse: Archivo en streaming (ETag, 304, Range) o X-Accel-Redirect
+
+    Permisos:
+        - Usuarios con acceso a CMIN
+        - Usuario asignado a la solicitud del seguimiento
+    """
+    seg = get_object_or_404(Seguimiento.objects.select_related('solicitud_FK'), seguimiento_ID=seguimiento_id)
+
+    if not (request.user.has_cmin_access() or seg.solicitud_FK.usuario_asignado_id == request.user.pk):
+        return HttpResponse("No autorizado", status=403)
+
+    return serve_file(request, seg.documento, filename=seg.nomSeg or None)
+
+
 def seguimiento_docs(request, solicitud_id):
     """
     Vista para subir documentos de seguimiento a solicitudes.
@@ -7,6 +7,8 @@ from requests.exceptions import (
     RequestException
 )
 import json
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 import logging
@@ -24,10 +26,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Vigencia supuesta del token si el servicio no la informa (segundos)
+DEFAULT_TOKEN_TTL = 30 * 60
+# Renovar el token este tiempo antes de que venza (segundos)
+TOKEN_REFRESH_MARGIN = 120
+# Tras caer a modo simulación por un error, reintentar el servicio real (segundos)
+MOCK_RETRY_INTERVAL = 60
+
+VIGENCIA_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%d/%m/%Y %H:%M:%S',
+)
+
+
+def parse_vigencia(vigencia) -> Optional[float]:
+    """Vigencia del token como epoch, o None si no se reconoce el formato"""
+    if not vigencia or not isinstance(vigencia, str):
+        return None
+    value = vigencia.strip().rstrip('Z')
+    for fmt in VIGENCIA_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
 
 class WsDomicilios:
     """
     Consumir domicilios a través de servicios web.
+
+    Una instancia puede vivir todo el proceso: conserva el token hasta su
+    vigencia; ensure_token() lo renueva antes de que venza y las peticiones
+    que reciben 401 se reautentican una vez.
+
+    El token se comparte entre hilos, la sesión HTTP no: el saludo NTLM
+    guarda estado en la conexión y en el objeto de autenticación, así que
+    cada hilo (gthread, street-cache, sincronización del catálogo) usa su
+    propia sesión autenticada.
     """
 
     def __init__(
@@ -35,35 +73,59 @@ class WsDomicilios:
             base_url: str = "https://wsdomicilios.mpiochih.gob.mx/WSDomicilios",
             mock_mode: bool = False,
             windows_user: str = None,
-            windows_password: str = None
+            windows_password: str = None,
+            mock_fallback: bool = True
     ):
         self.base_url = base_url
         self.token = None
         self.token_vigencia = None
-        self.session = requests.Session()
+        self.token_expires_at = None
+        self._local = threading.local()
         self.windows_user = windows_user
         self.windows_password = windows_password
         self.mock_mode = mock_mode  #
+        # Momento en que se activó el modo simulación por un error (None = configurado)
+        self.mock_fallback_at = None
+        # False para procesos que no deben recibir datos simulados (sincronización del catálogo)
+        self.mock_fallback = mock_fallback
+        self._token_lock = threading.Lock()
 
-        # Configurar autenticación de Windows si hay credenciales
         if windows_user and windows_password:
+            if HttpNtlmAuth:
+                logger.info(f"Autenticación NTLM configurada para: {windows_user}")
+            else:
+                logger.warning("requests-ntlm no instalado. Usando Basic Auth")
+
+        logger.info(f"Cliente inicializado - URL: {self.base_url}, Mock: {self.mock_mode}")
+
+    @property
+    def session(self) -> requests.Session:
+        """Sesión HTTP del hilo actual; se crea al primer uso"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    def _new_session(self) -> requests.Session:
+        """Sesión con autenticación de Windows propia (el estado NTLM no se comparte)"""
+        session = requests.Session()
+
+        # Configurar autenticación de Windows si hay credenciales
+        if self.windows_user and self.windows_password:
             if HttpNtlmAuth:
                 try:
-                    self.session.auth = HttpNtlmAuth(windows_user, windows_password)
-                    logger.info(f"Autenticación NTLM configurada para: {windows_user}")
+                    session.auth = HttpNtlmAuth(self.windows_user, self.windows_password)
                 except Exception as e:
                     logger.warning(f"️ Error configurando NTLM: {e}")
-                    self.session.auth = HTTPBasicAuth(windows_user, windows_password)
+                    session.auth = HTTPBasicAuth(self.windows_user, self.windows_password)
             else:
-                logger.warning("requests-ntlm no instalado. Usando Basic Auth")
-                self.session.auth = HTTPBasicAuth(windows_user, windows_password)
+                session.auth = HTTPBasicAuth(self.windows_user, self.windows_password)
 
-        self.session.headers.update({
+        session.headers.update({
             'User-Agent': 'WsDomicilios-Client/1.0',
             'Content-Type': 'application/json'
         })
-
-        logger.info(f"Cliente inicializado - URL: {self.base_url}, Mock: {self.mock_mode}")
+        return session
 
     def get_token(self, usuario: str = None, password: str = None) -> bool:
         """
@@ -119,6 +181,8 @@ class WsDomicilios:
                 self.token = response.text.strip()
                 self.token_vigencia = "N/A"
 
+            self.token_expires_at = parse_vigencia(self.token_vigencia) or time.time() + DEFAULT_TOKEN_TTL
+            self.mock_fallback_at = None
             logger.info(f"Token obtenido exitosamente. Vigencia: {self.token_vigencia}")
             logger.debug(
                 f"Token: {self.token[:20]}..." if self.token and len(self.token) > 20 else f"Token: {self.token}")
@@ -157,6 +221,12 @@ class WsDomicilios:
 
     def _activate_mock_mode(self) -> bool:
         """ Activa el modo mock automáticamente"""
+        if not self.mock_fallback:
+            logger.error("Sin acceso a WsDomicilios y el modo simulación está deshabilitado")
+            self.token = None
+            self.token_expires_at = None
+            return False
+
         logger.info("=" * 60)
         logger.info("MODO SIMULACIÓN ACTIVADO AUTOMÁTICAMENTE")
         logger.info("Razón: No hay acceso al servicio web real")
@@ -165,10 +235,46 @@ class WsDomicilios:
         logger.info("=" * 60)
 
         self.mock_mode = True
+        self.mock_fallback_at = time.time()
         self.token = "mock_token_auto_fallback_12345"
         self.token_vigencia = "2025-12-31 23:59:59"
         return True
 
+    def token_valid(self) -> bool:
+        """¿Hay token y falta más de TOKEN_REFRESH_MARGIN para que venza?"""
+        if not self.token:
+            return False
+        if self.mock_mode:
+            # La simulación por error se abandona pasado MOCK_RETRY_INTERVAL
+            return self.mock_fallback_at is None or time.time() - self.mock_fallback_at < MOCK_RETRY_INTERVAL
+        return self.token_expires_at is not None and time.time() < self.token_expires_at - TOKEN_REFRESH_MARGIN
+
+    def ensure_token(self) -> bool:
+        """
+        Obtiene token solo si no hay uno vigente
+
+        Los hilos del worker comparten el cliente: uno renueva el token y
+        los demás reutilizan el resultado
+        """
+        if self.token_valid():
+            return True
+
+        with self._token_lock:
+            if self.token_valid():
+                return True
+            if self.mock_fallback_at is not None:
+                logger.info("Reintentando servicio real de domicilios tras modo simulación")
+                self.mock_mode = False
+                self.mock_fallback_at = None
+            return self.get_token(self.windows_user, self.windows_password)
+
+    def invalidate_token(self, token: str = None):
+        """Descarta el token (solo si sigue siendo token, cuando se indica)"""
+        with self._token_lock:
+            if token is None or self.token == token:
+                self.token = None
+                self.token_expires_at = None
+
     def get_headers(self) -> Dict[str, str]:
         """Obtención de headers con autenticación"""
         if not self.token:
@@ -182,7 +288,7 @@ class WsDomicilios:
     def _make_authenticated_request(self, method: str, url: str, **kwargs) -> Optional[requests.Response]:
         """Realiza una petición autenticada con manejo de errores"""
 
-        if not self.token:
+        if not self.ensure_token():
             logger.error("No hay token disponible")
             return None
 
@@ -190,27 +296,57 @@ class WsDomicilios:
         if self.mock_mode:
             return self._mock_response(url, **kwargs)
 
-        try:
-            headers = kwargs.pop('headers', {})
-            headers.update(self.get_headers())
-
-            response = self.session.request(
-                method=method,
-                url=url,
-                headers=headers,
-                timeout=15,
-                **kwargs
-            )
+        # Las consultas idénticas simultáneas (de este y otros workers) comparten una sola petición
+        from .singleflight import do
+        key = f"wsd:{method} {url} {json.dumps(kwargs, sort_keys=True, default=str)}"
+        return do(key, lambda: self._send_request(method, url, **kwargs), shared=True)
 
-            logger.debug(f"{method} {url} - Status: {response.status_code}")
+    def _send_request(self, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+        """Envía la petición con el token vigente; reautentica una vez si es rechazado"""
+        try:
+            extra_headers = kwargs.pop('headers', {})
+            for attempt in range(2):
+                token = self.token
+                headers = dict(extra_headers, **self.get_headers())
+
+                response = self.session.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    timeout=15,
+                    **kwargs
+                )
+
+                logger.debug(f"{method} {url} - Status: {response.status_code}")
+
+                # Token vencido o revocado antes de su vigencia: reautenticar una vez
+                if response.status_code != 401 or attempt:
+                    break
+                logger.info("Token rechazado (401), reautenticando")
+                self.invalidate_token(token)
+                if not self.ensure_token() or self.mock_mode:
+                    return None
 
             response.raise_for_status()
-            return response
+            return self._detach(response)
 
         except RequestException as e:
             logger.error(f"Error en petición {method} {url}: {e}")
             return None
 
+    @staticmethod
+    def _detach(response: requests.Response) -> requests.Response:
+        """Copia de la respuesta sin la petición original (lleva el token) para compartirla"""
+        detached = requests.Response()
+        detached.status_code = response.status_code
+        detached._content = response.content
+        detached.headers = response.headers
+        detached.url = response.url
+        detached.encoding = response.encoding
+        detached.reason = response.reason
+        detached.elapsed = response.elapsed
+        return detached
+
     def _mock_response(self, url: str, **kwargs) -> requests.Response:
         """Genera respuestas simuladas para desarrollo"""
 
@@ -278,7 +414,12 @@ class WsDomicilios:
             return None
 
     def get_calles(self, id_colonias: int) -> Optional[List[Dict[str, Any]]]:
-        """Obtiene las calles de las colonias específicas"""
+        """Obtiene las calles de las colonias específicas (con caché compartida)"""
+        from .street_cache import get_calles
+        return get_calles(self, id_colonias)
+
+    def fetch_calles(self, id_colonias: int) -> Optional[List[Dict[str, Any]]]:
+        """Consulta las calles de una colonia directamente al servicio"""
         url = f"{self.base_url}/GetCalles"
         payload = {"id_colonia": id_colonias}
         logger.debug(f"Obteniendo calles para colonia {id_colonias}")
@@ -0,0 +1,349 @@
+"""
+Sincronización del catálogo municipal de domicilios
+Copia colonias, calles y números exteriores con coordenadas de WsDomicilios
+a las tablas locales que usa local_geocoder y que consultan las vistas de
+captura de domicilios. Se ejecuta cada noche (tarea sync_address_catalog)
+o con el comando del mismo nombre
+
+Las colonias se recorren en paralelo con SYNC_CONCURRENCY hilos y el límite
+de consultas por segundo de rate_limit ('wsdomicilios'). Cada respuesta se
+compara con lo guardado: solo se insertan, actualizan o eliminan las filas
+que cambiaron. Cada corrida queda registrada en CatalogSync
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import street_cache
+from .local_geocoder import bump_version, normalize
+from .models import Calle, CatalogSync, Colonia, NumeroExterior
+from .rate_limit import get_limiter
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Colonias consultadas a la vez durante la sincronización
+SYNC_CONCURRENCY = getattr(settings, 'CATALOG_SYNC_CONCURRENCY', 4)
+
+
+class CatalogSyncError(Exception):
+    """No se pudo sincronizar (sin token, servicio en modo simulación, etc.)"""
+    pass
+
+
+def _float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def get_client():
+    """
+    Cliente de WsDomicilios autenticado y sin modo simulación
+
+    Es un cliente propio, no el de las vistas: si el token no se puede
+    renovar a mitad del recorrido las consultas fallan en lugar de devolver
+    datos simulados que se copiarían al catálogo
+    """
+    from .WSDService import WsDomicilios
+    from .WsConfig import WSDConfig
+
+    config = WSDConfig()
+    client = WsDomicilios(
+        base_url=config.BASE_URL,
+        windows_user=config.WINDOWS_USER,
+        windows_password=config.WINDOWS_PASSWORD,
+        mock_fallback=False,
+    )
+    if not client.ensure_token():
+        raise CatalogSyncError("No se pudo obtener token de WsDomicilios")
+    _check_client(client)
+    return client
+
+
+def _check_client(client):
+    """Detiene la sincronización si el cliente cambió a datos simulados"""
+    if client.mock_mode:
+        raise CatalogSyncError("WsDomicilios en modo simulación, no se sincroniza")
+
+
+def _diff(existing, incoming):
+    """
+    Compara filas guardadas contra las del servicio
+
+    Args:
+        existing: clave -> (pk, valores) de la tabla local
+        incoming: clave -> valores del servicio
+
+    Returns:
+        tuple: (claves nuevas, [(pk, clave)] con valores distintos,
+        pks que ya no están en el servicio, filas sin cambios)
+    """
+    new, changed, unchanged = [], [], 0
+    for key, values in incoming.items():
+        current = existing.get(key)
+        if current is None:
+            new.append(key)
+        elif current[1] != values:
+            changed.append((current[0], key))
+        else:
+            unchanged += 1
+    stale = [pk for key, (pk, _) in existing.items() if key not in incoming]
+    return new, changed, stale, unchanged
+
+
+def _count(stats, table, new, changed, deleted, unchanged):
+    counts = stats.setdefault(table, {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+    counts['created'] += len(new)
+    counts['updated'] += len(changed)
+    counts['deleted'] += deleted
+    counts['unchanged'] += unchanged
+
+
+def save_colonias(colonias, stats=None):
+    """
+    Guarda las colonias de GetColonias que cambiaron (no elimina ninguna)
+
+    Returns:
+        list: Colonias del servicio, sin ids repetidos
+    """
+    incoming = {
+        c['id_colonia']: (c['colonia'], str(c.get('cp') or '')[:5])
+        for c in colonias if c.get('id_colonia') is not None
+    }
+    existing = {
+        pk: (pk, (nombre, cp))
+        for pk, nombre, cp in Colonia.objects.filter(pk__in=list(incoming)).values_list('pk', 'nombre', 'cp')
+    }
+    new, changed, _, unchanged = _diff(existing, incoming)
+
+    def build(id_colonia):
+        nombre, cp = incoming[id_colonia]
+        return Colonia(id_colonia=id_colonia, nombre=nombre, nombre_norm=normalize(nombre), cp=cp)
+
+    with transaction.atomic():
+        Colonia.objects.bulk_create([build(key) for key in new], batch_size=BATCH_SIZE)
+        Colonia.objects.bulk_update([build(key) for _, key in changed], ['nombre', 'nombre_norm', 'cp'],
+                                    batch_size=BATCH_SIZE)
+
+    if stats is not None:
+        _count(stats, 'colonias', new, changed, 0, unchanged)
+    return [{'id_colonia': key, 'colonia': nombre, 'cp': cp} for key, (nombre, cp) in incoming.items()]
+
+
+def sync_colonias(client=None):
+    """
+    Actualiza solo el catálogo de colonias (una consulta a GetColonias)
+
+    Returns:
+        int: Colonias en el servicio
+
+    Raises:
+        CatalogSyncError: Si el servicio no está disponible
+    """
+    client = client or get_client()
+    colonias = client.get_colonias()
+    if colonias is None:
+        raise CatalogSyncError("WsDomicilios no devolvió colonias")
+    saved = save_colonias(colonias)
+    bump_version()
+    return len(saved)
+
+
+def _fetch_colonia(client, id_colonia, with_numbers):
+    """
+    Consulta calles y números de una colonia (se ejecuta en un hilo del pool)
+
+    Returns:
+        tuple: (calles o None, id_calle -> números o None, consultas hechas)
+    """
+    limiter = get_limiter('wsdomicilios')
+    limiter.acquire()
+    calles = street_cache.refresh(client, id_colonia)
+    _check_client(client)
+    numeros = {}
+    requests = 1
+
+    if calles and with_numbers:
+        for calle in calles:
+            id_calle = calle.get('id_calle')
+            if id_calle is None:
+                continue
+            limiter.acquire()
+            numeros[id_calle] = client.get_ext_num(id_colonia, id_calle)
+            _check_client(client)
+            requests += 1
+    return calles, numeros, requests
+
+
+def _save_calles(id_colonia, calles, stats):
+    """Aplica las diferencias de calles de una colonia; devuelve id_calle -> pk"""
+    incoming = {c['id_calle']: (c['calle'],) for c in calles if c.get('id_calle') is not None}
+    existing = {
+        id_calle: (pk, (nombre,))
+        for pk, id_calle, nombre in Calle.objects.filter(colonia_id=id_colonia).values_list('pk', 'id_calle', 'nombre')
+    }
+    new, changed, stale, unchanged = _diff(existing, incoming)
+
+    Calle.objects.bulk_create(
+        [Calle(colonia_id=id_colonia, id_calle=key, nombre=incoming[key][0], nombre_norm=normalize(incoming[key][0]))
+         for key in new],
+        batch_size=BATCH_SIZE,
+    )
+    Calle.objects.bulk_update(
+        [Calle(pk=pk, nombre=incoming[key][0], nombre_norm=normalize(incoming[key][0])) for pk, key in changed],
+        ['nombre', 'nombre_norm'],
+        batch_size=BATCH_SIZE,
+    )
+    # Una lista vacía puede ser una falla del servicio: no se borra nada
+    deleted = Calle.objects.filter(pk__in=stale).delete()[1].get(Calle._meta.label, 0) if incoming else 0
+
+    _count(stats, 'calles', new, changed, deleted, unchanged)
+    return dict(Calle.objects.filter(colonia_id=id_colonia).values_list('id_calle', 'pk'))
+
+
+def _save_numeros(calle_pks, numeros, stats):
+    """Aplica las diferencias de números de las calles que respondieron"""
+    incoming = {}
+    for id_calle, rows in numeros.items():
+        pk = calle_pks.get(id_calle)
+        if pk is None or not rows:
+            continue
+        for n in rows:
+            numero = str(n.get('numero') or '').strip()
+            if numero:
+                incoming[(pk, numero)] = (_float(n.get('latitud')), _float(n.get('longitud')),
+                                          str(n.get('distrito') or ''))
+
+    answered = {pk for pk, _ in incoming}
+    existing = {
+        (calle_id, numero): (pk, (lat, lng, distrito))
+        for pk, calle_id, numero, lat, lng, distrito in NumeroExterior.objects.filter(
+            calle_id__in=answered).values_list('pk', 'calle_id', 'numero', 'lat', 'lng', 'distrito')
+    }
+    new, changed, stale, unchanged = _diff(existing, incoming)
+
+    def build(key, pk=None):
+        lat, lng, distrito = incoming[key]
+        return NumeroExterior(pk=pk, calle_id=key[0], numero=key[1], lat=lat, lng=lng, distrito=distrito)
+
+    NumeroExterior.objects.bulk_create([build(key) for key in new], batch_size=BATCH_SIZE)
+    NumeroExterior.objects.bulk_update([build(key, pk) for pk, key in changed], ['lat', 'lng', 'distrito'],
+                                       batch_size=BATCH_SIZE)
+    deleted = NumeroExterior.objects.filter(pk__in=stale).delete()[0]
+
+    _count(stats, 'numeros', new, changed, deleted, unchanged)
+
+
+def sync_catalog(client=None, colonia_ids=None, with_numbers=True, log=None):
+    """
+    Sincroniza el catálogo completo o algunas colonias
+
+    Args:
+        client: WsDomicilios autenticado (default: get_client())
+        colonia_ids: Lista de id_colonia a sincronizar (default: todas)
+        with_numbers: False para copiar solo colonias y calles
+        log: Función opcional para reportar avance (ej. stdout del comando)
+
+    Returns:
+        CatalogSync: Registro de la corrida con sus conteos
+
+    Raises:
+        CatalogSyncError: Si el servicio no está disponible
+    """
+    log = log or logger.info
+    run = CatalogSync.objects.create()
+    stats = {}
+
+    try:
+        client = client or get_client()
+        colonias = client.get_colonias()
+        run.requests += 1
+        if colonias is None:
+            raise CatalogSyncError("WsDomicilios no devolvió colonias")
+        if colonia_ids:
+            colonias = [c for c in colonias if c.get('id_colonia') in set(colonia_ids)]
+        colonias = save_colonias(colonias, stats)
+    except Exception as e:
+        run.status, run.error, run.finished_at = 'error', str(e), timezone.now()
+        run.save()
+        raise
+
+    # Los hilos solo consultan el servicio; la base de datos se escribe aquí
+    with ThreadPoolExecutor(max_workers=SYNC_CONCURRENCY, thread_name_prefix='catalog-sync') as executor:
+        futures = {
+            executor.submit(_fetch_colonia, client, c['id_colonia'], with_numbers): c['id_colonia']
+            for c in colonias
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            id_colonia = futures[future]
+            try:
+                calles, numeros, requests = future.result()
+            except CatalogSyncError as e:
+                # Datos simulados: nada de esta colonia ni de las pendientes se guarda
+                for pending in futures:
+                    pending.cancel()
+                run.stats = stats
+                run.status, run.error, run.finished_at = 'error', str(e), timezone.now()
+                run.save()
+                logger.error(f"Sincronización detenida en la colonia {id_colonia}: {str(e)}")
+                raise
+            except Exception as e:
+                calles, numeros, requests = None, {}, 0
+                logger.warning(f"Colonia {id_colonia}: {str(e)}")
+            run.requests += requests
+
+            if calles is None:
+                run.failed += 1
+            else:
+                with transaction.atomic():
+                    calle_pks = _save_calles(id_colonia, calles, stats)
+                    _save_numeros(calle_pks, numeros, stats)
+            run.colonias = i
+
+            if i % 50 == 0 or i == len(futures):
+                run.stats = stats
+                run.save(update_fields=['colonias', 'failed', 'requests', 'stats'])
+                log(f"Colonias {i}/{len(futures)}: {run.failed} fallidas, {run.requests} consultas")
+
+    run.stats = stats
+    run.status = 'partial' if run.failed else 'success'
+    run.finished_at = timezone.now()
+    run.save()
+
+    bump_version()
+    return run
+
+
+# === CONSULTAS LOCALES ===
+# Mismo formato que WsDomicilios; None si la colonia o calle no se ha sincronizado
+
+def local_calles(id_colonia, query=''):
+    """Calles de una colonia cuyo nombre contiene query (sin acentos ni mayúsculas)"""
+    calles = Calle.objects.filter(colonia_id=id_colonia)
+    if not calles.exists():
+        return None
+    norm = normalize(query)
+    if norm:
+        calles = calles.filter(nombre_norm__contains=norm)
+    return [{'id_calle': id_calle, 'calle': nombre} for id_calle, nombre in calles.values_list('id_calle', 'nombre')]
+
+
+def local_numeros(id_colonia, id_calle):
+    """Números exteriores de una calle con sus coordenadas"""
+    numeros = NumeroExterior.objects.filter(calle__colonia_id=id_colonia, calle__id_calle=id_calle)
+    numeros = [
+        {'numero': numero, 'latitud': lat, 'longitud': lng, 'distrito': distrito or None}
+        for numero, lat, lng, distrito in numeros.values_list('numero', 'lat', 'lng', 'distrito')
+    ]
+    return numeros or None
+
+
+def local_colonias_by_cp(cp):
+    """Colonias con un código postal"""
+    colonias = Colonia.objects.filter(cp=cp).values_list('id_colonia', 'nombre', 'cp')
+    return [{'id_colonia': id_colonia, 'colonia': nombre, 'cp': cp} for id_colonia, nombre, cp in colonias] or None
@@ -0,0 +1,230 @@
+"""
+Normalización y parseo de direcciones con patrones precompilados
+clean() expande abreviaturas en una sola pasada (solo como palabra
+completa: 'c.' ya no se reemplaza dentro de 'fracc.') y parse() separa
+número, calle y colonia. Ambas memorizan sus resultados: una misma
+dirección se normaliza y parsea una vez por proceso aunque la geocodificación
+la consulte varias veces
+
+La calidad y velocidad se miden con el comando benchmark_address_normalizer
+sobre el corpus data/address_corpus.json
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+# Direcciones distintas memorizadas por proceso
+CACHE_SIZE = getattr(settings, 'ADDRESS_NORMALIZER_CACHE_SIZE', 4096)
+
+ABBREVIATIONS = {
+    'av': 'avenida',
+    'ave': 'avenida',
+    'c': 'calle',
+    'col': 'colonia',
+    'fracc': 'fraccionamiento',
+    'priv': 'privada',
+    'blvd': 'boulevard',
+    'prol': 'prolongación',
+    'calz': 'calzada',
+    'carr': 'carretera',
+    'no': 'número',
+    'núm': 'número',
+}
+
+# "c.p." (antes que "c."), "av." / "fracc." como palabra completa, o "#"
+_ABBREVIATION_RE = re.compile(
+    r'(?<!\w)(c\.\s?p)\b\.?|(?<!\w)('
+    + '|'.join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True)) + r')\.|#'
+)
+_POSTAL_CODE_RE = re.compile(r'^\s*\d{5}\s*$')
+_DIGIT_RE = re.compile(r'\d')
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Palabras que anteceden al número exterior ("casa 12", "número 12")
+NUMBER_MARKERS = frozenset({'casa', 'número', 'numero', 'num', 'núm', 'no'})
+# Palabras que anteceden al código postal
+POSTAL_MARKERS = frozenset({'cp', 'codigo', 'código', 'postal'})
+# Inicio explícito de la colonia: lo que sigue es su nombre
+NEIGHBORHOOD_MARKERS = frozenset({
+    'colonia', 'col', 'fraccionamiento', 'fracc', 'residencial', 'barrio',
+})
+# Palabras que forman parte del nombre de colonias ("Quintas del Sol")
+NEIGHBORHOOD_NAMES = frozenset({'quintas', 'villas', 'jardines', 'bosques', 'lomas'})
+# Segmentos de ciudad/estado que no son colonia
+PLACE_WORDS = frozenset({'chihuahua', 'chih', 'mexico', 'méxico'})
+
+# Palabras que no forman parte del nombre de la calle
+STREET_STOP_WORDS = frozenset({
+    'calle', 'avenida', 'av', 'c', 'de', 'la', 'del', 'los', 'las',
+    'casa', 'numero', 'número', 'num', 'núm', 'chihuahua', 'cp', 'codigo',
+})
+
+RESIDENTIAL_KEYWORDS = (
+    'casa', 'num', 'número', '#', 'fraccionamiento', 'fracc',
+    'residencial', 'privada', 'quintas', 'villas', 'jardines',
+    'bosques', 'lomas', 'cerrada', 'andador', 'retorno',
+)
+_RESIDENTIAL_RE = re.compile('|'.join(re.escape(k) for k in RESIDENTIAL_KEYWORDS))
+
+
+def _expand(match):
+    postal, abbreviation = match.groups()
+    if postal:
+        return ' cp '
+    return f" {ABBREVIATIONS[abbreviation] if abbreviation else 'número'} "
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean(address):
+    """Minúsculas, abreviaturas expandidas y espacios simples"""
+    if not address:
+        return ""
+    return ' '.join(_ABBREVIATION_RE.sub(_expand, address.strip().lower()).split())
+
+
+def is_postal_code(address):
+    """¿La dirección es solo un código postal (5 dígitos)?"""
+    return bool(_POSTAL_CODE_RE.match(address))
+
+
+def is_residential(address):
+    """¿Dirección residencial específica? (número y palabra clave o 3+ palabras)"""
+    address_lower = address.lower()
+    if not _DIGIT_RE.search(address_lower):
+        return False
+    return bool(_RESIDENTIAL_RE.search(address_lower)) or len(address.split()) >= 3
+
+
+def _find_number(segments):
+    """
+    (segmento, posición) del número exterior o None
+
+    Prioridad: después de "casa"/"número"; al final de un segmento o antes
+    de la colonia; al inicio de la dirección; cualquier otro. Los números
+    después de "km" o de otro número (3.5) no cuentan
+    """
+    best = None
+    for si, tokens in enumerate(segments):
+        for ti, token in enumerate(tokens):
+            if not (token.isdigit() and len(token) <= 4):
+                continue
+            prev = tokens[ti - 1] if ti else None
+            following = tokens[ti + 1] if ti + 1 < len(tokens) else None
+            if prev == 'km' or (prev and prev.isdigit()):
+                continue
+            if prev in NUMBER_MARKERS:
+                priority = 0
+            elif following is None or following in NEIGHBORHOOD_MARKERS:
+                priority = 1
+            elif si == 0 and ti == 0:
+                priority = 2
+            else:
+                priority = 3
+            if best is None or priority < best[0]:
+                best = (priority, si, ti)
+    return best[1:] if best else None
+
+
+def _take_neighborhood(segments, is_start, skip=0):
+    """
+    Quita de segments la primera colonia que empieza donde is_start(ti, token)
+    y termina en el número exterior (None) o al final del segmento
+    """
+    for si, tokens in enumerate(segments):
+        for ti, token in enumerate(tokens):
+            if token is None or not is_start(ti, token):
+                continue
+            end = tokens.index(None, ti) if None in tokens[ti:] else len(tokens)
+            if tokens[ti + skip:end]:
+                segments[si] = tokens[:ti] + tokens[end:]
+                return ' '.join(tokens[ti + skip:end])
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(address):
+    segments = [_TOKEN_RE.findall(part) for part in address.lower().split(',')]
+    segments = [tokens for tokens in segments if tokens]
+
+    # Código postal: 5 dígitos, con o sin "cp" antes
+    postal_code = None
+    for tokens in segments:
+        for ti, token in enumerate(tokens):
+            if token.isdigit() and len(token) == 5:
+                postal_code = token
+                start = ti
+                while start and tokens[start - 1] in POSTAL_MARKERS:
+                    start -= 1
+                del tokens[start:ti + 1]
+                break
+        if postal_code:
+            break
+    segments = [tokens for tokens in segments if tokens]
+
+    # Número exterior; se quita junto con su marcador ("casa", "número")
+    number = None
+    number_segment = 0
+    found = _find_number(segments)
+    if found:
+        number_segment, ti = found
+        tokens = segments[number_segment]
+        number = tokens[ti]
+        start = ti - 1 if ti and tokens[ti - 1] in NUMBER_MARKERS else ti
+        # None marca la posición del número para separar calle y colonia
+        segments[number_segment] = tokens[:start] + [None] + tokens[ti + 1:]
+
+    # Colonia: palabra clave explícita ("col. centro"), segmento que empieza
+    # con un nombre típico ("villas del rey"), otro segmento sin números o
+    # las palabras que siguen al número ("Aldama 901 Centro")
+    neighborhood = _take_neighborhood(segments, lambda ti, token: token in NEIGHBORHOOD_MARKERS, skip=1)
+    if neighborhood is None:
+        neighborhood = _take_neighborhood(segments, lambda ti, token: ti == 0 and token in NEIGHBORHOOD_NAMES)
+
+    if neighborhood is None:
+        for si, tokens in enumerate(segments):
+            words = [t for t in tokens if t and t not in PLACE_WORDS]
+            if si != number_segment and words and not any(t.isdigit() for t in words):
+                neighborhood = ' '.join(words)
+                segments[si] = []
+                break
+
+    street_tokens = segments[number_segment] if segments else []
+    if neighborhood is None and None in street_tokens[1:]:
+        after = [t for t in street_tokens[street_tokens.index(None) + 1:] if t not in PLACE_WORDS]
+        if after and not any(t.isdigit() for t in after):
+            neighborhood = ' '.join(after)
+            street_tokens = street_tokens[:street_tokens.index(None)]
+
+    words = [t for t in street_tokens if t and t not in STREET_STOP_WORDS and len(t) > 1]
+    street = ' '.join(words).title() if words else None
+    return number, street, neighborhood, postal_code
+
+
+def parse(address):
+    """
+    Componentes de una dirección residencial
+
+    Returns:
+        dict: number, street, neighborhood, postal_code (None si no se
+        encontró) y original
+    """
+    number, street, neighborhood, postal_code = _parse(address or '')
+    return {
+        'number': number,
+        'street': street,
+        'neighborhood': neighborhood,
+        'postal_code': postal_code,
+        'original': address,
+    }
+
+
+def cache_info():
+    """Estadísticas de la memoria de clean y parse"""
+    return {'clean': clean.cache_info(), 'parse': _parse.cache_info()}
+
+
+def cache_clear():
+    clean.cache_clear()
+    _parse.cache_clear()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Uuid, data, SubirDocs, Pagos, soli, Files
+from .models import Uuid, data, SubirDocs, Pagos, soli, Files, PdfCache, Expediente, FolioCounter, GeocodeCache, Colonia, Calle, CatalogSync, BackfillCheckpoint
 from portaldu.cmin.models import Users, LoginDate
 
 # Los modelos de usuario ya están administrados por cmin
@@ -38,5 +38,46 @@ class FilesAdmin(admin.ModelAdmin):
     list_display = ('fDoc_ID', 'nomDoc', 'soli_FK')
     search_fields = ('nomDoc',)
 
+@admin.register(PdfCache)
+class PdfCacheAdmin(admin.ModelAdmin):
+    list_display = ('cache_key', 'template', 'fuuid', 'size', 'hits', 'last_access')
+    list_filter = ('template',)
+    readonly_fields = ('cache_key', 'size', 'hits', 'created_at', 'last_access')
 
+@admin.register(Expediente)
+class ExpedienteAdmin(admin.ModelAdmin):
+    list_display = ('expediente_ID', 'soli_FK', 'paginas', 'updated_at')
+    readonly_fields = ('docs_incluidos', 'paginas', 'updated_at')
 
+@admin.register(FolioCounter)
+class FolioCounterAdmin(admin.ModelAdmin):
+    list_display = ('puo', 'year', 'last_value')
+    list_filter = ('year',)
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ('key', 'kind', 'source', 'hits', 'expires_at')
+    list_filter = ('kind', 'source')
+    search_fields = ('key',)
+
+@admin.register(Colonia)
+class ColoniaAdmin(admin.ModelAdmin):
+    list_display = ('id_colonia', 'nombre', 'cp', 'synced_at')
+    search_fields = ('nombre', 'cp')
+
+@admin.register(Calle)
+class CalleAdmin(admin.ModelAdmin):
+    list_display = ('id_calle', 'nombre', 'colonia', 'synced_at')
+    search_fields = ('nombre', 'colonia__nombre')
+    raw_id_fields = ('colonia',)
+
+@admin.register(CatalogSync)
+class CatalogSyncAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'finished_at', 'status', 'colonias', 'failed', 'requests')
+    list_filter = ('status',)
+    readonly_fields = ('started_at', 'finished_at', 'status', 'colonias', 'failed', 'requests', 'stats', 'error')
+
+@admin.register(BackfillCheckpoint)
+class BackfillCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_pk', 'processed', 'updated', 'failed', 'finished_at', 'updated_at')
+    readonly_fields = ('updated_at',)
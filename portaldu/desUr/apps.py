@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DesurConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portaldu.desUr'
+
+    def ready(self):
+        # Registrar señales aunque ninguna vista haya importado el módulo
+        # (workers de Celery, comandos de manage.py, shell)
+        from . import expediente, pdf_cache  # noqa: F401
@@ -0,0 +1,203 @@
+"""
+Circuit breakers de los proveedores de geocodificación
+El estado de cada proveedor (cerrado / abierto / semiabierto) vive en la
+caché compartida (CACHES['shared'], Redis), así que todos los workers de
+gunicorn y Celery ven la misma caída: cuando ArcGIS no responde, las
+consultas se saltan al instante en lugar de esperar el timeout cada vez
+
+    cerrado ──N fallas──> abierto ──recovery──> semiabierto ──ok──> cerrado
+                              ^                      │
+                              └────────falla─────────┘
+
+La tarea probe_geocoding_providers sondea los servicios en segundo plano y
+actualiza los breakers y el estado que muestra get_service_status()
+"""
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from . import http_pool, rate_limit
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Fallas consecutivas para abrir y segundos antes de permitir un intento
+FAILURE_THRESHOLD = getattr(settings, 'GIS_BREAKER_FAILURES', 3)
+RECOVERY_TIMEOUT = getattr(settings, 'GIS_BREAKER_RECOVERY', 30)
+
+# Breakers por proveedor/operación -> sesión de http_pool que usan
+BREAKERS = {
+    'arcgis_geocode': 'arcgis',
+    'arcgis_reverse': 'arcgis',
+    'nominatim': 'nominatim',
+}
+
+STATUS_KEY = 'gis:status'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """El proveedor está marcado como caído; se trata como error de conexión"""
+    pass
+
+
+def _cache():
+    try:
+        return caches['shared']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+class CircuitBreaker:
+    """Breaker de un proveedor con estado en la caché compartida"""
+
+    def __init__(self, name, failure_threshold=None, recovery_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or RECOVERY_TIMEOUT
+        self.state_key = f'gis:breaker:{name}'
+        self.failures_key = f'gis:breaker:{name}:failures'
+        self.trial_key = f'gis:breaker:{name}:trial'
+
+    def get_state(self):
+        """dict con state, opened_at; cerrado si no hay nada en caché"""
+        return _cache().get(self.state_key) or {'state': CLOSED, 'opened_at': None}
+
+    def allow_request(self):
+        """
+        ¿Se puede consultar al proveedor?
+
+        Abierto: no, hasta que pasen recovery_timeout segundos. Después solo
+        un worker a la vez obtiene el intento de prueba (semiabierto)
+        """
+        state = self.get_state()
+        if state['state'] == CLOSED:
+            return True
+
+        if time.time() - (state['opened_at'] or 0) < self.recovery_timeout:
+            return False
+
+        # cache.add es atómico: un solo intento por ventana de recuperación
+        if _cache().add(self.trial_key, 1, timeout=self.recovery_timeout):
+            if state['state'] == OPEN:
+                _cache().set(self.state_key, {'state': HALF_OPEN, 'opened_at': state['opened_at']}, timeout=None)
+            logger.info(f"Breaker {self.name} semiabierto: intento de prueba")
+            return True
+        return False
+
+    def record_success(self):
+        state = self.get_state()
+        if state['state'] != CLOSED:
+            logger.info(f"Breaker {self.name} cerrado: el proveedor respondió")
+            _cache().delete_many([self.state_key, self.trial_key])
+        _cache().delete(self.failures_key)
+
+    def record_failure(self):
+        cache = _cache()
+        state = self.get_state()
+
+        if state['state'] == HALF_OPEN:
+            failures = self.failure_threshold
+        else:
+            cache.add(self.failures_key, 0, timeout=self.recovery_timeout * 10)
+            try:
+                # Con Redis caído (IGNORE_EXCEPTIONS) incr devuelve None: el breaker no se abre
+                failures = cache.incr(self.failures_key) or 0
+            except ValueError:
+                failures = 1
+
+        if failures >= self.failure_threshold and state['state'] != OPEN:
+            cache.set(self.state_key, {'state': OPEN, 'opened_at': time.time()}, timeout=None)
+            cache.delete(self.trial_key)
+            logger.warning(f"Breaker {self.name} abierto tras {failures} fallas")
+
+    def reset(self):
+        _cache().delete_many([self.state_key, self.failures_key, self.trial_key])
+
+
+def get_breaker(name):
+    return CircuitBreaker(name)
+
+
+def guarded_get(name, url, **kwargs):
+    """
+    GET a través de http_pool protegido por el breaker name
+
+    Errores de red y respuestas 5xx cuentan como falla; cualquier otra
+    respuesta cierra el breaker. Los proveedores con límite de consultas
+    (rate_limit.LIMITS) esperan su turno hasta la mitad del timeout
+
+    Raises:
+        CircuitOpenError: Si el proveedor está abierto (sin consultar)
+        RateLimitExceeded: Si no hubo turno a tiempo (sin consultar)
+        requests.exceptions.RequestException: Igual que http_pool.get
+    """
+    breaker = get_breaker(name)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Proveedor {name} no disponible (breaker abierto)")
+
+    limiter = rate_limit.get_limiter(BREAKERS[name])
+    if limiter is not None:
+        limiter.acquire(rate_limit.wait_budget(kwargs.get('timeout')))
+
+    try:
+        response = http_pool.get(BREAKERS[name], url, **kwargs)
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def probe(name, url, timeout=5, **kwargs):
+    """
+    Sondea un proveedor ignorando el estado del breaker y lo actualiza
+
+    Returns:
+        dict: available, response_time y state resultante
+    """
+    breaker = get_breaker(name)
+    try:
+        response = http_pool.get(BREAKERS[name], url, timeout=timeout, **kwargs)
+        available = response.status_code == 200
+        response_time = response.elapsed.total_seconds()
+    except requests.exceptions.RequestException:
+        available = False
+        response_time = None
+
+    if available:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+    return {
+        'available': available,
+        'response_time': response_time,
+        'state': breaker.get_state()['state'],
+    }
+
+
+def save_status(status):
+    """Guarda el resultado del último sondeo para get_service_status()"""
+    status = dict(status, checked_at=time.time())
+    _cache().set(STATUS_KEY, status, timeout=None)
+    return status
+
+
+def get_status():
+    """Último sondeo guardado (None si no hay) con el estado actual de los breakers"""
+    status = _cache().get(STATUS_KEY)
+    if status is None:
+        return None
+    status['breakers'] = {name: get_breaker(name).get_state()['state'] for name in BREAKERS}
+    return status
@@ -0,0 +1,137 @@
+"""
+Búsqueda de colonias para el autocompletado de domicilios
+Las colonias se leen de la tabla Colonia (catálogo municipal sincronizado)
+y se indexan en memoria por prefijo de cada palabra, sin acentos ni
+mayúsculas: "canada" encuentra "LA CAÑADA" y "san fel" a "SAN FELIPE" sin
+consultar WsDomicilios
+
+Si la tabla está vacía (nunca se sincronizó) se llena una vez desde
+GetColonias. El índice se reconstruye cuando cambia la versión del catálogo
+(sync_colonias / sync_address_catalog)
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from .local_geocoder import VERSION_CHECK_INTERVAL, catalog_version, normalize
+from .models import Colonia
+
+logger = logging.getLogger(__name__)
+
+# Segundos antes de volver a intentar llenar la tabla desde el servicio
+EMPTY_RETRY_INTERVAL = 300
+
+
+class ColoniaIndex:
+    """Colonias con índice ordenado de (palabra, posición) para búsqueda por prefijo"""
+
+    def __init__(self, rows):
+        # (id_colonia, nombre, nombre_norm, cp)
+        self.rows = list(rows)
+        pairs = sorted(
+            (token, i) for i, row in enumerate(self.rows) for token in set(row[2].split())
+        )
+        self.tokens = [token for token, _ in pairs]
+        self.positions = [i for _, i in pairs]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _prefix(self, token):
+        """Posiciones de las colonias con alguna palabra que empieza con token"""
+        start = bisect.bisect_left(self.tokens, token)
+        end = bisect.bisect_left(self.tokens, token + '\uffff', start)
+        return set(self.positions[start:end])
+
+    def search(self, query, limit=20):
+        """
+        Colonias que coinciden con query, mejor coincidencia primero
+
+        Cada palabra de la consulta debe ser prefijo de alguna palabra del
+        nombre; si ninguna colonia cumple se buscan como subcadena
+
+        Returns:
+            list: dicts con id_colonia, colonia, cp (formato de GetColonias)
+        """
+        norm = normalize(query)
+        words = norm.split()
+        if not words:
+            return []
+
+        matches = None
+        for word in words:
+            found = self._prefix(word)
+            matches = found if matches is None else matches & found
+            if not matches:
+                break
+        if not matches:
+            matches = [i for i, row in enumerate(self.rows) if norm in row[2]]
+
+        def rank(i):
+            name = self.rows[i][2]
+            if name == norm:
+                order = 0
+            elif name.startswith(norm):
+                order = 1
+            elif name.split()[0].startswith(words[0]):
+                order = 2
+            else:
+                order = 3
+            return order, len(name), name
+
+        return [
+            {'id_colonia': self.rows[i][0], 'colonia': self.rows[i][1], 'cp': self.rows[i][3]}
+            for i in heapq.nsmallest(limit, matches, key=rank)
+        ]
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+_checked_at = 0.0
+_empty_at = None
+
+
+def _load_from_service():
+    """Llena la tabla desde GetColonias cuando nunca se ha sincronizado"""
+    global _empty_at
+
+    if _empty_at is not None and time.monotonic() - _empty_at < EMPTY_RETRY_INTERVAL:
+        return
+    _empty_at = time.monotonic()
+
+    from .address_catalog import CatalogSyncError, sync_colonias
+
+    try:
+        count = sync_colonias()
+        logger.info(f"Catálogo de colonias vacío: {count} colonias copiadas de WsDomicilios")
+    except CatalogSyncError as e:
+        logger.warning(f"No se pudo llenar el catálogo de colonias: {str(e)}")
+
+
+def get_index():
+    """Índice del proceso; se reconstruye si la versión del catálogo cambió"""
+    global _index, _index_version, _checked_at
+
+    now = time.monotonic()
+    if _index and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        _checked_at = now
+        version = catalog_version()
+        if not _index or version != _index_version:
+            if not Colonia.objects.exists():
+                _load_from_service()
+                version = catalog_version()
+            _index = ColoniaIndex(Colonia.objects.values_list('id_colonia', 'nombre', 'nombre_norm', 'cp'))
+            _index_version = version
+            logger.info(f"Índice de colonias cargado: {len(_index)} colonias")
+        return _index
+
+
+def search(query, limit=20):
+    """Busca colonias por nombre en el catálogo local"""
+    return get_index().search(query, limit=limit)
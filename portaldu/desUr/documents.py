@@ -0,0 +1,357 @@
+"""
+Construcción de documentos PDF de DesUr
+Arma el contexto de los templates de trámites y presupuesto participativo
+a partir de la base de datos, sin depender del request, para que el mismo
+código se use desde las vistas y desde las tareas de Celery
+"""
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+
+from .folios import assign_folio, assign_pp_folio, get_puo_txt
+from .images import get_rendition_url
+from .models import (data, soli, Files, Uuid, SubirDocs,
+                     PpCS, PpEscuela, PpGeneral, PpPluvial, PpParque, PpInfraestructura)
+from .pdf_cache import get_or_render
+from .pdf_service import render_pdf
+
+logger = logging.getLogger(__name__)
+
+# Descripción completa de cada asunto de Obra Pública
+ASUNTOS = {
+    "DOP00001": "Arreglo de calles de terracería - DOP00001",
+    "DOP00002": "Bacheo de calles - DOP00002",
+    "DOP00003": "Limpieza de arroyos al sur de la ciudad - DOP00003",
+    "DOP00004": "Limpieza o mantenimiento de rejillas pluviales - DOP00004",
+    "DOP00005": "Pago de costo de participación en licitaciones de obra pública - DOP00005",
+    "DOP00006": "Rehabilitación de calles - DOP00006",
+    "DOP00007": "Retiro de escombro y material de arrastre - DOP00007",
+    "DOP00008": "Solicitud de material caliche/fresado - DOP00008",
+    "DOP00009": "Solicitud de pavimentación de calles - DOP00009",
+    "DOP00010": "Solicitud de reductores de velocidad - DOP00010",
+    "DOP00011": "Solicitud de pintura para señalamientos viales - DOP00011",
+    "DOP00012": "Arreglo de derrumbe de bardas - DOP00012",
+    "DOP00013": "Tapiado - DOP00013",
+}
+
+
+def get_asunto_txt(asunto):
+    """Devuelve la descripción del asunto o el código si no es de Obra Pública"""
+    return ASUNTOS.get(asunto, asunto)
+
+
+def build_document_context(uuid, asunto, puo_session='general'):
+    """
+    Arma el contexto de documet/document.html para un trámite
+
+    Args:
+        uuid: String con el UUID de la sesión del trámite
+        asunto: Código del asunto guardado en sesión (ej. DOP00001)
+        puo_session: PUO de la sesión, usado si la solicitud no tiene folio
+
+    Returns:
+        tuple: (context, datos, solicitud, uuid_obj)
+
+    Raises:
+        Http404: Si no existen los datos del ciudadano o el UUID
+        soli.DoesNotExist: Si el ciudadano aún no tiene solicitud
+    """
+    datos = get_object_or_404(data, fuuid__uuid=uuid)
+    solicitud = soli.objects.filter(data_ID=datos).latest('fecha')
+    uuid_obj = get_object_or_404(Uuid, uuid=uuid)
+    documentos = SubirDocs.objects.filter(fuuid__uuid=uuid)
+
+    # El folio se asigna al capturar la solicitud; solo los registros
+    # anteriores al contador lo reciben aquí, una sola vez
+    folio = assign_folio(solicitud, puo_session)
+    puo_txt = get_puo_txt(solicitud.puo or puo_session)
+
+    context = {
+        "asunto": get_asunto_txt(asunto),
+        "datos": {
+            "nombre": datos.nombre,
+            "pApe": datos.pApe,
+            "mApe": datos.mApe,
+            "bDay": datos.bDay,
+            "tel": datos.tel,
+            "curp": datos.curp,
+            "sexo": datos.sexo,
+            "dir": datos.dirr,
+            "disc": datos.disc,
+            "etnia": datos.etnia,
+            "vul": datos.vul if datos.vul else "No pertenece a un grupo vulnerable",
+        },
+        "soli": {
+            "dir": solicitud.dirr,
+            "info": solicitud.info,
+            "descc": solicitud.descc,
+            "foto": solicitud.foto,
+            "foto_print": get_rendition_url(solicitud.foto, 'print'),
+            "fecha": solicitud.fecha,
+        },
+        'puo': puo_txt,
+        'documentos': documentos,
+        'folio': folio,
+    }
+    return context, datos, solicitud, uuid_obj
+
+
+def build_pp_context(uuid, categoria):
+    """
+    Arma el contexto de documet/pp_document.html para una propuesta
+
+    Args:
+        uuid: String con el UUID de la sesión
+        categoria: Categoría guardada en sesión (parque, escuela, cs,
+                   infraestructura, pluviales)
+
+    Returns:
+        tuple: (context, gen_data, uuid_obj, cat) donde cat es el nombre legible
+
+    Raises:
+        Http404: Si no existe la propuesta general o el UUID
+    """
+    uuid_obj = get_object_or_404(Uuid, uuid=uuid)
+    gen_data = get_object_or_404(PpGeneral, fuuid__uuid=uuid)
+    cat = categoria
+    num_folio = assign_pp_folio(gen_data)
+    context = {}
+    instalaciones_dict = dict(PpGeneral.INSTALATION_CHOICES)
+    estados_dict = dict(PpGeneral.CHOICES_STATE)
+
+    datos = {
+        "nombre": gen_data.nombre_promovente,
+        "telefono": gen_data.telefono,
+        "direccion": gen_data.direccion_proyecto,
+        "desc": gen_data.desc_p,
+        "fecha": gen_data.fecha_pp,
+        "instalaciones": gen_data.instalation_choices,
+        "notas": gen_data.notas_importantes,
+    }
+
+    match categoria:
+        case "parque":
+            cat = "Parques"
+            propuesta = PpParque.objects.filter(fk_pp=gen_data).last()
+
+            propuesta_data = {}
+            if propuesta:
+                propuesta_data = {
+                    'cancha_futbol_rapido': propuesta.cancha_futbol_rapido,
+                    'cancha_futbol_soccer': propuesta.cancha_futbol_soccer,
+                    'cancha_futbol_7x7': propuesta.cancha_futbol_7x7,
+                    'cancha_beisbol': propuesta.cancha_beisbol,
+                    'cancha_softbol': propuesta.cancha_softbol,
+                    'cancha_usos_multiples': propuesta.cancha_usos_multiples,
+                    'cancha_otro': propuesta.cancha_otro,
+                    'alumbrado_rehabilitacion': propuesta.alumbrado_rehabilitacion,
+                    'alumbrado_nuevo': propuesta.alumbrado_nuevo,
+                    'juegos_dog_park': propuesta.juegos_dog_park,
+                    'juegos_infantiles': propuesta.juegos_infantiles,
+                    'juegos_ejercitadores': propuesta.juegos_ejercitadores,
+                    'juegos_otros': propuesta.juegos_otro,
+                    'techumbre_domo': propuesta.techumbre_domo,
+                    'techumbre_kiosko': propuesta.techumbre_kiosko,
+                    'equipamiento_botes': propuesta.equipamiento_botes,
+                    'equipamiento_bancas': propuesta.equipamiento_bancas,
+                    'equipamiento_andadores': propuesta.equipamiento_andadores,
+                    'equipamiento_rampas': propuesta.equipamiento_rampas,
+                }
+
+            context = {
+                "cat": cat,
+                "datos": datos,
+                "propuesta": propuesta_data,
+                "notas_parque": propuesta.notas_parque if propuesta else "",
+                "folio": num_folio,
+                "instalaciones_dict": instalaciones_dict,
+                "estados_dict": estados_dict,
+            }
+
+        case "escuela":
+            cat = "Escuelas"
+            propuesta = PpEscuela.objects.filter(fk_pp=gen_data).last()
+
+            propuesta_data = {}
+            if propuesta:
+                propuesta_data = {
+                    'rehabilitacion_baños': propuesta.rehabilitacion_baños,
+                    'rehabilitacion_salones': propuesta.rehabilitacion_salones,
+                    'rehabilitacion_electricidad': propuesta.rehabilitacion_electricidad,
+                    'rehabilitacion_gimnasio': propuesta.rehabilitacion_gimnasio,
+                    'rehabilitacion_otro': propuesta.rehabilitacion_otro,
+                    'construccion_domo': propuesta.construccion_domo,
+                    'construccion_aula': propuesta.construccion_aula,
+                    'cancha_futbol_rapido': propuesta.cancha_futbol_rapido,
+                    'cancha_usos_multiples': propuesta.cancha_usos_multiples,
+                    'cancha_futbol_7x7': propuesta.cancha_futbol_7x7,
+                }
+
+            context = {
+                "cat": cat,
+                "datos": datos,
+                "nom_escuela": propuesta.nom_escuela if propuesta else "",
+                "propuesta": propuesta_data,
+                "notas": propuesta.notas_escuela if propuesta else "",
+                "folio": num_folio,
+                "instalaciones_dict": instalaciones_dict,
+                "estados_dict": estados_dict,
+            }
+
+        case "cs":
+            cat = "Centro comunitario - Salón de usos múltiples"
+            propuesta = PpCS.objects.filter(fk_pp=gen_data).last()
+
+            propuesta_data = {}
+            if propuesta:
+                propuesta_data = {
+                    'rehabilitacion_baños': propuesta.rehabilitacion_baños,
+                    'rehabilitacion_salones': propuesta.rehabilitacion_salones,
+                    'rehabilitacion_electricidad': propuesta.rehabilitacion_electricidad,
+                    'rehabilitacion_gimnasio': propuesta.rehabilitacion_gimnasio,
+                    'construccion_domo': propuesta.construccion_domo,
+                    'construccion_salon': propuesta.construccion_salon,
+                    'construccion_otro': propuesta.construccion_otro,
+                }
+
+            context = {
+                "cat": cat,
+                "datos": datos,
+                "notas": propuesta.notas_propuesta if propuesta else "",
+                "propuesta": propuesta_data,
+                "folio": num_folio,
+                "instalaciones_dict": instalaciones_dict,
+                "estados_dict": estados_dict,
+            }
+
+        case "infraestructura":
+            cat = "Infraestructura"
+            propuesta = PpInfraestructura.objects.filter(fk_pp=gen_data).last()
+
+            propuesta_data = {}
+            if propuesta:
+                propuesta_data = {
+                    'infraestructura_barda': propuesta.infraestructura_barda,
+                    'infraestructura_baquetas': propuesta.infraestructura_banquetas,
+                    'infraestructura_muro': propuesta.infraestructura_muro,
+                    'infraestructura_camellon': propuesta.infraestructura_camellon,
+                    'infraestructura_crucero': propuesta.infraestructura_crucero,
+                    'infraestructura_ordenamiento': propuesta.infraestructura_ordenamiento,
+                    'infraestructura_er': propuesta.infraestructura_er,
+                    'infraestructura_mejora': propuesta.infraestructura_mejora,
+                    'infraestructura_peatonal': propuesta.infraestructura_peatonal,
+                    'infraestructura_bayoneta': propuesta.infraestructura_bayoneta,
+                    'infraestructura_topes': propuesta.infraestructura_topes,
+                    'infraestructura_puente': propuesta.infraestructura_puente,
+                    'pavimentacion_asfalto': propuesta.pavimentacion_asfalto,
+                    'paviementacion_rehabilitacion': propuesta.pavimentacion_rehabilitacion,
+                    'señalamiento_pintura': propuesta.señalamiento_pintura,
+                    'señalamiento_señales': propuesta.señalamiento_señales,
+                }
+
+            context = {
+                "cat": cat,
+                "datos": datos,
+                "notas": propuesta.notas_propuesta if propuesta else "",
+                "propuesta": propuesta_data,
+                "folio": num_folio,
+                "instalaciones_dict": instalaciones_dict,
+                "estados_dict": estados_dict,
+            }
+
+        case "pluviales":
+            cat = "Soluciones pluviales"
+            propuesta = PpPluvial.objects.filter(fk_pp=gen_data).last()
+
+            propuesta_data = {}
+            if propuesta:
+                propuesta_data = {
+                    'pluvial_muro_contencion': propuesta.pluvial_muro_contencion,
+                    'pluvial_canalizacion': propuesta.pluvial_canalizacion,
+                    'pluvial_puente_peatonal': propuesta.pluvial_puente_peatonal,
+                    'pluvial_vado': propuesta.pluvial_vado,
+                    'pluvial_puente': propuesta.pluvial_puente,
+                    'pluvial_desalojo': propuesta.pluvial_desalojo,
+                    'pluvial_rejillas': propuesta.pluvial_rejillas,
+                    'pluvial_lavaderos': propuesta.pluvial_lavaderos,
+                    'pluvial_obra_hidraulica': propuesta.pluvial_obra_hidraulica,
+                    'pluvial_reposicion_piso': propuesta.pluvial_reposicion_piso,
+                    'pluvial_proteccion_inundaciones': propuesta.pluvial_proteccion_inundaciones,
+                }
+
+            context = {
+                "cat": cat,
+                "datos": datos,
+                "propuesta": propuesta_data,
+                "notas": propuesta.notas_propuesta if propuesta else "",
+                "folio": num_folio,
+                "instalaciones_dict": instalaciones_dict,
+                "estados_dict": estados_dict,
+            }
+
+    return context, gen_data, uuid_obj, cat
+
+
+def render_document_pdf(uuid, asunto, puo_session='general'):
+    """
+    Obtiene el PDF de un trámite, desde la caché si el contexto no cambió
+
+    Returns:
+        tuple: (pdf_bytes, context, datos, solicitud, uuid_obj, entry)
+    """
+    context, datos, solicitud, uuid_obj = build_document_context(uuid, asunto, puo_session)
+    pdf, entry = get_or_render("documet/document.html", context, uuid_obj)
+    return pdf, context, datos, solicitud, uuid_obj, entry
+
+
+def save_document_file(uuid, asunto, puo_session='general'):
+    """
+    Renderiza el PDF de un trámite y lo guarda en el modelo Files
+
+    Args:
+        uuid: String con el UUID de la sesión del trámite
+        asunto: Código del asunto (ej. DOP00001)
+        puo_session: PUO de respaldo si la solicitud no tiene folio
+
+    Returns:
+        Files: Registro con el PDF en media/documents/. Si el mismo contexto
+               ya se guardó antes se devuelve ese registro sin duplicarlo
+    """
+    pdf, context, datos, solicitud, uuid_obj, entry = render_document_pdf(uuid, asunto, puo_session)
+
+    if entry.files_FK and entry.files_FK.finalDoc:
+        logger.info(f"Documento de trámite sin cambios, se reutiliza: {entry.files_FK.nomDoc}")
+        return entry.files_FK
+
+    nomDoc = f'VS_{context["asunto"]}_{datos.nombre}_{datos.pApe}.pdf'
+    doc = Files(nomDoc=nomDoc, fuuid=uuid_obj, soli_FK=solicitud)
+    doc.finalDoc.save(nomDoc, ContentFile(pdf))
+    entry.files_FK = doc
+    entry.save(update_fields=['files_FK'])
+    logger.info(f"Documento de trámite guardado: {nomDoc}")
+    return doc
+
+
+def save_pp_document_file(uuid, categoria):
+    """
+    Renderiza el PDF de presupuesto participativo y lo guarda en Files
+
+    Args:
+        uuid: String con el UUID de la sesión
+        categoria: Categoría de la propuesta guardada en sesión
+
+    Returns:
+        Files: Registro creado con el PDF en media/documents/
+    """
+    context, gen_data, uuid_obj, cat = build_pp_context(uuid, categoria)
+    html = render_to_string("documet/pp_document.html", context)
+    buffer = BytesIO()
+    render_pdf(html, buffer)
+    nomDoc = f'VS_{cat}_{gen_data.nombre_promovente}_Presupuesto_Participativo.pdf'
+    doc = Files(nomDoc=nomDoc, fuuid=uuid_obj, pp_FK=gen_data)
+    doc.finalDoc.save(nomDoc, ContentFile(buffer.getvalue()))
+    logger.info(f"Documento de presupuesto participativo guardado: {nomDoc}")
+    return doc
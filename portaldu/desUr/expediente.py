@@ -0,0 +1,185 @@
+"""
+Armado de expedientes de DesUr
+Un expediente es un solo PDF por solicitud: la portada (documento final de
+document.html) seguida de los adjuntos de SubirDocs. Los adjuntos que llegan
+después se anexan a una copia del expediente ya armado, sin volver a
+renderizar la portada ni convertir otra vez los adjuntos anteriores
+"""
+import logging
+import os
+import tempfile
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .documents import save_document_file
+from .images import get_pdf_page
+from .models import Expediente, Files, SubirDocs, soli
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.errors import PdfReadError
+except ImportError:
+    PdfReader = PdfWriter = None
+    PdfReadError = Exception
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp', '.heic')
+
+
+class ExpedienteError(Exception):
+    """No es posible armar el expediente (sin pypdf, sin datos, etc.)"""
+    pass
+
+
+def _attachment_source(doc):
+    """
+    Ruta local del PDF que representa un adjunto
+
+    Returns:
+        str: Ruta del PDF original o de la conversión cacheada de la imagen,
+             None si el tipo de archivo no se puede anexar
+    """
+    if not doc.doc or not doc.doc.storage.exists(doc.doc.name):
+        return None
+
+    ext = os.path.splitext(doc.doc.name)[1].lower()
+    if ext == '.pdf':
+        return doc.doc.path
+    if ext in IMAGE_EXTENSIONS:
+        name = get_pdf_page(doc.doc)
+        return doc.doc.storage.path(name) if name else None
+    return None
+
+
+def _get_portada(solicitud):
+    """Último documento final de la solicitud; lo genera si no existe"""
+    portada = (Files.objects.filter(soli_FK=solicitud).exclude(finalDoc='')
+               .order_by('-fDoc_ID').first())
+    if portada and portada.finalDoc.storage.exists(portada.finalDoc.name):
+        return portada
+
+    datos = solicitud.data_ID
+    return save_document_file(str(datos.fuuid.uuid), datos.asunto, solicitud.puo)
+
+
+def _append(writer, path, doc):
+    """Anexa un PDF al writer; los archivos dañados se omiten"""
+    try:
+        writer.append(path, outline_item=doc.nomDoc or doc.descDoc)
+    except (PdfReadError, OSError, ValueError) as e:
+        logger.warning(f"Adjunto {doc.doc_ID} omitido del expediente: {e}")
+
+
+def get_expediente(solicitud):
+    """
+    Devuelve el expediente actualizado de una solicitud
+
+    - Sin expediente o con portada distinta: se arma completo
+    - Con adjuntos nuevos: se anexan a una copia del expediente existente
+    - Sin cambios: se devuelve tal cual
+
+    Args:
+        solicitud: Instancia de soli
+
+    Returns:
+        Expediente: Registro con el PDF en media/expedientes/
+
+    Raises:
+        ExpedienteError: Si pypdf no está instalado
+    """
+    if PdfWriter is None:
+        raise ExpedienteError("pypdf no está instalado, no es posible armar expedientes")
+
+    portada = _get_portada(solicitud)
+    adjuntos = list(SubirDocs.objects.filter(fuuid=solicitud.data_ID.fuuid).order_by('doc_ID'))
+
+    with transaction.atomic():
+        expediente, created = Expediente.objects.select_for_update().get_or_create(soli_FK=solicitud)
+
+        rebuild = (created or expediente.portada_FK_id != portada.fDoc_ID
+                   or not expediente.archivo
+                   or not expediente.archivo.storage.exists(expediente.archivo.name))
+        incluidos = [] if rebuild else list(expediente.docs_incluidos)
+        nuevos = [doc for doc in adjuntos if doc.doc_ID not in incluidos]
+
+        if not rebuild and not nuevos:
+            return expediente
+
+        if rebuild:
+            writer = PdfWriter()
+            writer.append(portada.finalDoc.path, outline_item="Solicitud")
+        else:
+            # Se parte del expediente ya armado. No se usa incremental=True:
+            # pypdf reutiliza el número de objeto del xref de la actualización
+            # anterior y desde la segunda se pierden páginas
+            writer = PdfWriter(clone_from=expediente.archivo.path)
+
+        # Los adjuntos que no se pueden anexar (Word, PDF dañado) también se
+        # marcan como procesados para no reintentarlos en cada actualización
+        for doc in nuevos:
+            path = _attachment_source(doc)
+            if path:
+                _append(writer, path, doc)
+            else:
+                logger.debug(f"Adjunto {doc.doc_ID} sin formato anexable, se omite")
+            incluidos.append(doc.doc_ID)
+
+        # El PDF se guarda siempre como archivo nuevo: el que apunta el
+        # registro no se toca hasta confirmar la transacción, así un error al
+        # guardar no deja bytes anexados que la BD no conoce
+        storage = expediente.archivo.storage
+        old_name = expediente.archivo.name if expediente.archivo else None
+        with tempfile.TemporaryFile(suffix='.pdf') as tmp:
+            writer.write(tmp)
+            writer.close()
+            tmp.seek(0)
+            paginas = len(PdfReader(tmp).pages)
+            tmp.seek(0)
+            expediente.archivo.save(f'expediente_{solicitud.pk}.pdf', File(tmp), save=False)
+        new_name = expediente.archivo.name
+
+        try:
+            expediente.portada_FK = portada
+            expediente.docs_incluidos = incluidos
+            expediente.paginas = paginas
+            expediente.save()
+        except Exception:
+            storage.delete(new_name)
+            raise
+
+        if old_name and old_name != new_name:
+            transaction.on_commit(lambda: storage.delete(old_name))
+
+    logger.info(f"Expediente de solicitud {solicitud.pk} "
+                f"{'armado' if rebuild else 'actualizado'}: {len(nuevos)} adjuntos nuevos, {paginas} páginas")
+    return expediente
+
+
+def get_expediente_by_id(soli_id):
+    """Atajo para tareas: obtiene la solicitud y su expediente"""
+    solicitud = soli.objects.select_related('data_ID__fuuid').get(soli_ID=soli_id)
+    return get_expediente(solicitud)
+
+
+@receiver(post_save, sender=SubirDocs)
+def anexar_adjunto(sender, instance, created, **kwargs):
+    """Encola la actualización de expedientes ya armados al llegar un adjunto"""
+    if not created:
+        return
+
+    from .tasks import update_expediente
+
+    soli_ids = Expediente.objects.filter(
+        soli_FK__data_ID__fuuid=instance.fuuid_id).values_list('soli_FK_id', flat=True)
+    for soli_id in soli_ids:
+        def enqueue(soli_id=soli_id):
+            try:
+                update_expediente.delay(soli_id)
+            except Exception as e:
+                # Sin broker el expediente se actualiza al descargarlo
+                logger.warning(f"No se pudo encolar expediente {soli_id}: {str(e)}")
+        transaction.on_commit(enqueue)
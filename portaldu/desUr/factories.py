@@ -0,0 +1,169 @@
+"""
+Factories de datos sintéticos para DesUr (factory_boy + Faker)
+Generan ciudadanos, solicitudes, adjuntos y propuestas de presupuesto
+participativo con datos realistas; los usa el comando benchmark_pdf
+"""
+import io
+import random
+
+import factory
+from django.core.files.base import ContentFile
+from django.db import models
+from factory.django import DjangoModelFactory
+
+from .documents import ASUNTOS
+from .models import (Uuid, data, soli, SubirDocs, PpGeneral,
+                     PpParque, PpEscuela, PpCS, PpInfraestructura, PpPluvial)
+
+PUOS = ['OFI', 'CRC', 'MEC', 'DLO', 'DFE', 'REG', 'DEA', 'EVA', 'PED', 'VIN', 'PPA', 'CPC']
+
+
+def sample_pdf(pages=1):
+    """PDF mínimo válido con páginas en blanco, para adjuntos"""
+    import pydyf
+
+    pdf = pydyf.PDF()
+    for _ in range(pages):
+        page = pydyf.Dictionary({
+            'Type': '/Page',
+            'Parent': pdf.pages.reference,
+            'MediaBox': pydyf.Array([0, 0, 612, 792]),
+        })
+        pdf.add_object(page)
+        pdf.pages['Kids'].append(page.reference)
+        pdf.pages['Count'] += 1
+    buffer = io.BytesIO()
+    pdf.write(buffer)
+    return buffer.getvalue()
+
+
+def sample_photo(width=4032, height=3024):
+    """Foto JPEG del tamaño de una cámara de celular"""
+    from PIL import Image
+
+    img = Image.effect_noise((width, height), 64).convert('RGB')
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class UuidFactory(DjangoModelFactory):
+    class Meta:
+        model = Uuid
+
+
+class DataFactory(DjangoModelFactory):
+    class Meta:
+        model = data
+
+    fuuid = factory.SubFactory(UuidFactory)
+    nombre = factory.Faker('first_name', locale='es_MX')
+    pApe = factory.Faker('last_name', locale='es_MX')
+    mApe = factory.Faker('last_name', locale='es_MX')
+    bDay = factory.Faker('date_of_birth', minimum_age=18, maximum_age=90)
+    tel = factory.LazyFunction(lambda: f"+52614{random.randint(1000000, 9999999)}")
+    curp = factory.Faker('bothify', text='????######??????##', letters='ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+    sexo = factory.Iterator(['Hombre', 'Mujer'])
+    asunto = factory.Iterator(list(ASUNTOS))
+    dirr = factory.Faker('address', locale='es_MX')
+    disc = 'Ninguna'
+    etnia = 'No pertenece'
+    vul = ''
+
+
+class SoliFactory(DjangoModelFactory):
+    class Meta:
+        model = soli
+
+    data_ID = factory.SubFactory(DataFactory)
+    dirr = factory.Faker('street_address', locale='es_MX')
+    calle = factory.Faker('street_name', locale='es_MX')
+    colonia = factory.Faker('city', locale='es_MX')
+    cp = factory.Faker('postcode', locale='es_MX')
+    descc = factory.Faker('paragraph', nb_sentences=4, locale='es_MX')
+    info = factory.Faker('sentence', locale='es_MX')
+    puo = factory.Iterator(PUOS)
+
+    class Params:
+        con_foto = factory.Trait(
+            foto=factory.LazyFunction(lambda: ContentFile(sample_photo(), name='foto.jpg'))
+        )
+
+
+class SubirDocsFactory(DjangoModelFactory):
+    class Meta:
+        model = SubirDocs
+
+    fuuid = factory.SubFactory(UuidFactory)
+    nomDoc = factory.Sequence(lambda n: f'adjunto_{n}.pdf')
+    descDoc = factory.Faker('sentence', nb_words=4, locale='es_MX')
+    doc = factory.LazyFunction(lambda: ContentFile(sample_pdf(2), name='adjunto.pdf'))
+
+
+class PpGeneralFactory(DjangoModelFactory):
+    class Meta:
+        model = PpGeneral
+
+    fuuid = factory.SubFactory(UuidFactory)
+    nombre_promovente = factory.Faker('name', locale='es_MX')
+    telefono = factory.LazyFunction(lambda: f"+52614{random.randint(1000000, 9999999)}")
+    direccion_proyecto = factory.Faker('address', locale='es_MX')
+    desc_p = factory.Faker('paragraph', nb_sentences=5, locale='es_MX')
+    notas_importantes = factory.Faker('sentence', locale='es_MX')
+    instalation_choices = factory.LazyFunction(lambda: {
+        clave: random.choice(PpGeneral.CHOICES_STATE)[0]
+        for clave, _ in PpGeneral.INSTALATION_CHOICES
+    })
+
+
+class PropuestaFactory(DjangoModelFactory):
+    """Base de las propuestas por categoría: marca al azar cada opción booleana"""
+
+    fk_pp = factory.SubFactory(PpGeneralFactory)
+
+    @classmethod
+    def _adjust_kwargs(cls, **kwargs):
+        for field in cls._meta.model._meta.get_fields():
+            if isinstance(field, models.BooleanField) and field.name not in kwargs:
+                kwargs[field.name] = random.random() < 0.5
+        for field in ('notas_parque', 'notas_escuela', 'notas_propuesta'):
+            if hasattr(cls._meta.model, field) and field not in kwargs:
+                kwargs[field] = 'Propuesta generada para pruebas de rendimiento'
+        return kwargs
+
+
+class PpParqueFactory(PropuestaFactory):
+    class Meta:
+        model = PpParque
+
+
+class PpEscuelaFactory(PropuestaFactory):
+    class Meta:
+        model = PpEscuela
+
+    nom_escuela = factory.Faker('company', locale='es_MX')
+
+
+class PpCSFactory(PropuestaFactory):
+    class Meta:
+        model = PpCS
+
+
+class PpInfraestructuraFactory(PropuestaFactory):
+    class Meta:
+        model = PpInfraestructura
+
+
+class PpPluvialFactory(PropuestaFactory):
+    class Meta:
+        model = PpPluvial
+
+
+# Categoría de sesión -> factory de la propuesta específica
+PP_FACTORIES = {
+    'parque': PpParqueFactory,
+    'escuela': PpEscuelaFactory,
+    'cs': PpCSFactory,
+    'infraestructura': PpInfraestructuraFactory,
+    'pluviales': PpPluvialFactory,
+}
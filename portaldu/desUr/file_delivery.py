@@ -0,0 +1,150 @@
+"""
+Entrega protegida de archivos guardados (PDFs, evidencias)
+Las vistas validan permisos y delegan el envío aquí: en producción nginx
+envía el archivo vía X-Accel-Redirect; en desarrollo se transmite desde
+Django en bloques. En ambos casos se soportan ETag, Last-Modified,
+respuestas 304 y peticiones Range (206)
+"""
+import logging
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse, FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+logger = logging.getLogger(__name__)
+
+# Prefijo de la location interna de nginx que apunta a MEDIA_ROOT.
+# Vacío = Django transmite el archivo (desarrollo)
+ACCEL_PREFIX = getattr(settings, 'PROTECTED_MEDIA_ACCEL_PREFIX', '')
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+        return f'{disposition}; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def _parse_range(header, size):
+    """
+    Interpreta un encabezado Range de un solo rango
+
+    Returns:
+        tuple: (inicio, fin) inclusivos, None si no aplica (se envía completo)
+
+    Raises:
+        ValueError: Si el rango no es satisfacible (416)
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N: últimos N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def _iter_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, field_file, filename=None, as_attachment=False, content_type=None):
+    """
+    Envía un archivo del storage con soporte de caché condicional y Range
+
+    Args:
+        request: HttpRequest (ya validado por la vista)
+        field_file: FieldFile con el archivo (Files.finalDoc, Seguimiento.documento...)
+        filename: Nombre para Content-Disposition (default: nombre en disco)
+        as_attachment: True para forzar descarga en lugar de mostrar en el navegador
+        content_type: Tipo MIME (default: se deduce de la extensión)
+
+    Returns:
+        HttpResponse: 200, 206, 304, 412 o 416 según la petición
+
+    Raises:
+        Http404: Si el archivo no existe en disco
+    """
+    if not field_file or not field_file.name:
+        raise Http404("Archivo no disponible")
+
+    try:
+        path = field_file.path
+        stat = os.stat(path)
+    except (OSError, NotImplementedError):
+        logger.warning(f"Archivo no encontrado en disco: {field_file.name}")
+        raise Http404("Archivo no disponible")
+
+    filename = filename or os.path.basename(field_file.name)
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    last_modified = int(stat.st_mtime)
+
+    # 304 Not Modified / 412 Precondition Failed
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional
+
+    if ACCEL_PREFIX:
+        # nginx se encarga del envío, de Range y de sendfile
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = ACCEL_PREFIX.rstrip('/') + '/' + quote(field_file.name)
+    else:
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        byte_range = None
+        if range_header and (not if_range or if_range == etag):
+            try:
+                byte_range = _parse_range(range_header, stat.st_size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(_iter_range(path, start, length),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    return response
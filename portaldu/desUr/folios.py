@@ -0,0 +1,155 @@
+"""
+Asignación de folios de DesUr
+Los folios son secuenciales por PUO y año (DOP-OFI-00042-1a2b/25). Los
+números salen de FolioCounter en bloques reservados por proceso: solo se
+consulta la BD al agotar el bloque. El folio se guarda una vez en soli o
+PpGeneral y los documentos lo leen de ahí, nunca se recalcula al renderizar
+
+Los números que un worker reservó y no usó (reinicio, fin de año) se pierden:
+la secuencia es única y creciente por worker, pero puede tener huecos
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import FolioCounter
+
+logger = logging.getLogger(__name__)
+
+# Descripción legible de cada PUO, usada en los documentos
+PUO_TXT = {
+    'OFI': 'Oficio',
+    'CRC': 'CRC',
+    'MEC': 'Marca el cambio',
+    'DLO': 'Diputado Local',
+    'DFE': 'Diputado Federal',
+    'REG': 'Regidores',
+    'DEA': 'Despacho del Alcalde',
+    'EVA': 'Evento con el Alcalde',
+    'PED': 'Presencial en Dirección',
+    'VIN': 'Vinculación',
+    'PPA': 'Presupuesto participativo',
+    'CPC': 'Coordinación de Participación Ciudadana',
+}
+
+# Serie de folios de presupuesto participativo
+PP_SERIE = 'CPP'
+
+BLOCK_SIZE = getattr(settings, 'FOLIO_BLOCK_SIZE', 20)
+
+_lock = threading.Lock()
+# (puo, año) -> [siguiente, último] del bloque reservado por este proceso
+_blocks = {}
+
+
+def get_puo_txt(puo):
+    """Descripción del PUO; 'General' si no es un PUO reconocido"""
+    return PUO_TXT.get(puo, 'General')
+
+
+def _reserve(puo, year, size):
+    """
+    Avanza el contador en la BD y devuelve el rango reservado
+
+    Returns:
+        tuple: (primero, último) inclusivos
+    """
+    counter = FolioCounter.objects.filter(puo=puo, year=year)
+    with transaction.atomic():
+        # El UPDATE bloquea la fila hasta el commit: la lectura siguiente
+        # ve el valor propio aunque otros workers reserven a la vez
+        if not counter.update(last_value=F('last_value') + size):
+            try:
+                with transaction.atomic():
+                    FolioCounter.objects.create(puo=puo, year=year, last_value=size)
+            except IntegrityError:
+                # Otro proceso creó el contador de la serie al mismo tiempo
+                counter.update(last_value=F('last_value') + size)
+        last = counter.values_list('last_value', flat=True).get()
+    return last - size + 1, last
+
+
+def next_number(puo, year=None):
+    """
+    Siguiente número de la serie de un PUO
+
+    Dentro de una transacción abierta se reserva un solo número sin cachearlo:
+    si la transacción se revierte, el número vuelve al contador junto con la
+    solicitud que lo iba a usar
+
+    Args:
+        puo: Código de la serie (OFI, CRC, ..., CPP)
+        year: Año de la serie (default: año actual)
+
+    Returns:
+        int: Número consecutivo
+    """
+    year = year or timezone.localdate().year
+
+    if connection.in_atomic_block:
+        return _reserve(puo, year, 1)[0]
+
+    key = (puo, year)
+    with _lock:
+        block = _blocks.get(key)
+        if not block or block[0] > block[1]:
+            block = list(_reserve(puo, year, BLOCK_SIZE))
+            _blocks[key] = block
+            logger.debug(f"Bloque de folios reservado {puo}/{year}: {block[0]}-{block[1]}")
+        numero = block[0]
+        block[0] += 1
+    return numero
+
+
+def format_folio(serie, numero, uid, year):
+    """DOP-{SERIE}-{número:05d}-{uuid[:4]}/{año:2}"""
+    return f'DOP-{serie}-{numero:05d}-{str(uid)[:4]}/{str(year)[2:4]}'
+
+
+def allocate_folio(puo, uid):
+    """
+    Folio nuevo para un trámite
+
+    Args:
+        puo: Código del proceso; los no reconocidos usan la serie VIN
+        uid: UUID de la sesión del trámite
+
+    Returns:
+        str: Folio con formato DOP-{PUO}-{número:05d}-{uuid[:4]}/{año}
+    """
+    serie = puo if puo in PUO_TXT else 'VIN'
+    year = timezone.localdate().year
+    return format_folio(serie, next_number(serie, year), uid, year)
+
+
+def allocate_pp_folio(uid):
+    """Folio nuevo para una propuesta de presupuesto participativo"""
+    year = timezone.localdate().year
+    return format_folio(PP_SERIE, next_number(PP_SERIE, year), uid, year)
+
+
+def assign_folio(solicitud, puo=None):
+    """
+    Asigna folio a una solicitud que no lo tiene (registros anteriores)
+
+    Returns:
+        str: Folio de la solicitud
+    """
+    if not solicitud.folio:
+        solicitud.folio = allocate_folio(solicitud.puo or puo, solicitud.data_ID.fuuid.uuid)
+        solicitud.save(update_fields=['folio'])
+        logger.info(f"Folio asignado a solicitud {solicitud.pk}: {solicitud.folio}")
+    return solicitud.folio
+
+
+def assign_pp_folio(propuesta):
+    """Asigna folio a una propuesta general que no lo tiene"""
+    if not propuesta.folio:
+        propuesta.folio = allocate_pp_folio(propuesta.fuuid.uuid)
+        propuesta.save(update_fields=['folio'])
+        logger.info(f"Folio asignado a propuesta {propuesta.pk}: {propuesta.folio}")
+    return propuesta.folio
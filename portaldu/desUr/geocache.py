@@ -0,0 +1,162 @@
+"""
+Caché de geocodificación en dos niveles
+1. LRU en memoria del proceso (sin consultas)
+2. Tabla GeocodeCache compartida por todos los workers
+
+Las direcciones se indexan por su forma normalizada (_clean_address) y las
+coordenadas redondeadas a GEOCODE_REVERSE_PRECISION decimales. Los "no
+encontrado" también se guardan, con un TTL corto, para no repetir la
+consulta a ArcGIS/OSM cada vez que alguien teclea la misma dirección
+"""
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from . import singleflight
+from .models import GeocodeCache
+
+logger = logging.getLogger(__name__)
+
+# Vigencia de resultados encontrados y de "no encontrado" (segundos)
+TTL = getattr(settings, 'GEOCODE_CACHE_TTL', 30 * 24 * 3600)
+NEGATIVE_TTL = getattr(settings, 'GEOCODE_CACHE_NEGATIVE_TTL', 3600)
+# Entradas en la LRU de cada proceso
+LRU_SIZE = getattr(settings, 'GEOCODE_CACHE_LRU_SIZE', 2048)
+# 4 decimales ≈ 11 m: clics sobre la misma casa comparten entrada
+REVERSE_PRECISION = getattr(settings, 'GEOCODE_REVERSE_PRECISION', 4)
+
+# Resultado de lookup cuando la clave no está en caché (None = "no encontrado")
+MISS = object()
+
+_lock = threading.Lock()
+# clave -> (expira en epoch, resultado)
+_lru = OrderedDict()
+
+
+def forward_key(clean_address):
+    """Clave de una dirección ya normalizada con _clean_address"""
+    key = f'fwd:{clean_address}'
+    if len(key) > 255:
+        key = f'fwd:sha1:{hashlib.sha1(clean_address.encode("utf-8")).hexdigest()}'
+    return key
+
+
+def reverse_key(lat, lng):
+    """Clave de unas coordenadas redondeadas"""
+    return f'rev:{round(float(lat), REVERSE_PRECISION)},{round(float(lng), REVERSE_PRECISION)}'
+
+
+def _lru_get(key):
+    with _lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return MISS
+        if entry[0] < time.time():
+            del _lru[key]
+            return MISS
+        _lru.move_to_end(key)
+        return entry[1]
+
+
+def _lru_set(key, expires, result):
+    with _lock:
+        _lru[key] = (expires, result)
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def lookup(key):
+    """
+    Busca una clave en la LRU y luego en la tabla compartida
+
+    Returns:
+        dict con el resultado, None si está cacheado como "no encontrado",
+        o MISS si hay que consultar al proveedor
+    """
+    result = _lru_get(key)
+    if result is not MISS:
+        return copy.deepcopy(result)
+
+    try:
+        entry = GeocodeCache.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+        if entry is None:
+            return MISS
+        GeocodeCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1)
+    except DatabaseError as e:
+        logger.warning(f"Caché de geocodificación no disponible: {str(e)}")
+        return MISS
+
+    _lru_set(key, entry.expires_at.timestamp(), entry.result)
+    return copy.deepcopy(entry.result)
+
+
+def store(key, kind, result):
+    """
+    Guarda un resultado (o None = no encontrado) en ambos niveles
+
+    Args:
+        key: Clave de forward_key / reverse_key
+        kind: 'forward' o 'reverse'
+        result: dict de LocalGISService o None
+    """
+    ttl = TTL if result else NEGATIVE_TTL
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    _lru_set(key, expires_at.timestamp(), copy.deepcopy(result))
+
+    try:
+        GeocodeCache.objects.update_or_create(
+            key=key,
+            defaults={
+                'kind': kind,
+                'result': result,
+                'source': (result or {}).get('source', ''),
+                'expires_at': expires_at,
+            },
+        )
+    except DatabaseError as e:
+        logger.warning(f"No se pudo guardar en caché de geocodificación: {str(e)}")
+
+
+def cached(key, kind, fetch):
+    """
+    Devuelve el resultado cacheado de key o lo obtiene con fetch() y lo guarda
+
+    Args:
+        key: Clave de forward_key / reverse_key
+        kind: 'forward' o 'reverse'
+        fetch: Función sin argumentos que consulta a los proveedores
+    """
+    result = lookup(key)
+    if result is not MISS:
+        logger.debug(f"Geocodificación desde caché: {key}")
+        return result
+
+    def fetch_and_store():
+        result = fetch()
+        store(key, kind, result)
+        return result
+
+    # La misma dirección pedida a la vez por varios usuarios se geocodifica una vez
+    return copy.deepcopy(singleflight.do(f'geocode:{key}', fetch_and_store, shared=True))
+
+
+def purge_expired():
+    """Elimina de la tabla las entradas vencidas; devuelve cuántas"""
+    deleted, _ = GeocodeCache.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def clear_local():
+    """Vacía la LRU del proceso"""
+    with _lock:
+        _lru.clear()
@@ -0,0 +1,189 @@
+"""
+Geocodificación por lotes de solicitudes y propuestas existentes
+Llena calle / colonia / cp y coordenadas de soli y PpGeneral a partir de la
+dirección capturada, para que los reportes agrupen por colonia sin buscar
+en el texto. Recorre la tabla por clave primaria en lotes, resuelve cada
+dirección normalizada una sola vez y guarda el avance en BackfillCheckpoint
+para continuar donde se quedó
+"""
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import geocache
+from .models import BackfillCheckpoint, PpGeneral, soli
+from .services import GeocodeDeadlineExceeded, GeocodeUnavailable, LocalGISService
+
+logger = logging.getLogger(__name__)
+
+# Modelo, campo de dirección y campos destino (componente -> campo del modelo)
+TARGETS = {
+    'soli': {
+        'model': soli,
+        'address': 'dirr',
+        'fields': {'calle': 'calle', 'colonia': 'colonia', 'codigo_postal': 'cp',
+                   'lat': 'lat', 'lng': 'lng'},
+    },
+    'pp': {
+        'model': PpGeneral,
+        'address': 'direccion_proyecto',
+        'fields': {'calle': 'calle_p', 'colonia': 'colonia_p', 'codigo_postal': 'cp_p',
+                   'lat': 'lat_p', 'lng': 'lng_p'},
+    },
+}
+
+DEFAULT_CHUNK_SIZE = 200
+# Consultas por segundo a los proveedores externos (las de caché no cuentan)
+DEFAULT_RATE = 1.0
+# Espera (s) antes de reanudar cuando los proveedores no responden
+UNAVAILABLE_RETRY = 300
+
+
+class _Throttle:
+    """Espaciado mínimo entre consultas que salen a los proveedores"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.last = 0.0
+
+    def wait(self):
+        delay = self.last + self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.last = time.monotonic()
+
+
+def _values(result, fields, model):
+    """Valores a guardar a partir de un resultado de LocalGISService"""
+    components = result.get('components') or {}
+    values = {}
+    for component, field_name in fields.items():
+        if component in ('lat', 'lng'):
+            values[field_name] = result.get(component)
+            continue
+        value = str(components.get(component) or '').strip()
+        max_length = model._meta.get_field(field_name).max_length
+        values[field_name] = value[:max_length] if value else None
+    return values
+
+
+def backfill(target, chunk_size=DEFAULT_CHUNK_SIZE, rate=DEFAULT_RATE, limit=None, restart=False, log=None):
+    """
+    Geocodifica los registros de target ('soli' o 'pp') desde el último avance
+
+    Solo se llenan campos vacíos: lo que capturó el usuario no se sobrescribe.
+    Los registros que ya tienen coordenadas se saltan
+
+    Args:
+        target: Clave de TARGETS
+        chunk_size: Registros por lote (y por transacción)
+        rate: Consultas por segundo a ArcGIS/OSM
+        limit: Máximo de registros a procesar en esta ejecución
+        restart: Empezar desde el inicio de la tabla
+        log: Función opcional para reportar avance
+
+    Si los proveedores fallan (red, breaker abierto, sin turno) la ejecución
+    se detiene sin avanzar el lote en curso: esas direcciones no cuentan como
+    "sin resultado" y se reintentan en la siguiente ejecución
+
+    Returns:
+        dict: processed, updated, failed de esta ejecución, finished e
+        interrupted (proveedores no disponibles)
+    """
+    config = TARGETS[target]
+    model = config['model']
+    address_field = config['address']
+    fields = config['fields']
+    lat_field = fields['lat']
+    pk_name = model._meta.pk.name
+    log = log or logger.info
+
+    checkpoint, _ = BackfillCheckpoint.objects.get_or_create(name=f'geocode:{target}')
+    if restart:
+        checkpoint.last_pk = 0
+        checkpoint.processed = checkpoint.updated = checkpoint.failed = 0
+        checkpoint.finished_at = None
+        checkpoint.save()
+
+    throttle = _Throttle(rate)
+    # dirección normalizada -> resultado (o None) durante esta ejecución
+    resolved = {}
+    stats = {'processed': 0, 'updated': 0, 'failed': 0, 'finished': False, 'interrupted': False}
+
+    base = model.objects.filter(**{f'{lat_field}__isnull': True}).exclude(
+        Q(**{f'{address_field}__isnull': True}) | Q(**{address_field: ''})
+    ).order_by(pk_name)
+
+    while limit is None or stats['processed'] < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - stats['processed'])
+        chunk = list(base.filter(pk__gt=checkpoint.last_pk)[:size])
+        if not chunk:
+            stats['finished'] = True
+            break
+
+        # Direcciones únicas del lote que aún no se han resuelto
+        by_address = {}
+        for obj in chunk:
+            clean = LocalGISService._clean_address(getattr(obj, address_field))
+            by_address.setdefault(clean, []).append(obj)
+
+        for clean, objs in by_address.items():
+            if clean in resolved:
+                continue
+            # Las direcciones en caché no consumen cuota del proveedor
+            if geocache.lookup(geocache.forward_key(clean)) is geocache.MISS:
+                throttle.wait()
+            try:
+                resolved[clean] = LocalGISService.geocode_address(getattr(objs[0], address_field),
+                                                                  raise_errors=True)
+            except (GeocodeDeadlineExceeded, GeocodeUnavailable) as e:
+                logger.warning(f"{target}: proveedores no disponibles en pk > {checkpoint.last_pk}, "
+                               f"se reanuda después: {str(e) or type(e).__name__}")
+                stats['interrupted'] = True
+                break
+            except Exception as e:
+                logger.error(f"Error geocodificando '{clean}': {str(e)}")
+                resolved[clean] = None
+        if stats['interrupted']:
+            break
+
+        to_update = []
+        update_fields = set()
+        failed = 0
+        for clean, objs in by_address.items():
+            result = resolved[clean]
+            if not result or result.get('lat') is None:
+                failed += len(objs)
+                continue
+            values = _values(result, fields, model)
+            for obj in objs:
+                for field_name, value in values.items():
+                    if value is not None and not getattr(obj, field_name):
+                        setattr(obj, field_name, value)
+                        update_fields.add(field_name)
+                to_update.append(obj)
+
+        # Datos y avance en la misma transacción: al reanudar no se repite ni se pierde un lote
+        with transaction.atomic():
+            if to_update and update_fields:
+                model.objects.bulk_update(to_update, sorted(update_fields), batch_size=chunk_size)
+            checkpoint.last_pk = chunk[-1].pk
+            checkpoint.processed += len(chunk)
+            checkpoint.updated += len(to_update)
+            checkpoint.failed += failed
+            checkpoint.save(update_fields=['last_pk', 'processed', 'updated', 'failed', 'updated_at'])
+
+        stats['processed'] += len(chunk)
+        stats['updated'] += len(to_update)
+        stats['failed'] += failed
+        log(f"{target}: hasta pk {checkpoint.last_pk} - {stats['processed']} procesados, "
+            f"{stats['updated']} actualizados, {len(resolved)} direcciones únicas")
+
+    if stats['finished'] and checkpoint.finished_at is None:
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['finished_at', 'updated_at'])
+
+    return stats
@@ -0,0 +1,118 @@
+"""
+Sesiones HTTP persistentes para los proveedores de geocodificación
+Cada proceso mantiene una requests.Session por proveedor con su propio pool
+de conexiones keep-alive, reintentos y timeouts: las consultas a ArcGIS y
+Nominatim reutilizan la conexión TCP/TLS en lugar de abrir una nueva
+"""
+import logging
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = getattr(settings, 'GIS_HTTP_POOL_SIZE', 10)
+RETRIES = getattr(settings, 'GIS_HTTP_RETRIES', 1)
+
+# Configuración por proveedor: timeout por defecto (conexión, lectura),
+# verificación TLS y encabezados fijos
+PROVIDERS = {
+    'arcgis': {
+        'timeout': (2, 5),
+        # El certificado del servidor municipal no valida con la cadena pública
+        'verify': False,
+        'headers': {
+            'User-Agent': 'DesUr-LocalGIS/1.0',
+            'Accept': 'application/json',
+        },
+    },
+    'nominatim': {
+        'timeout': (2, 5),
+        'verify': True,
+        'headers': {
+            'User-Agent': 'DesUr/1.0',
+            'Accept': 'application/json',
+        },
+    },
+}
+
+_lock = threading.Lock()
+_sessions = {}
+_pid = None
+
+
+def _build_session(provider):
+    config = PROVIDERS[provider]
+    session = requests.Session()
+    session.verify = config['verify']
+    session.headers.update(config['headers'])
+
+    # Reintento rápido de errores de conexión y 502/503/504; los timeouts de
+    # lectura no se reintentan para no duplicar la espera del usuario
+    retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=0,
+        status=RETRIES,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(provider):
+    """
+    Sesión persistente del proveedor para este proceso
+
+    Tras un fork (gunicorn, Celery) el proceso hijo crea sus propias sesiones:
+    los sockets del padre no se comparten
+    """
+    global _pid
+
+    with _lock:
+        if _pid != os.getpid():
+            _sessions.clear()
+            _pid = os.getpid()
+        session = _sessions.get(provider)
+        if session is None:
+            session = _sessions[provider] = _build_session(provider)
+            logger.debug(f"Sesión HTTP creada para {provider} (pid {_pid})")
+        return session
+
+
+def get(provider, url, timeout=None, **kwargs):
+    """
+    GET a través de la sesión del proveedor
+
+    Args:
+        provider: Clave de PROVIDERS ('arcgis', 'nominatim')
+        url: URL completa
+        timeout: Segundos o tupla (conexión, lectura); default del proveedor
+        **kwargs: params, headers, etc. de requests
+
+    Returns:
+        requests.Response
+
+    Raises:
+        requests.exceptions.RequestException: Igual que requests.get
+    """
+    if timeout is None:
+        timeout = PROVIDERS[provider]['timeout']
+    return get_session(provider).get(url, timeout=timeout, **kwargs)
+
+
+def close_all():
+    """Cierra las sesiones del proceso (apagado del worker)"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,135 @@
+"""
+Derivados de imágenes para documentos generados
+Crea versiones reducidas y recomprimidas de las fotos subidas (soli.foto,
+Users.foto) para incrustarlas en PDFs y vistas pequeñas. Cada derivado se
+genera una sola vez y se guarda junto al original:
+
+    fotos/reporte.jpg  ->  fotos/reporte__print.jpg
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Tamaños por uso: lado mayor en píxeles y calidad JPEG
+# print: foto del trámite en document.html (100px de ancho a ~300 dpi)
+# avatar: foto de perfil en la barra de navegación
+RENDITIONS = {
+    'print': {'size': 400, 'quality': 75},
+    'avatar': {'size': 96, 'quality': 80},
+    # page: adjunto de imagen convertido a página del expediente (A4 a ~150 dpi)
+    'page': {'size': 1754, 'quality': 80},
+}
+
+
+def rendition_name(name, rendition):
+    """Nombre del derivado en el storage a partir del nombre original"""
+    base, _ = os.path.splitext(name)
+    return f'{base}__{rendition}.jpg'
+
+
+def get_rendition(image, rendition='print'):
+    """
+    Devuelve el nombre del derivado de una imagen, creándolo si no existe
+
+    Args:
+        image: FieldFile/ImageFieldFile de la foto original
+        rendition: Clave de RENDITIONS
+
+    Returns:
+        str: Nombre en el storage del derivado, o el nombre original si no
+             se pudo generar (Pillow no disponible, archivo dañado, etc.)
+    """
+    if not image or not image.name:
+        return None
+
+    storage = image.storage
+    name = rendition_name(image.name, rendition)
+    if storage.exists(name):
+        return name
+
+    if Image is None:
+        return image.name
+
+    spec = RENDITIONS[rendition]
+    try:
+        with image.open('rb') as f:
+            with Image.open(f) as img:
+                img = ImageOps.exif_transpose(img)
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                img.thumbnail((spec['size'], spec['size']), Image.LANCZOS)
+
+                buffer = BytesIO()
+                img.save(buffer, 'JPEG', quality=spec['quality'], optimize=True, progressive=True)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudo generar derivado {rendition} de {image.name}: {e}")
+        return image.name
+
+    # Si otro proceso lo creó mientras tanto, se usa el existente
+    if storage.exists(name):
+        return name
+    saved = storage.save(name, ContentFile(buffer.getvalue()))
+    logger.debug(f"Derivado {rendition} creado: {saved} ({buffer.tell()} bytes)")
+    return saved
+
+
+def get_rendition_url(image, rendition='print'):
+    """URL del derivado de una imagen, o None si no hay imagen"""
+    name = get_rendition(image, rendition)
+    if not name:
+        return None
+    return image.storage.url(name)
+
+
+def get_pdf_page(image):
+    """
+    Devuelve el nombre de una versión PDF de una imagen, creándola si no existe
+
+    Se usa para anexar fotos y escaneos al expediente: la imagen se reduce
+    con el derivado 'page' y se guarda como PDF de una página junto al
+    original (fotos/ine.jpg -> fotos/ine__page.pdf)
+
+    Args:
+        image: FieldFile con la imagen original
+
+    Returns:
+        str: Nombre en el storage del PDF, o None si no es una imagen legible
+    """
+    if Image is None or not image or not image.name:
+        return None
+
+    storage = image.storage
+    base, _ = os.path.splitext(image.name)
+    name = f'{base}__page.pdf'
+    if storage.exists(name):
+        return name
+
+    # get_rendition devuelve el original cuando no pudo leer la imagen
+    source = get_rendition(image, 'page')
+    if not source or source == image.name:
+        return None
+
+    try:
+        with storage.open(source, 'rb') as f:
+            with Image.open(f) as img:
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                buffer = BytesIO()
+                img.save(buffer, 'PDF', resolution=150)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudo convertir {image.name} a PDF: {e}")
+        return None
+
+    if storage.exists(name):
+        return name
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
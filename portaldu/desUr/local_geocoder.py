@@ -0,0 +1,283 @@
+"""
+Geocodificador local a partir del catálogo municipal de domicilios
+Resuelve "calle número, colonia" contra las tablas Colonia / Calle /
+NumeroExterior (sincronizadas desde WsDomicilios) sin salir del proceso.
+Los nombres de calles y colonias se cargan una vez en un índice de tokens
+en memoria; los números de cada calle se leen bajo demanda y se cachean
+
+ArcGIS y OSM quedan como respaldo cuando la dirección no está en el catálogo
+"""
+import difflib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from .models import Calle, Colonia, NumeroExterior
+
+logger = logging.getLogger(__name__)
+
+# Versión del catálogo en la caché compartida: la sincronización la cambia
+# y cada proceso reconstruye su índice en la siguiente consulta
+VERSION_KEY = 'gis:catalog_version'
+VERSION_CHECK_INTERVAL = 60
+
+# Palabras que no distinguen una calle de otra
+STOP_WORDS = {
+    'calle', 'c', 'avenida', 'av', 'ave', 'boulevard', 'blvd', 'privada', 'priv',
+    'prolongacion', 'prol', 'calzada', 'calz', 'carretera', 'carr', 'andador',
+    'cerrada', 'retorno', 'de', 'del', 'la', 'las', 'el', 'los', 'y',
+    'numero', 'num', 'no', 'casa', 'chihuahua', 'chih', 'mexico',
+}
+COLONIA_WORDS = {'colonia', 'col', 'fraccionamiento', 'fracc', 'residencial', 'barrio'}
+
+# Umbral de similitud para aceptar una calle por coincidencia aproximada
+FUZZY_RATIO = 0.85
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    """Minúsculas, sin acentos y sin signos: 'Av. Juárez #12' -> 'av juarez 12'"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(_NON_ALNUM.sub(' ', text).split())
+
+
+def street_tokens(norm):
+    """Tokens significativos de un nombre de calle normalizado"""
+    return [t for t in norm.split() if t not in STOP_WORDS]
+
+
+def _shared_cache():
+    try:
+        return caches['shared']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+class CatalogIndex:
+    """Índice en memoria de calles y colonias del catálogo"""
+
+    def __init__(self):
+        # pk de Calle -> (nombre, nombre_norm sin stop words, colonia_id)
+        self.calles = {}
+        # token -> set de pk de Calle
+        self.tokens = defaultdict(set)
+        # id_colonia -> nombre; nombre_norm -> id_colonia
+        self.colonias = {}
+        self.colonias_norm = {}
+        # Longitud máxima en tokens de un nombre de colonia
+        self.max_colonia_tokens = 1
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for id_colonia, nombre, nombre_norm in Colonia.objects.values_list('id_colonia', 'nombre', 'nombre_norm'):
+            index.colonias[id_colonia] = nombre
+            index.colonias_norm[nombre_norm] = id_colonia
+            index.max_colonia_tokens = max(index.max_colonia_tokens, len(nombre_norm.split()))
+
+        for pk, nombre, nombre_norm, colonia_id in Calle.objects.values_list(
+                'pk', 'nombre', 'nombre_norm', 'colonia_id').iterator(chunk_size=5000):
+            tokens = street_tokens(nombre_norm)
+            index.calles[pk] = (nombre, ' '.join(tokens), colonia_id)
+            for token in tokens:
+                index.tokens[token].add(pk)
+        return index
+
+    def __len__(self):
+        return len(self.calles)
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+_checked_at = 0.0
+
+
+def get_index():
+    """Índice del proceso; se reconstruye si la versión del catálogo cambió"""
+    global _index, _index_version, _checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        version = catalog_version()
+        _checked_at = now
+        if _index is None or version != _index_version:
+            start = time.monotonic()
+            _index = CatalogIndex.build()
+            _index_version = version
+            _numeros.cache_clear()
+            logger.info(f"Índice de catálogo cargado: {len(_index)} calles, "
+                        f"{len(_index.colonias)} colonias en {time.monotonic() - start:.2f}s")
+        return _index
+
+
+def catalog_version():
+    """Versión actual del catálogo (None si nunca se ha sincronizado)"""
+    return _shared_cache().get(VERSION_KEY)
+
+
+def bump_version():
+    """Marca el catálogo como modificado (llamar al terminar una sincronización)"""
+    _shared_cache().set(VERSION_KEY, time.time(), timeout=None)
+
+
+@lru_cache(maxsize=4096)
+def _numeros(calle_pk):
+    """numero normalizado -> (numero, lat, lng) de una calle"""
+    return {
+        normalize(numero): (numero, lat, lng)
+        for numero, lat, lng in NumeroExterior.objects.filter(
+            calle_id=calle_pk, lat__isnull=False, lng__isnull=False
+        ).values_list('numero', 'lat', 'lng')
+    }
+
+
+def parse(norm, index):
+    """
+    Separa una dirección normalizada en (tokens de calle, número, id_colonia)
+
+    La colonia se detecta por palabra clave ('col', 'fracc'...) o porque las
+    últimas palabras coinciden con el nombre de una colonia del catálogo
+    """
+    tokens = norm.split()
+    colonia_id = None
+
+    # "... colonia centro" / "... fracc quintas del sol"
+    for i, token in enumerate(tokens):
+        if token in COLONIA_WORDS and i + 1 < len(tokens):
+            colonia_id = index.colonias_norm.get(' '.join(tokens[i + 1:]))
+            tokens = tokens[:i]
+            break
+    else:
+        # Sufijo que coincide con una colonia: "juarez 12 centro"
+        for size in range(min(index.max_colonia_tokens, len(tokens) - 1), 0, -1):
+            colonia_id = index.colonias_norm.get(' '.join(tokens[-size:]))
+            if colonia_id is not None:
+                tokens = tokens[:-size]
+                break
+
+    numero = None
+    calle = []
+    previous = None
+    for token in tokens:
+        if numero is None and token.isdigit() and len(token) <= 5 and previous != 'cp':
+            numero = token
+        elif not (token.isdigit() and previous == 'cp') and token != 'cp' and token not in STOP_WORDS:
+            calle.append(token)
+        previous = token
+    return calle, numero, colonia_id
+
+
+def _match_calles(index, tokens, colonia_id):
+    """Calles candidatas como lista de (similitud, pk)"""
+    if not tokens:
+        return []
+    query = ' '.join(tokens)
+
+    # Exacta por tokens: calles que contienen todos los tokens
+    sets = [index.tokens.get(t) for t in tokens]
+    if all(sets):
+        candidates = set.intersection(*sets)
+    else:
+        # Tolerancia a errores de dedo: cada token se corrige contra el vocabulario
+        candidates = set()
+        for token, found in zip(tokens, sets):
+            if found:
+                candidates |= found
+            else:
+                for close in difflib.get_close_matches(token, index.tokens.keys(), n=3, cutoff=0.8):
+                    candidates |= index.tokens[close]
+
+    if colonia_id is not None:
+        in_colonia = {pk for pk in candidates if index.calles[pk][2] == colonia_id}
+        candidates = in_colonia or candidates
+
+    ranked = []
+    for pk in candidates:
+        ratio = 1.0 if index.calles[pk][1] == query else \
+            difflib.SequenceMatcher(None, query, index.calles[pk][1]).ratio()
+        if ratio >= FUZZY_RATIO:
+            ranked.append((ratio, pk))
+    ranked.sort(reverse=True)
+    return ranked
+
+
+def geocode(address):
+    """
+    Geocodifica una dirección contra el catálogo local
+
+    Args:
+        address: Dirección en texto libre (se normaliza aquí)
+
+    Returns:
+        dict con el formato de LocalGISService (source 'Catastro') o None si
+        la calle/número no están en el catálogo
+
+    Score:
+        100 calle y número exactos en la colonia indicada
+        95  calle y número exactos, calle única en el catálogo
+        75  mismo nombre de calle en varias colonias (ambiguo)
+        -15 si la calle se encontró por coincidencia aproximada
+    """
+    index = get_index()
+    if not index.calles:
+        return None
+
+    calle_tokens, numero, colonia_id = parse(normalize(address), index)
+    if not numero:
+        return None
+
+    hits = []
+    for ratio, pk in _match_calles(index, calle_tokens, colonia_id):
+        point = _numeros(pk).get(numero)
+        if point:
+            hits.append((ratio, pk, point))
+    if not hits:
+        return None
+
+    best_ratio = hits[0][0]
+    hits = [h for h in hits if h[0] == best_ratio]
+    ratio, pk, (numero_txt, lat, lng) = hits[0]
+    nombre, _, calle_colonia = index.calles[pk]
+
+    if colonia_id is not None and calle_colonia == colonia_id:
+        score = 100
+    elif len(hits) == 1:
+        score = 95
+    else:
+        score = 75
+    if ratio < 1.0:
+        score -= 15
+
+    colonia = index.colonias.get(calle_colonia, '')
+    full_address = f"{nombre} {numero_txt}, {colonia}, Chihuahua"
+    return {
+        'address': full_address,
+        'lat': lat,
+        'lng': lng,
+        'score': score,
+        'source': 'Catastro',
+        'components': {
+            'calle': nombre,
+            'numero': numero_txt,
+            'colonia': colonia,
+            'codigo_postal': '',
+            'ciudad': 'Chihuahua',
+            'estado': 'Chihuahua',
+            'full_address': full_address,
+        },
+    }
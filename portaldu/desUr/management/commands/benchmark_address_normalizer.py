@@ -0,0 +1,185 @@
+"""
+Comando de gestión de Django para medir el normalizador de direcciones
+Recorre el corpus de direcciones de Chihuahua (data/address_corpus.json),
+mide el tiempo de clean() y parse() sin memoria y con memoria, y compara
+cada resultado contra lo esperado para reportar la calidad por campo
+"""
+import json
+import os
+import platform
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from portaldu.desUr import address_normalizer
+from portaldu.desUr.management.commands.benchmark_pdf import percentile
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(address_normalizer.__file__), 'data', 'address_corpus.json')
+FIELDS = ('clean', 'number', 'street', 'neighborhood', 'postal_code')
+
+
+class Command(BaseCommand):
+    help = 'Mide velocidad y calidad de la normalización y parseo de direcciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            type=str,
+            default=DEFAULT_CORPUS,
+            help='JSON con direcciones y componentes esperados',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Pasadas sobre el corpus por medición (default: 200)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmark_address_normalizer.json',
+            help='Archivo JSON de resultados (default: benchmark_address_normalizer.json)',
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='JSON de una corrida anterior para mostrar diferencias',
+        )
+        parser.add_argument(
+            '--show-errors',
+            action='store_true',
+            help='Muestra cada dirección cuyo resultado no coincide',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations debe ser al menos 1')
+        try:
+            with open(options['corpus'], encoding='utf-8') as f:
+                corpus = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer el corpus: {e}')
+
+        self.iterations = options['iterations']
+        addresses = [entry['address'] for entry in corpus]
+
+        self.stdout.write(self.style.SUCCESS('=== BENCHMARK DEL NORMALIZADOR DE DIRECCIONES ==='))
+        self.stdout.write(f'{len(addresses)} direcciones, {self.iterations} pasadas')
+
+        def clean_all():
+            for address in addresses:
+                address_normalizer.clean(address)
+
+        def parse_all():
+            for address in addresses:
+                address_normalizer.parse(address_normalizer.clean(address))
+
+        timings = {
+            'clean_cold': self.measure(clean_all, len(addresses), cold=True),
+            'clean_memo': self.measure(clean_all, len(addresses)),
+            'parse_cold': self.measure(parse_all, len(addresses), cold=True),
+            'parse_memo': self.measure(parse_all, len(addresses)),
+        }
+        quality, errors = self.score(corpus)
+
+        report = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'corpus': os.path.basename(options['corpus']),
+                'direcciones': len(addresses),
+                'iterations': self.iterations,
+            },
+            'timings_us': timings,
+            'quality': quality,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        self.print_report(timings, quality)
+        if options['show_errors']:
+            self.print_errors(errors)
+        if options['compare']:
+            self.print_comparison(report, options['compare'])
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Resultados guardados en {options["output"]}'))
+
+    def measure(self, run, count, cold=False):
+        """Microsegundos por dirección (p50 y p95 entre pasadas)"""
+        address_normalizer.cache_clear()
+        run()
+        samples = []
+        for _ in range(self.iterations):
+            if cold:
+                address_normalizer.cache_clear()
+            start = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - start) * 1e6 / count)
+        return {
+            'p50': round(percentile(samples, 50), 3),
+            'p95': round(percentile(samples, 95), 3),
+        }
+
+    def score(self, corpus):
+        """Aciertos por campo contra lo esperado en el corpus"""
+        hits = {field: 0 for field in FIELDS}
+        totals = {field: 0 for field in FIELDS}
+        errors = []
+
+        for entry in corpus:
+            clean = address_normalizer.clean(entry['address'])
+            actual = dict(address_normalizer.parse(clean), clean=clean)
+            for field, expected in entry['expected'].items():
+                totals[field] += 1
+                if actual.get(field) == expected:
+                    hits[field] += 1
+                else:
+                    errors.append((entry['address'], field, expected, actual.get(field)))
+
+        quality = {
+            field: round(hits[field] / totals[field] * 100, 1)
+            for field in FIELDS if totals[field]
+        }
+        return quality, errors
+
+    # === REPORTE ===
+
+    def print_report(self, timings, quality):
+        self.stdout.write('\n=== VELOCIDAD (µs por dirección) ===')
+        self.stdout.write(f"{'Medición':16} {'p50':>10} {'p95':>10}")
+        for name, t in timings.items():
+            self.stdout.write(f"{name:16} {t['p50']:>10} {t['p95']:>10}")
+
+        self.stdout.write('\n=== CALIDAD (% de aciertos) ===')
+        for field, pct in quality.items():
+            line = f"{field:16} {pct:>10}"
+            self.stdout.write(line if pct == 100 else self.style.WARNING(line))
+
+    def print_errors(self, errors):
+        self.stdout.write(f'\n=== DIFERENCIAS ({len(errors)}) ===')
+        for address, field, expected, actual in errors:
+            self.stdout.write(f"{address!r} {field}: esperado {expected!r}, obtenido {actual!r}")
+
+    def print_comparison(self, report, path):
+        if not os.path.exists(path):
+            self.stdout.write(self.style.WARNING(f'No existe el archivo de comparación: {path}'))
+            return
+
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)
+
+        self.stdout.write(f'\n=== COMPARACIÓN CON {path} ===')
+        for name, t in report['timings_us'].items():
+            before = previous.get('timings_us', {}).get(name)
+            if not before or not before['p50']:
+                continue
+            delta = (t['p50'] - before['p50']) / before['p50'] * 100
+            line = f"{name:16} p50 {before['p50']} -> {t['p50']} µs ({delta:+.1f}%)"
+            self.stdout.write(self.style.WARNING(line) if delta > 10 else line)
+        for field, pct in report['quality'].items():
+            before = previous.get('quality', {}).get(field)
+            if before is None:
+                continue
+            line = f"{field:16} {before}% -> {pct}%"
+            self.stdout.write(self.style.WARNING(line) if pct < before else line)
@@ -0,0 +1,273 @@
+"""
+Comando de gestión de Django para medir el rendimiento del render de PDF
+Genera datos sintéticos para los 13 asuntos DOP y las 5 categorías de
+presupuesto participativo, renderiza cada caso con los mismos templates que
+las vistas y reporta latencia p50/p95, memoria pico y tamaño del PDF
+
+Memoria: py_heap_peak_kb es solo el heap de Python (tracemalloc no ve lo que
+reservan pango/cairo); rss_peak_kb es el pico de memoria residente del
+proceso (getrusage), acumulado desde que inició, así que solo sube cuando un
+caso supera a los anteriores. Con --pool el render ocurre en otro proceso y
+ninguna de las dos lo incluye
+
+El mismo benchmark corre con pytest: portaldu/desUr/tests/test_benchmark_pdf.py
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import override_settings
+from django.utils import timezone
+
+from portaldu.desUr.documents import ASUNTOS, build_document_context, build_pp_context
+from portaldu.desUr.pdf_service import render_pdf
+
+
+class Rollback(Exception):
+    """Se lanza al final para descartar los datos sintéticos"""
+    pass
+
+
+def peak_rss_kb():
+    """Pico de memoria residente del proceso en KB, o None si no se puede medir"""
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return round(peak / 1024, 1) if sys.platform == 'darwin' else peak
+
+
+def percentile(values, pct):
+    """Percentil con interpolación lineal (pct entre 0 y 100)"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    k = (len(ordered) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, memoria y tamaño del render de PDF de trámites y presupuesto participativo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5,
+            help='Renders medidos por caso (default: 5)',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=1,
+            help='Renders de calentamiento por caso, no se miden (default: 1)',
+        )
+        parser.add_argument(
+            '--attachments',
+            type=str,
+            default='0,5,20',
+            help='Cantidades de adjuntos a probar para trámites (default: 0,5,20)',
+        )
+        parser.add_argument(
+            '--photo',
+            action='store_true',
+            help='Incluye foto de cámara en las solicitudes',
+        )
+        parser.add_argument(
+            '--pool',
+            action='store_true',
+            help='Usa el pool de renderers (por defecto se renderiza en el proceso para medir memoria)',
+        )
+        parser.add_argument(
+            '--only',
+            choices=['tramites', 'pp'],
+            help='Ejecuta solo un grupo de casos',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmark_pdf.json',
+            help='Archivo JSON de resultados (default: benchmark_pdf.json)',
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='JSON de una corrida anterior para mostrar diferencias',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            attachment_counts = [int(n) for n in options['attachments'].split(',')]
+        except ValueError:
+            raise CommandError('--attachments debe ser una lista de enteros separados por coma')
+        if options['iterations'] < 1:
+            raise CommandError('--iterations debe ser al menos 1')
+
+        self.iterations = options['iterations']
+        self.warmup = options['warmup']
+
+        self.stdout.write(self.style.SUCCESS('=== BENCHMARK DE RENDER PDF ==='))
+
+        results = []
+        media_root = tempfile.mkdtemp(prefix='benchmark_pdf_')
+        pool_size = None if options['pool'] else 0
+
+        overrides = {'MEDIA_ROOT': media_root}
+        if pool_size is not None:
+            overrides['PDF_RENDER_POOL_SIZE'] = pool_size
+
+        # Los datos sintéticos y archivos se crean en una transacción que se
+        # revierte y en un MEDIA_ROOT temporal: la BD real no se modifica
+        with override_settings(**overrides):
+            try:
+                with transaction.atomic():
+                    if options['only'] != 'pp':
+                        results.extend(self.bench_tramites(attachment_counts, options['photo']))
+                    if options['only'] != 'tramites':
+                        results.extend(self.bench_pp())
+                    raise Rollback()
+            except Rollback:
+                pass
+
+        report = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'weasyprint': self.weasyprint_version(),
+                'iterations': self.iterations,
+                'warmup': self.warmup,
+                'pool': bool(options['pool']),
+                'photo': bool(options['photo']),
+            },
+            'results': results,
+        }
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        self.print_table(results)
+        if options['compare']:
+            self.print_comparison(results, options['compare'])
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Resultados guardados en {options["output"]}'))
+
+    # === CASOS ===
+
+    def bench_tramites(self, attachment_counts, photo):
+        from portaldu.desUr.factories import SoliFactory, SubirDocsFactory
+
+        results = []
+        for asunto in ASUNTOS:
+            for count in attachment_counts:
+                solicitud = SoliFactory(data_ID__asunto=asunto, con_foto=photo)
+                uuid_obj = solicitud.data_ID.fuuid
+                SubirDocsFactory.create_batch(count, fuuid=uuid_obj)
+
+                def render():
+                    context, *_ = build_document_context(str(uuid_obj.uuid), asunto, solicitud.puo)
+                    return render_pdf(render_to_string('documet/document.html', context))
+
+                results.append(self.measure(f'{asunto}/adjuntos={count}', 'tramite', render))
+        return results
+
+    def bench_pp(self):
+        from portaldu.desUr.factories import PP_FACTORIES
+
+        results = []
+        for categoria, factory_class in PP_FACTORIES.items():
+            propuesta = factory_class()
+            uuid_obj = propuesta.fk_pp.fuuid
+
+            def render():
+                context, *_ = build_pp_context(str(uuid_obj.uuid), categoria)
+                return render_pdf(render_to_string('documet/pp_document.html', context))
+
+            results.append(self.measure(f'pp/{categoria}', 'pp', render))
+        return results
+
+    def measure(self, case, kind, render):
+        """Ejecuta el render del caso y devuelve sus métricas"""
+        for _ in range(self.warmup):
+            render()
+
+        timings = []
+        size = 0
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            pdf = render()
+            timings.append((time.perf_counter() - start) * 1000)
+            size = len(pdf)
+
+        # Render aparte para el heap: tracemalloc hace más lentas las
+        # asignaciones y no debe contar en la latencia
+        tracemalloc.start()
+        render()
+        heap_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = {
+            'case': case,
+            'kind': kind,
+            'iterations': self.iterations,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'py_heap_peak_kb': round(heap_peak / 1024, 1),
+            'rss_peak_kb': peak_rss_kb(),
+            'size_bytes': size,
+        }
+        self.stdout.write(f"  {case}: p50 {result['p50_ms']} ms")
+        return result
+
+    # === REPORTE ===
+
+    def print_table(self, results):
+        self.stdout.write('\n=== RESULTADOS ===')
+        self.stdout.write(
+            f"{'Caso':32} {'p50 ms':>10} {'p95 ms':>10} {'Heap Py KB':>11} {'RSS KB':>10} {'Bytes':>10}")
+        for r in results:
+            self.stdout.write(
+                f"{r['case']:32} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['py_heap_peak_kb']:>11} "
+                f"{str(r['rss_peak_kb']):>10} {r['size_bytes']:>10}"
+            )
+
+    def print_comparison(self, results, path):
+        if not os.path.exists(path):
+            self.stdout.write(self.style.WARNING(f'No existe el archivo de comparación: {path}'))
+            return
+
+        with open(path, encoding='utf-8') as f:
+            previous = {r['case']: r for r in json.load(f).get('results', [])}
+
+        self.stdout.write(f'\n=== COMPARACIÓN CON {path} ===')
+        for r in results:
+            before = previous.get(r['case'])
+            if not before or not before['p50_ms']:
+                continue
+            delta = (r['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+            line = f"{r['case']:32} p50 {before['p50_ms']} -> {r['p50_ms']} ms ({delta:+.1f}%)"
+            if delta > 10:
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+
+    @staticmethod
+    def weasyprint_version():
+        try:
+            import weasyprint
+            return weasyprint.__version__
+        except (ImportError, OSError, AttributeError):
+            return None
@@ -0,0 +1,46 @@
+"""
+Comando de gestión de Django para geocodificar las solicitudes y propuestas
+existentes y llenar calle, colonia, código postal y coordenadas
+"""
+from django.core.management.base import BaseCommand
+
+from portaldu.desUr.geocode_backfill import DEFAULT_CHUNK_SIZE, DEFAULT_RATE, TARGETS, backfill
+
+
+class Command(BaseCommand):
+    help = 'Geocodifica por lotes soli y PpGeneral (reanuda desde el último avance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelo',
+            choices=list(TARGETS) + ['todos'],
+            default='todos',
+            help='Tabla a procesar: soli, pp o todos',
+        )
+        parser.add_argument('--lote', type=int, default=DEFAULT_CHUNK_SIZE, help='Registros por lote')
+        parser.add_argument('--tasa', type=float, default=DEFAULT_RATE,
+                            help='Consultas por segundo a ArcGIS/OSM')
+        parser.add_argument('--limite', type=int, help='Máximo de registros por tabla en esta ejecución')
+        parser.add_argument('--reiniciar', action='store_true', help='Ignorar el avance guardado')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('=== GEOCODIFICACIÓN POR LOTES ==='))
+
+        targets = list(TARGETS) if options['modelo'] == 'todos' else [options['modelo']]
+        for target in targets:
+            self.stdout.write(f"\n📍 Procesando {target}...")
+            stats = backfill(
+                target,
+                chunk_size=options['lote'],
+                rate=options['tasa'],
+                limit=options['limite'],
+                restart=options['reiniciar'],
+                log=self.stdout.write,
+            )
+            estado = 'completo' if stats['finished'] else 'pendiente'
+            if stats['interrupted']:
+                estado = 'detenido: proveedores no disponibles'
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {target}: {stats['processed']} procesados, {stats['updated']} actualizados, "
+                f"{stats['failed']} sin resultado ({estado})"
+            ))
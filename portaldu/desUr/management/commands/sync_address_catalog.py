@@ -0,0 +1,48 @@
+"""
+Comando de gestión de Django para copiar el catálogo municipal de domicilios
+(colonias, calles y números exteriores con coordenadas) desde WsDomicilios
+a las tablas locales usadas por el geocodificador local
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from portaldu.desUr.address_catalog import CatalogSyncError, sync_catalog
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza colonias, calles y números exteriores desde WsDomicilios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--colonia',
+            type=int,
+            action='append',
+            help='id_colonia a sincronizar (se puede repetir; default: todas)',
+        )
+        parser.add_argument(
+            '--sin-numeros',
+            action='store_true',
+            help='Copia solo colonias y calles, sin números exteriores',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('=== SINCRONIZACIÓN DEL CATÁLOGO DE DOMICILIOS ==='))
+
+        try:
+            run = sync_catalog(
+                colonia_ids=options['colonia'],
+                with_numbers=not options['sin_numeros'],
+                log=self.stdout.write,
+            )
+        except CatalogSyncError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"\n{'Tabla':10} {'nuevas':>8} {'cambios':>8} {'borradas':>8} {'iguales':>8}")
+        for table, counts in run.stats.items():
+            self.stdout.write(f"{table:10} {counts['created']:>8} {counts['updated']:>8} "
+                              f"{counts['deleted']:>8} {counts['unchanged']:>8}")
+
+        message = f"\n✅ {run.colonias} colonias recorridas con {run.requests} consultas"
+        if run.failed:
+            self.stdout.write(self.style.WARNING(f"{message}; {run.failed} colonias sin respuesta"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -5,6 +5,7 @@ Sistema de gestión de trámites ciudadanos y presupuesto participativo
 from django.core.validators import RegexValidator
 from django.db import models
 from django.db.models import AutoField
+from django.urls import reverse
 from phonenumber_field.modelfields import PhoneNumberField
 from django.conf import settings
 import uuid
@@ -128,6 +129,34 @@ class SubirDocs(models.Model):
     def __str__(self):
         return self.nomDoc or "Documento sin nombre"
 
+    def get_download_url(self):
+        """URL protegida del adjunto (valida sesión y permisos)"""
+        if not self.doc:
+            return ''
+        return reverse('adjunto_download', args=[self.doc_ID])
+
+    def can_download(self, user, session_uuid=None):
+        """
+        Verifica si el usuario puede descargar este adjunto
+
+        Mismas reglas que Files.can_download: CMIN ve todos; campo solo los
+        de solicitudes que procesó o del trámite que está capturando
+
+        Args:
+            user: Usuario autenticado
+            session_uuid: UUID del trámite en curso del usuario, si lo hay
+
+        Returns:
+            bool: True si tiene acceso al adjunto
+        """
+        if user.is_superuser or user.has_cmin_access():
+            return True
+        if not user.has_desur_access():
+            return False
+        if soli.objects.filter(data_ID__fuuid=self.fuuid_id, processed_by=user).exists():
+            return True
+        return bool(session_uuid) and str(self.fuuid.uuid) == str(session_uuid)
+
 
 class soli(models.Model):
     """
@@ -161,6 +190,10 @@ class soli(models.Model):
     # Código postal de la ubicación - 5 dígitos
     cp = models.CharField(max_length=5, null=True, blank=True)
 
+    # Coordenadas de la ubicación (geocodificación de dirr)
+    lat = models.FloatField(null=True, blank=True)
+    lng = models.FloatField(null=True, blank=True)
+
     # === DETALLES DEL TRÁMITE ===
     # Descripción detallada del problema o solicitud
     descc = models.TextField(blank=True, null=True)
@@ -246,6 +279,10 @@ class PpGeneral(models.Model):
     # Código postal del proyecto - 5 dígitos
     cp_p = models.CharField(max_length=5, null=True, blank=True)
 
+    # Coordenadas del proyecto (geocodificación de direccion_proyecto)
+    lat_p = models.FloatField(null=True, blank=True)
+    lng_p = models.FloatField(null=True, blank=True)
+
     # Descripción detallada del proyecto propuesto
     desc_p = models.TextField(verbose_name="Descripción del Proyecto", null=True, blank=True)
 
@@ -266,6 +303,9 @@ class PpGeneral(models.Model):
     # Notas adicionales importantes sobre el proyecto
     notas_importantes = models.TextField(verbose_name="Notas Importantes", null=True, blank=True)
 
+    # Folio de la propuesta (ej: DOP-CPP-00001-1234/25) - se asigna una sola vez
+    folio = models.CharField(max_length=50, null=True, blank=True)
+
     class Meta:
         db_table = 'pp_general'  # Tabla: pp_general
         ordering = ['pp_ID']  # Ordenar por ID de propuesta
@@ -528,6 +568,35 @@ class Files(models.Model):
     def __str__(self):
         return str(self.nomDoc)
 
+    def get_download_url(self):
+        """URL protegida del PDF final (valida sesión y permisos)"""
+        if not self.finalDoc:
+            return ''
+        return reverse('file_download', args=[self.fDoc_ID])
+
+    def can_download(self, user, session_uuid=None):
+        """
+        Verifica si el usuario puede descargar este documento
+
+        CMIN (administradores y delegados) revisa todas las solicitudes.
+        Los usuarios de campo solo ven los documentos de solicitudes que
+        ellos procesaron o del trámite que están capturando (cookie uuid)
+
+        Args:
+            user: Usuario autenticado
+            session_uuid: UUID del trámite en curso del usuario, si lo hay
+
+        Returns:
+            bool: True si tiene acceso al documento
+        """
+        if user.is_superuser or user.has_cmin_access():
+            return True
+        if not user.has_desur_access():
+            return False
+        if self.soli_FK_id and self.soli_FK.processed_by_id == user.pk:
+            return True
+        return bool(session_uuid) and str(self.fuuid.uuid) == str(session_uuid)
+
 class Pagos(models.Model):
     """
     Modelo para el registro de pagos realizados por los ciudadanos
@@ -555,3 +624,283 @@ class Pagos(models.Model):
         if not self.data_ID_id and data.objects.exists():
             self.data_ID = data.objects.latest('data_ID')
         super().save(*args, **kwargs)
+
+
+class PdfCache(models.Model):
+    """
+    Índice de PDFs renderizados en caché
+    Cada entrada apunta a un PDF en disco identificado por el hash de su contexto
+    """
+    # Hash SHA-256 del template, su versión y el contexto serializado
+    cache_key = models.CharField(max_length=64, unique=True)
+
+    # Relación con UUID de sesión - permite invalidar por trámite
+    fuuid = models.ForeignKey(Uuid, on_delete=models.CASCADE, verbose_name="UUID")
+
+    # Template usado para renderizar (ej. documet/document.html)
+    template = models.CharField(max_length=100)
+
+    # PDF renderizado - almacenado en 'pdf_cache/'
+    archivo = models.FileField(upload_to='pdf_cache/')
+
+    # Tamaño en bytes, usado para el límite total de la caché
+    size = models.PositiveIntegerField(default=0)
+
+    # Documento final guardado a partir de esta entrada (evita duplicados)
+    files_FK = models.ForeignKey(Files, on_delete=models.SET_NULL, null=True, blank=True,
+                                 verbose_name="Documento final")
+
+    # Número de veces que se sirvió desde caché
+    hits = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Último acceso - criterio de desalojo (LRU)
+    last_access = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'pdf_cache'
+        ordering = ['last_access']
+
+    def __str__(self):
+        return f"{self.template} - {self.cache_key[:12]}"
+
+
+class Expediente(models.Model):
+    """
+    Expediente consolidado de una solicitud
+    PDF con la portada del trámite seguida de los adjuntos del ciudadano; los
+    adjuntos nuevos se anexan al expediente ya armado
+    """
+    expediente_ID = models.AutoField(primary_key=True)
+
+    # Solicitud a la que pertenece el expediente
+    soli_FK = models.OneToOneField(soli, on_delete=models.CASCADE, verbose_name="Solicitud")
+
+    # Documento final usado como portada; si cambia el expediente se reconstruye
+    portada_FK = models.ForeignKey(Files, on_delete=models.SET_NULL, null=True, blank=True,
+                                   verbose_name="Portada")
+
+    # PDF consolidado - almacenado en 'expedientes/'
+    archivo = models.FileField(upload_to='expedientes/', verbose_name="Expediente")
+
+    # IDs de SubirDocs ya incluidos, en el orden en que se agregaron
+    docs_incluidos = models.JSONField(default=list, blank=True)
+
+    # Número de páginas del expediente
+    paginas = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'expedientes'
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return f"Expediente {self.soli_FK_id}"
+
+
+class FolioCounter(models.Model):
+    """
+    Contador de folios por PUO y año
+    Cada worker reserva bloques de números (last_value avanza de bloque en
+    bloque), por lo que la mayoría de los folios se asignan sin consultar la BD
+    """
+    # Código del proceso (OFI, CRC, ... o CPP para presupuesto participativo)
+    puo = models.CharField(max_length=10)
+
+    # Año de los folios (los números reinician cada año)
+    year = models.PositiveSmallIntegerField()
+
+    # Último número reservado por algún worker
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'folio_counter'
+        unique_together = ('puo', 'year')
+        ordering = ['-year', 'puo']
+
+    def __str__(self):
+        return f"{self.puo}/{self.year}: {self.last_value}"
+
+
+class GeocodeCache(models.Model):
+    """
+    Caché compartida de resultados de geocodificación
+    Directa: clave = dirección normalizada. Inversa: clave = lat/lng
+    redondeadas. Los "no encontrado" se guardan con result vacío y TTL corto
+    """
+    KIND_CHOICES = [
+        ('forward', 'Dirección → coordenadas'),
+        ('reverse', 'Coordenadas → dirección'),
+    ]
+
+    # Clave de búsqueda (fwd:<dirección> o rev:<lat>,<lng>)
+    key = models.CharField(max_length=255, unique=True)
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+
+    # Resultado tal como lo devuelve LocalGISService; null = no encontrado
+    result = models.JSONField(null=True, blank=True)
+
+    # Proveedor que resolvió la búsqueda (ArcGIS, OpenStreetMap, LocalDB...)
+    source = models.CharField(max_length=50, blank=True)
+
+    # Vigencia de la entrada - al vencer se vuelve a consultar al proveedor
+    expires_at = models.DateTimeField(db_index=True)
+
+    # Número de veces que se sirvió desde la tabla
+    hits = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'geocode_cache'
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return self.key
+
+
+# === CATÁLOGO MUNICIPAL DE DOMICILIOS (copia local de WsDomicilios) ===
+
+class Colonia(models.Model):
+    """
+    Colonia del catálogo municipal
+    Se sincroniza desde WsDomicilios (GetColonias); la PK es el id del servicio
+    """
+    id_colonia = models.IntegerField(primary_key=True)
+
+    nombre = models.CharField(max_length=150)
+
+    # Nombre sin acentos ni signos, en minúsculas - usado para búsquedas
+    nombre_norm = models.CharField(max_length=150, db_index=True)
+
+    # Código postal si el servicio lo informa
+    cp = models.CharField(max_length=5, blank=True, default='')
+
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'catalogo_colonia'
+        ordering = ['nombre']
+
+    def __str__(self):
+        return self.nombre
+
+
+class Calle(models.Model):
+    """
+    Calle de una colonia del catálogo municipal (GetCalles)
+    El mismo id_calle puede aparecer en varias colonias
+    """
+    colonia = models.ForeignKey(Colonia, on_delete=models.CASCADE, related_name='calles')
+
+    id_calle = models.IntegerField()
+
+    nombre = models.CharField(max_length=150)
+
+    # Nombre normalizado (ver local_geocoder.normalize)
+    nombre_norm = models.CharField(max_length=150, db_index=True)
+
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'catalogo_calle'
+        unique_together = ('colonia', 'id_calle')
+        ordering = ['nombre']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.colonia_id})"
+
+
+class NumeroExterior(models.Model):
+    """
+    Número exterior con coordenadas del catálogo municipal (GetNumerosExteriores)
+    """
+    calle = models.ForeignKey(Calle, on_delete=models.CASCADE, related_name='numeros')
+
+    numero = models.CharField(max_length=20)
+
+    lat = models.FloatField(null=True, blank=True)
+
+    lng = models.FloatField(null=True, blank=True)
+
+    distrito = models.CharField(max_length=10, blank=True)
+
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'catalogo_numero_exterior'
+        unique_together = ('calle', 'numero')
+        ordering = ['calle', 'numero']
+
+    def __str__(self):
+        return f"{self.calle.nombre} {self.numero}"
+
+
+class CatalogSync(models.Model):
+    """
+    Resultado de una sincronización del catálogo municipal de domicilios
+    stats guarda por tabla (colonias, calles, numeros) los registros
+    creados, actualizados, eliminados y sin cambios
+    """
+    STATUS_CHOICES = [
+        ('running', 'En curso'),
+        ('success', 'Completa'),
+        ('partial', 'Con colonias fallidas'),
+        ('error', 'Error'),
+    ]
+
+    started_at = models.DateTimeField(auto_now_add=True)
+
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+
+    # Colonias recorridas y colonias cuyo servicio no respondió
+    colonias = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    # Consultas hechas a WsDomicilios
+    requests = models.PositiveIntegerField(default=0)
+
+    stats = models.JSONField(default=dict, blank=True)
+
+    error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'catalogo_sync'
+        ordering = ['-started_at']
+        verbose_name = 'Sincronización del catálogo'
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
+
+
+class BackfillCheckpoint(models.Model):
+    """
+    Avance de un proceso por lotes reanudable (ej. geocodificación de
+    solicitudes existentes). Se guarda al terminar cada lote
+    """
+    # Nombre del proceso (geocode:soli, geocode:pp...)
+    name = models.CharField(max_length=50, unique=True)
+
+    # Última clave primaria procesada - el siguiente lote empieza después
+    last_pk = models.BigIntegerField(default=0)
+
+    processed = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    # Fecha en que se recorrió la tabla completa (null = pendiente)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'backfill_checkpoint'
+        verbose_name = 'Avance de proceso por lotes'
+
+    def __str__(self):
+        return f"{self.name} (pk > {self.last_pk})"
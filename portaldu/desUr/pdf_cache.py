@@ -0,0 +1,161 @@
+"""
+Caché en disco de PDFs renderizados para DesUr
+Los PDFs se indexan por el hash de su contexto: si los datos del ciudadano,
+la solicitud, los adjuntos y el folio no cambian, el PDF se sirve desde
+media/pdf_cache/ sin volver a pasar por WeasyPrint
+"""
+import hashlib
+import json
+import logging
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.db.models.fields.files import FieldFile
+from django.db.models.query import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from .models import PdfCache, data, soli, SubirDocs
+from .pdf_service import render_pdf
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = getattr(settings, 'PDF_CACHE_MAX_ENTRIES', 500)
+MAX_BYTES = getattr(settings, 'PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+TEMPLATE_VERSION = getattr(settings, 'PDF_TEMPLATE_VERSION', '1')
+
+# Hash del código fuente de cada template, calculado una vez por proceso
+_template_hashes = {}
+
+
+def _template_hash(template_name):
+    """Hash del código fuente del template para invalidar al editarlo"""
+    if template_name not in _template_hashes:
+        source = get_template(template_name).template.source
+        _template_hashes[template_name] = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    return _template_hashes[template_name]
+
+
+def _serialize(value):
+    """Convierte valores del contexto a una forma estable para el hash"""
+    if isinstance(value, FieldFile):
+        return value.name or ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, QuerySet):
+        return [_serialize(obj) for obj in value.order_by('pk')]
+    if hasattr(value, '_meta'):
+        # Instancia de modelo: identificador más archivo, si tiene
+        return [value._meta.label, value.pk, _serialize(getattr(value, 'doc', ''))]
+    return str(value)
+
+
+def context_key(template_name, context):
+    """
+    Calcula la clave de caché de un render
+
+    Args:
+        template_name: Template del documento
+        context: Contexto completo que se pasará al template
+
+    Returns:
+        str: SHA-256 hexadecimal
+    """
+    payload = json.dumps(
+        [template_name, TEMPLATE_VERSION, _template_hash(template_name), context],
+        sort_keys=True, default=_serialize, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_or_render(template_name, context, uuid_obj):
+    """
+    Devuelve el PDF del contexto, renderizándolo solo si no está en caché
+
+    Args:
+        template_name: Template del documento (ej. documet/document.html)
+        context: Contexto del template
+        uuid_obj: Uuid del trámite, usado para invalidar
+
+    Returns:
+        tuple: (pdf_bytes, entry) donde entry es el PdfCache correspondiente
+    """
+    key = context_key(template_name, context)
+
+    entry = PdfCache.objects.filter(cache_key=key).first()
+    if entry:
+        try:
+            with entry.archivo.open('rb') as f:
+                pdf = f.read()
+            PdfCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_access=timezone.now())
+            logger.debug(f"PDF servido desde caché: {key[:12]}")
+            return pdf, entry
+        except (OSError, ValueError):
+            logger.warning(f"Archivo de caché perdido, se vuelve a renderizar: {key[:12]}")
+            entry.delete()
+
+    pdf = render_pdf(render_to_string(template_name, context))
+
+    entry = PdfCache(cache_key=key, fuuid=uuid_obj, template=template_name, size=len(pdf))
+    entry.archivo.save(f'{key}.pdf', ContentFile(pdf), save=False)
+    try:
+        entry.save()
+    except IntegrityError:
+        # Otro proceso guardó la misma clave al mismo tiempo
+        entry.archivo.delete(save=False)
+        entry = PdfCache.objects.get(cache_key=key)
+
+    evict()
+    return pdf, entry
+
+
+def evict():
+    """Desaloja las entradas menos usadas hasta cumplir los límites"""
+    total = PdfCache.objects.count()
+    size = PdfCache.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total <= MAX_ENTRIES and size <= MAX_BYTES:
+        return
+
+    removed = 0
+    for entry in PdfCache.objects.order_by('last_access').iterator():
+        if total <= MAX_ENTRIES and size <= MAX_BYTES:
+            break
+        total -= 1
+        size -= entry.size
+        _delete_entry(entry)
+        removed += 1
+    logger.info(f"Caché de PDF: {removed} entradas desalojadas")
+
+
+def invalidate(fuuid_id):
+    """Elimina todas las entradas de caché de un trámite"""
+    for entry in PdfCache.objects.filter(fuuid_id=fuuid_id):
+        _delete_entry(entry)
+
+
+def _delete_entry(entry):
+    entry.archivo.delete(save=False)
+    entry.delete()
+
+
+# Invalidación: cualquier cambio en los datos que alimentan el documento
+@receiver(post_save, sender=data)
+def invalidate_data(sender, instance, **kwargs):
+    invalidate(instance.fuuid_id)
+
+
+@receiver(post_save, sender=soli)
+def invalidate_soli(sender, instance, **kwargs):
+    if instance.data_ID_id:
+        invalidate(instance.data_ID.fuuid_id)
+
+
+@receiver(post_save, sender=SubirDocs)
+@receiver(post_delete, sender=SubirDocs)
+def invalidate_docs(sender, instance, **kwargs):
+    invalidate(instance.fuuid_id)
@@ -0,0 +1,305 @@
+"""
+Pool de procesos para renderizar PDF con WeasyPrint
+Los procesos hijos se inician una sola vez con WeasyPrint importado, las
+fuentes descubiertas y la hoja de estilos de impresión ya procesada. Cada
+render tiene tiempo límite y el proceso tiene un techo de memoria, así un
+template defectuoso o una foto enorme no afecta al worker web
+
+Cada proceso atiende un documento a la vez por su propio canal: si excede el
+tiempo límite o muere (techo de memoria, fallo en pango/cairo) solo ese
+proceso se reemplaza y los demás documentos en curso no se enteran
+"""
+import atexit
+import logging
+import multiprocessing
+import queue
+import threading
+from multiprocessing.connection import wait
+
+logger = logging.getLogger(__name__)
+
+# HTML mínimo para calentar el proceso: fuerza la carga de fuentes y de la
+# hoja de estilos de impresión a través del mismo fetcher que usan los documentos
+WARMUP_HTML = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="UTF-8">
+<link rel="stylesheet" href="/static/styles/pdf-print.css">
+</head><body><div class="container"><h1>Civitas</h1>
+<table class="table"><tr><td>Calentamiento</td></tr></table></div></body></html>"""
+
+# Segundos que se espera a que un proceso termine por su cuenta al cerrarlo
+STOP_TIMEOUT = 5
+
+
+class PdfRenderError(Exception):
+    """El pool no pudo generar el documento"""
+    pass
+
+
+class PdfRenderTimeout(PdfRenderError):
+    """El render excedió el tiempo límite; el proceso que lo atendía se reemplazó"""
+    pass
+
+
+class PdfRendererDied(PdfRenderError):
+    """El proceso renderer terminó sin responder (techo de memoria o fallo nativo)"""
+    pass
+
+
+# === CÓDIGO QUE CORRE EN LOS PROCESOS HIJOS ===
+# Recibe el HTML ya renderizado. Al deserializar el fetcher se importa
+# pdf_service y con él la configuración de Django, pero no se llama a
+# django.setup() ni se usa la base de datos
+
+_font_config = None
+
+
+def _init_worker(memory_mb, base_url, url_fetcher):
+    """Inicializa el proceso hijo: calentamiento y después límite de memoria"""
+    global _font_config
+
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    _font_config = FontConfiguration()
+    try:
+        HTML(string=WARMUP_HTML, base_url=base_url, url_fetcher=url_fetcher).write_pdf(
+            font_config=_font_config)
+    except Exception as e:
+        logger.warning(f"Error al calentar renderer PDF: {e}")
+
+    # El techo se aplica ya con WeasyPrint y las fuentes cargados: limita
+    # lo que crece un documento, no el arranque del proceso
+    if memory_mb:
+        try:
+            import resource
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            logger.warning(f"No se pudo aplicar límite de memoria al renderer: {e}")
+
+
+def _render_job(html, base_url, url_fetcher):
+    """Renderiza un documento en el proceso hijo y devuelve los bytes"""
+    from weasyprint import HTML
+    return HTML(string=html, base_url=base_url, url_fetcher=url_fetcher).write_pdf(
+        font_config=_font_config)
+
+
+def _worker_main(conn, memory_mb, base_url, url_fetcher):
+    """Ciclo del proceso hijo: recibe HTML y responde ('ok', pdf) o ('error', tipo, mensaje)"""
+    _init_worker(memory_mb, base_url, url_fetcher)
+    while True:
+        try:
+            html = conn.recv()
+        except (EOFError, OSError):
+            break
+        if html is None:
+            break
+        try:
+            reply = ('ok', _render_job(html, base_url, url_fetcher))
+        except MemoryError:
+            reply = ('error', 'memory', 'El documento excedió el límite de memoria del renderer')
+        except Exception as e:
+            reply = ('error', type(e).__name__, str(e))
+        conn.send(reply)
+
+
+# === CÓDIGO DEL PROCESO WEB ===
+
+class _Renderer:
+    """Un proceso renderer y su canal"""
+
+    def __init__(self, ctx, initargs):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, *initargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def render(self, html, timeout):
+        """
+        Envía el documento y espera la respuesta
+
+        Raises:
+            PdfRenderTimeout: Sin respuesta en timeout segundos
+            PdfRendererDied: El proceso terminó antes de responder
+        """
+        try:
+            self.conn.send(html)
+        except (BrokenPipeError, OSError) as e:
+            raise PdfRendererDied(f"El renderer PDF no está disponible: {e}")
+
+        # El sentinel se activa si el proceso muere; el canal, al responder
+        if not wait([self.conn, self.process.sentinel], timeout):
+            raise PdfRenderTimeout(f"El documento tardó más de {timeout} segundos")
+        try:
+            if not self.conn.poll():
+                raise EOFError
+            reply = self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join(STOP_TIMEOUT)
+            raise PdfRendererDied(
+                f"El renderer PDF terminó sin responder (código {self.process.exitcode})")
+
+        self.jobs += 1
+        if reply[0] == 'ok':
+            return reply[1]
+        if reply[1] == 'memory':
+            raise MemoryError(reply[2])
+        raise PdfRenderError(f"{reply[1]}: {reply[2]}")
+
+    def stop(self, kill=False):
+        """Cierra el proceso; kill=True lo termina sin esperar"""
+        if not kill and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(STOP_TIMEOUT)
+            except OSError:
+                pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(STOP_TIMEOUT)
+        self.conn.close()
+
+
+class PdfRenderPool:
+    """
+    Pool de renderers PDF del proceso actual
+
+    Args:
+        processes: Número de procesos renderer
+        timeout: Segundos máximos por documento
+        memory_mb: Techo de memoria virtual por proceso (0 = sin límite)
+        max_jobs: Documentos por proceso antes de reciclarlo
+        base_url: URL base de los templates
+        url_fetcher: Fetcher local (debe poder serializarse con pickle)
+    """
+
+    def __init__(self, processes, timeout, memory_mb, max_jobs, base_url, url_fetcher):
+        self.processes = processes
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_jobs = max_jobs
+        self.base_url = base_url
+        self.url_fetcher = url_fetcher
+        self._ctx = None
+        # Renderers libres; quien toma uno lo usa en exclusiva
+        self._idle = queue.Queue()
+        self._started = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        return _Renderer(self._ctx, (self.memory_mb, self.base_url, self.url_fetcher))
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            # forkserver evita heredar hilos y conexiones del worker web
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._ctx = multiprocessing.get_context(method)
+            for _ in range(self.processes):
+                self._idle.put(self._spawn())
+            self._started = True
+            self._closed = False
+            logger.info(f"Pool de renderers PDF iniciado ({self.processes} procesos, {method})")
+
+    def _release(self, renderer):
+        """Devuelve el renderer al pool, reciclándolo si ya atendió max_jobs"""
+        if self._closed:
+            renderer.stop()
+            return
+        if self.max_jobs and renderer.jobs >= self.max_jobs:
+            renderer.stop()
+            renderer = self._spawn()
+        self._idle.put(renderer)
+
+    def warm(self):
+        """Arranca los procesos sin esperar a la primera petición"""
+        self._start()
+
+    def render(self, html):
+        """
+        Renderiza HTML a PDF en un proceso del pool
+
+        Returns:
+            bytes: PDF generado
+
+        Raises:
+            PdfRenderTimeout: Si el documento excede el tiempo límite (incluye
+                la espera por un renderer libre)
+            PdfRendererDied: Si el proceso murió durante el render
+            PdfRenderError: Si WeasyPrint falló con el documento
+            MemoryError: Si el proceso alcanzó su techo de memoria
+        """
+        self._start()
+        try:
+            renderer = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PdfRenderTimeout(f"Sin renderer PDF libre después de {self.timeout} segundos")
+
+        try:
+            return renderer.render(html, self.timeout)
+        except (PdfRenderTimeout, PdfRendererDied) as e:
+            # Solo se reemplaza el proceso de este documento
+            logger.error(f"{e}; se reemplaza el renderer {renderer.process.pid}")
+            renderer.stop(kill=True)
+            renderer = self._spawn()
+            raise
+        finally:
+            self._release(renderer)
+
+    def close(self):
+        """Termina los renderers libres; los ocupados se cierran al terminar su documento"""
+        with self._lock:
+            self._closed = True
+            self._started = False
+            while True:
+                try:
+                    self._idle.get_nowait().stop()
+                except queue.Empty:
+                    break
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """
+    Pool del proceso actual, o None si debe renderizarse en línea
+
+    Se renderiza en línea cuando PDF_RENDER_POOL_SIZE es 0, cuando WeasyPrint
+    no está disponible o dentro de procesos daemon (workers prefork de Celery),
+    que no pueden crear procesos hijos
+    """
+    global _render_pool
+    from django.conf import settings
+    from .pdf_service import WEASYPRINT_AVAILABLE, PDF_BASE_URL, get_url_fetcher
+
+    size = getattr(settings, 'PDF_RENDER_POOL_SIZE', 1)
+    if not size or not WEASYPRINT_AVAILABLE or multiprocessing.current_process().daemon:
+        return None
+
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = PdfRenderPool(
+                processes=size,
+                timeout=getattr(settings, 'PDF_RENDER_TIMEOUT', 60),
+                memory_mb=getattr(settings, 'PDF_RENDER_MEMORY_MB', 1024),
+                max_jobs=getattr(settings, 'PDF_RENDER_MAX_JOBS', 100),
+                base_url=PDF_BASE_URL,
+                url_fetcher=get_url_fetcher(),
+            )
+            atexit.register(_render_pool.close)
+        return _render_pool
+
+
+def shutdown_render_pool():
+    """Termina el pool del proceso si llegó a crearse"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.close()
+            _render_pool = None
@@ -0,0 +1,178 @@
+"""
+Servicio de renderizado PDF para DesUr
+Convierte los templates de documentos a PDF con WeasyPrint sin realizar
+peticiones de red: hojas de estilo, logos y fotografías se leen directo
+de disco (STATIC_ROOT / MEDIA_ROOT)
+"""
+import logging
+import mimetypes
+import os
+from urllib.parse import urlsplit, unquote
+
+from django.apps import apps
+from django.conf import settings
+
+# Imports para PDF (weasyprint)
+try:
+    from weasyprint import HTML, default_url_fetcher
+    WEASYPRINT_AVAILABLE = True
+except ImportError:
+    WEASYPRINT_AVAILABLE = False
+
+    # Si weasyprint no está disponible, crear un mock
+    class HTML:
+        def __init__(self, **kwargs):
+            pass
+        def write_pdf(self, target=None):
+            return b"PDF content not available"
+
+    def default_url_fetcher(url, *args, **kwargs):
+        raise ValueError(f"weasyprint no disponible: {url}")
+
+logger = logging.getLogger(__name__)
+
+# URL base ficticia para los templates de PDF. Las rutas relativas generadas por
+# {% static %} y FieldFile.url se resuelven contra ella y el fetcher las traduce
+# a archivos locales, por lo que el render no depende del request ni del host.
+PDF_BASE_URL = getattr(settings, 'PDF_BASE_URL', 'http://civitas.local/')
+
+
+class LocalAssetFetcher:
+    """
+    URL fetcher para WeasyPrint que resuelve recursos desde disco
+
+    Reglas:
+        - data: se delega al fetcher por defecto (no hace E/S de red)
+        - /static/... y /media/... del host interno se leen de disco
+        - Cualquier otra URL (CDN, hosts externos, file://) se rechaza
+
+    Args:
+        base_url: URL base usada en el render (define el host interno)
+        static_roots: Directorios donde buscar archivos estáticos, en orden
+        media_root: Directorio raíz de archivos subidos
+        static_url: Prefijo de URL de estáticos (ej. '/static/')
+        media_url: Prefijo de URL de media (ej. '/media/')
+
+    Note:
+        Los atributos son strings/listas simples para que la instancia pueda
+        enviarse a procesos hijos sin depender de Django.
+    """
+
+    def __init__(self, base_url, static_roots, media_root, static_url='/static/', media_url='/media/'):
+        self.host = urlsplit(base_url).netloc
+        self.static_roots = [str(root) for root in static_roots if root]
+        self.media_root = str(media_root) if media_root else None
+        self.static_url = static_url
+        self.media_url = media_url
+
+    def __call__(self, url, *args, **kwargs):
+        if url.startswith('data:'):
+            return default_url_fetcher(url, *args, **kwargs)
+
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or parts.netloc != self.host:
+            logger.warning(f"Recurso externo bloqueado en render PDF: {url}")
+            raise ValueError(f"Recurso externo no permitido: {url}")
+
+        path = unquote(parts.path)
+        if path.startswith(self.static_url):
+            file_path = self._find(path[len(self.static_url):], self.static_roots)
+        elif path.startswith(self.media_url):
+            file_path = self._find(path[len(self.media_url):], [self.media_root])
+        else:
+            file_path = None
+
+        if not file_path:
+            logger.warning(f"Recurso local no encontrado para PDF: {url}")
+            raise ValueError(f"Recurso no encontrado: {url}")
+
+        mime_type, _ = mimetypes.guess_type(file_path)
+        return {
+            'file_obj': open(file_path, 'rb'),
+            'mime_type': mime_type,
+            'redirected_url': url,
+            'path': file_path,
+        }
+
+    @staticmethod
+    def _find(relative_path, roots):
+        """Busca el archivo en las raíces indicadas evitando salir de ellas"""
+        for root in roots:
+            if not root:
+                continue
+            root = os.path.realpath(root)
+            candidate = os.path.realpath(os.path.join(root, relative_path))
+            if not candidate.startswith(root + os.sep):
+                continue
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+
+def get_static_roots():
+    """
+    Directorios de estáticos en orden de prioridad
+
+    Returns:
+        list: STATIC_ROOT (archivos de collectstatic, incluye nombres con hash),
+              STATICFILES_DIRS y la carpeta static/ de cada app instalada
+    """
+    roots = [settings.STATIC_ROOT]
+    roots.extend(str(d[1] if isinstance(d, (list, tuple)) else d)
+                 for d in getattr(settings, 'STATICFILES_DIRS', []))
+    for app_config in apps.get_app_configs():
+        app_static = os.path.join(app_config.path, 'static')
+        if os.path.isdir(app_static):
+            roots.append(app_static)
+    return roots
+
+
+_url_fetcher = None
+
+
+def get_url_fetcher():
+    """Devuelve el fetcher local del proceso (se construye una sola vez)"""
+    global _url_fetcher
+    if _url_fetcher is None:
+        _url_fetcher = LocalAssetFetcher(
+            base_url=PDF_BASE_URL,
+            static_roots=get_static_roots(),
+            media_root=settings.MEDIA_ROOT,
+            static_url=settings.STATIC_URL,
+            media_url=settings.MEDIA_URL,
+        )
+    return _url_fetcher
+
+
+def render_pdf(html, target=None):
+    """
+    Convierte HTML a PDF sin acceso a red
+
+    El render se hace en el pool de procesos precalentados (pdf_pool) cuando
+    está habilitado; si no, en el proceso actual
+
+    Args:
+        html: String con el HTML ya renderizado del template
+        target: Archivo o buffer destino (opcional)
+
+    Returns:
+        bytes con el PDF si no se indica target, None en caso contrario
+
+    Raises:
+        PdfRenderError: Si el render en el pool excede PDF_RENDER_TIMEOUT
+            (PdfRenderTimeout), el renderer muere (PdfRendererDied) o
+            WeasyPrint falla con el documento
+        MemoryError: Si el renderer alcanzó PDF_RENDER_MEMORY_MB
+    """
+    from .pdf_pool import get_render_pool
+
+    pool = get_render_pool()
+    if pool is None:
+        pdf_out = HTML(string=html, base_url=PDF_BASE_URL, url_fetcher=get_url_fetcher())
+        return pdf_out.write_pdf(target)
+
+    pdf = pool.render(html)
+    if target is None:
+        return pdf
+    target.write(pdf)
+    return None
@@ -0,0 +1,169 @@
+"""
+Impresión por lotes de trámites
+Une en un solo PDF los documentos de varias solicitudes: reutiliza el
+finalDoc ya guardado de cada una y renderiza en paralelo solo las que no
+tienen documento. Los renders intermedios y el resultado van a archivos
+temporales y la respuesta se envía en streaming desde disco
+
+La unión no es de memoria acotada: pypdf carga en el PdfWriter todas las
+páginas del lote antes de escribirlo. Por eso el lote se limita en número
+de documentos (PRINT_RUN_MAX_DOCS) y en tamaño total de los PDF a unir
+(PRINT_RUN_MAX_BYTES), que es aproximadamente la memoria que ocupa
+"""
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .documents import build_document_context
+from .models import Files, soli
+from .pdf_service import render_pdf
+
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+MAX_DOCS = getattr(settings, 'PRINT_RUN_MAX_DOCS', 200)
+RENDER_WORKERS = getattr(settings, 'PRINT_RUN_WORKERS', 4)
+# Tamaño total (bytes) de los PDF de un lote
+MAX_BYTES = getattr(settings, 'PRINT_RUN_MAX_BYTES', 150 * 1024 * 1024)
+
+
+class PrintRunError(Exception):
+    """Error de validación del lote (vacío, demasiado grande, sin pypdf)"""
+    pass
+
+
+def resolve_solicitudes(file_ids=None, soli_ids=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Obtiene las solicitudes del lote en orden de fecha
+
+    Args:
+        file_ids: IDs de Files (se toma la solicitud de cada documento)
+        soli_ids: IDs de soli
+        fecha_inicio, fecha_fin: Rango de fechas (date) de la solicitud
+
+    Returns:
+        list: Instancias de soli sin repetir
+
+    Raises:
+        PrintRunError: Si el lote está vacío o excede PRINT_RUN_MAX_DOCS
+    """
+    ids = set(soli_ids or [])
+    if file_ids:
+        ids.update(Files.objects.filter(fDoc_ID__in=file_ids, soli_FK__isnull=False)
+                   .values_list('soli_FK_id', flat=True))
+
+    queryset = soli.objects.none()
+    if ids:
+        queryset = soli.objects.filter(soli_ID__in=ids)
+    if fecha_inicio and fecha_fin:
+        queryset = queryset | soli.objects.filter(fecha__date__range=(fecha_inicio, fecha_fin))
+
+    solicitudes = list(queryset.select_related('data_ID__fuuid').order_by('fecha')[:MAX_DOCS + 1])
+    if not solicitudes:
+        raise PrintRunError("No hay solicitudes para imprimir")
+    if len(solicitudes) > MAX_DOCS:
+        raise PrintRunError(f"El lote excede el máximo de {MAX_DOCS} documentos")
+    return solicitudes
+
+
+def _stored_document(solicitud):
+    """Ruta del último finalDoc guardado de la solicitud, si existe en disco"""
+    doc = Files.objects.filter(soli_FK=solicitud).exclude(finalDoc='').order_by('-fDoc_ID').first()
+    if doc and doc.finalDoc.storage.exists(doc.finalDoc.name):
+        return doc.finalDoc.path
+    return None
+
+
+def _source_size(source):
+    """Tamaño en bytes de una ruta o de un archivo temporal"""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return os.fstat(source.fileno()).st_size
+
+
+def _check_size(total):
+    if total > MAX_BYTES:
+        raise PrintRunError(
+            f"Los documentos del lote suman {total / (1024 * 1024):.1f} MB, el máximo es "
+            f"{MAX_BYTES / (1024 * 1024):.1f} MB; reduzca el rango de fechas o la selección")
+
+
+def _render_to_tempfile(html):
+    """Renderiza un documento y lo deja en un archivo temporal"""
+    tmp = tempfile.TemporaryFile(suffix='.pdf')
+    render_pdf(html, tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def build_print_run(solicitudes):
+    """
+    Une los documentos de las solicitudes en un solo PDF
+
+    Args:
+        solicitudes: Lista de soli en el orden de impresión
+
+    Returns:
+        file: Archivo temporal con el PDF unido, posicionado al inicio
+
+    Raises:
+        PrintRunError: Si pypdf no está instalado o los documentos exceden
+            PRINT_RUN_MAX_BYTES
+    """
+    if PdfWriter is None:
+        raise PrintRunError("pypdf no está instalado, no es posible unir documentos")
+
+    sources = []
+    pending = []
+    for solicitud in solicitudes:
+        path = _stored_document(solicitud)
+        if path:
+            sources.append(path)
+            continue
+
+        # El contexto se arma aquí porque usa la BD; en los hilos solo se renderiza
+        datos = solicitud.data_ID
+        context, *_ = build_document_context(str(datos.fuuid.uuid), datos.asunto, solicitud.puo)
+        context['documentos'] = list(context['documentos'])
+        html = render_to_string("documet/document.html", context)
+        sources.append(None)
+        pending.append((len(sources) - 1, html))
+
+    logger.info(f"Impresión por lotes: {len(sources) - len(pending)} guardados, {len(pending)} por renderizar")
+
+    # Los guardados se revisan antes de renderizar para no hacerlo en vano
+    _check_size(sum(_source_size(source) for source in sources if source is not None))
+
+    writer = PdfWriter()
+    output = tempfile.TemporaryFile(suffix='.pdf')
+    try:
+        with ThreadPoolExecutor(max_workers=RENDER_WORKERS) as executor:
+            futures = [(index, executor.submit(_render_to_tempfile, html)) for index, html in pending]
+            for index, future in futures:
+                sources[index] = future.result()
+        _check_size(sum(_source_size(source) for source in sources))
+
+        # pypdf lee el contenido de cada página al escribir, por eso los
+        # temporales se cierran hasta el final
+        for source in sources:
+            writer.append(source)
+        writer.write(output)
+    except Exception:
+        output.close()
+        raise
+    finally:
+        writer.close()
+        for source in sources:
+            if source is not None and not isinstance(source, str):
+                source.close()
+
+    output.seek(0)
+    return output
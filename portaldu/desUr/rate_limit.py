@@ -0,0 +1,105 @@
+"""
+Límite de consultas salientes compartido entre procesos
+La política de uso de Nominatim permite ~1 consulta por segundo para toda
+la instalación, no por worker. El tiempo se divide en ranuras de 1/rate
+segundos y cada consulta reserva la primera ranura libre con cache.add
+(atómico en Redis) en la caché compartida: si la ranura está en el futuro
+la consulta espera su turno; si no hay ranura libre dentro de la espera
+máxima falla de inmediato en lugar de bloquear al worker
+"""
+import logging
+import math
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+logger = logging.getLogger(__name__)
+
+# Proveedor -> consultas por segundo y espera máxima por un turno (s)
+LIMITS = {
+    'nominatim': {
+        'rate': getattr(settings, 'NOMINATIM_RATE', 1.0),
+        'max_wait': getattr(settings, 'NOMINATIM_MAX_WAIT', 1.5),
+    },
+    # Recorrido nocturno del catálogo municipal (address_catalog.sync_catalog)
+    'wsdomicilios': {
+        'rate': getattr(settings, 'CATALOG_SYNC_RATE', 5.0),
+        'max_wait': 60.0,
+    },
+}
+
+
+class RateLimitExceeded(requests.exceptions.ConnectionError):
+    """No hubo turno libre antes del plazo; se trata como error de conexión"""
+    pass
+
+
+def _cache():
+    try:
+        return caches['shared']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+class RateLimiter:
+    """Turnos de un proveedor a rate consultas por segundo entre todos los procesos"""
+
+    def __init__(self, name, rate, max_wait):
+        self.name = name
+        self.interval = 1.0 / rate
+        self.max_wait = max_wait
+
+    def acquire(self, max_wait=None):
+        """
+        Reserva un turno y espera hasta que llegue
+
+        Args:
+            max_wait: Segundos máximos de espera (default: el del proveedor)
+
+        Returns:
+            float: Segundos esperados
+
+        Raises:
+            RateLimitExceeded: Si no hay turno libre dentro de max_wait
+        """
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        cache = _cache()
+        now = time.time()
+        # La ranura en curso cuenta: si está libre la consulta sale sin esperar
+        first = math.floor(now / self.interval)
+        last = math.floor((now + max(max_wait, 0)) / self.interval)
+        timeout = math.ceil(max_wait + self.interval) + 1
+
+        for slot in range(first, last + 1):
+            taken = cache.add(f'gis:rate:{self.name}:{slot}', 1, timeout=timeout)
+            if taken is None:
+                # Redis no disponible (IGNORE_EXCEPTIONS): no se limita
+                logger.debug(f"Límite de {self.name} sin caché compartida - se omite")
+                return 0.0
+            if taken:
+                delay = slot * self.interval - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                return max(delay, 0.0)
+
+        raise RateLimitExceeded(f"Sin turno para {self.name} en {max_wait:.1f}s")
+
+
+def get_limiter(name):
+    """RateLimiter del proveedor o None si no tiene límite"""
+    config = LIMITS.get(name)
+    if config is None:
+        return None
+    return RateLimiter(name, config['rate'], config['max_wait'])
+
+
+def wait_budget(timeout):
+    """Espera admisible para una consulta con este timeout: la mitad del total"""
+    if timeout is None:
+        return None
+    if isinstance(timeout, (tuple, list)):
+        timeout = sum(t for t in timeout if t)
+    return timeout / 2
@@ -17,6 +17,7 @@ Características principales:
 from rest_framework import serializers
 from django.core.validators import RegexValidator
 from .models import Files, data, Uuid, soli, SubirDocs
+from .folios import allocate_folio
 import phonenumbers
 from phonenumbers import NumberParseException
 import logging
@@ -39,7 +40,7 @@ class FilesSerializer(serializers.ModelSerializer):
     Fields:
         - fDoc_ID: ID único del documento
         - nomDoc: Nombre del documento
-        - finalDoc: Archivo PDF del documento final
+        - finalDoc: Archivo PDF del documento final (se lee como URL de file_download)
         - fuuid: UUID de sesión asociado
         - soli_FK: Solicitud asociada (opcional)
     """
@@ -84,6 +85,19 @@ class FilesSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    def to_representation(self, instance):
+        """
+        finalDoc se devuelve como la URL protegida de file_download; nginx
+        ya no sirve /media/documents/ directamente
+        """
+        ret = super().to_representation(instance)
+        url = instance.get_download_url()
+        request = self.context.get('request')
+        if url and request is not None:
+            url = request.build_absolute_uri(url)
+        ret['finalDoc'] = url or None
+        return ret
+
 class UuidSerializer(serializers.ModelSerializer):
     """
     Serializer para el modelo Uuid (identificadores únicos de sesión).
@@ -370,6 +384,13 @@ class SolicitudSerializer(serializers.ModelSerializer):
             'folio'            # Número de folio oficial
         ]
 
+    def create(self, validated_data):
+        # Folio consecutivo por PUO y año si la app no envía uno
+        if not validated_data.get('folio'):
+            ciudadano = validated_data['data_ID']
+            validated_data['folio'] = allocate_folio(validated_data.get('puo'), ciudadano.fuuid.uuid)
+        return super().create(validated_data)
+
 
 class DocumentoSerializer(serializers.ModelSerializer):
     """
@@ -390,13 +411,26 @@ class DocumentoSerializer(serializers.ModelSerializer):
         - fuuid: UUID de sesión asociado (FK)
         - nomDoc: Nombre del archivo
         - descDoc: Descripción del contenido del documento
-        - doc: Archivo adjunto (PDF, imagen, etc.)
+        - doc: Archivo adjunto (PDF, imagen, etc.; se lee como URL de adjunto_download)
     """
 
     class Meta:
         model = SubirDocs      # Modelo Django asociado para documentos temporales
         fields = '__all__'     # Incluir todos los campos del modelo
 
+    def to_representation(self, instance):
+        """
+        doc se devuelve como la URL protegida de adjunto_download; nginx
+        ya no sirve /media/documents/ directamente
+        """
+        ret = super().to_representation(instance)
+        url = instance.get_download_url()
+        request = self.context.get('request')
+        if url and request is not None:
+            url = request.build_absolute_uri(url)
+        ret['doc'] = url or None
+        return ret
+
     def validate_doc(self, value):
         """
         Valida el archivo adjunto (tamaño, tipo, etc.).
@@ -1,10 +1,75 @@
 import requests
+import hashlib
 import logging
+import os
+import threading
+import time
 import urllib.parse
 import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from . import address_normalizer, circuit_breaker, geocache, local_geocoder, singleflight, spatial_index
+from .circuit_breaker import CircuitOpenError
+from .rate_limit import RateLimitExceeded
 
 logger = logging.getLogger(__name__)
 
+# Estrategia concurrente de geocodificación: plazo total por búsqueda,
+# retraso antes de lanzar el proveedor de respaldo y score aceptable
+GEOCODE_DEADLINE = getattr(settings, 'GEOCODE_DEADLINE', 4.0)
+GEOCODE_HEDGE_DELAY = getattr(settings, 'GEOCODE_HEDGE_DELAY', 0.4)
+GEOCODE_ACCEPT_SCORE = getattr(settings, 'GEOCODE_ACCEPT_SCORE', 80)
+GEOCODE_MAX_WORKERS = getattr(settings, 'GEOCODE_MAX_WORKERS', 8)
+
+# Vigencia (s) de las respuestas de Nominatim en la caché compartida
+NOMINATIM_CACHE_TTL = getattr(settings, 'NOMINATIM_CACHE_TTL', 24 * 3600)
+
+# Score de OSM según el nivel de la coincidencia (place_rank de Nominatim):
+# casa o edificio, calle, colonia o CP; cualquier cosa más amplia queda en
+# OSM_MIN_SCORE. Solo una coincidencia de domicilio alcanza GEOCODE_ACCEPT_SCORE
+OSM_RANK_SCORES = ((30, 85), (26, 70), (17, 60))
+OSM_MIN_SCORE = 40
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _shared_cache():
+    try:
+        return caches['shared']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+class GeocodeDeadlineExceeded(Exception):
+    """Ningún proveedor respondió dentro del plazo; el resultado no se cachea"""
+    pass
+
+
+class GeocodeUnavailable(Exception):
+    """
+    Un proveedor falló (red, error HTTP) sin decir si la dirección existe;
+    a diferencia de None ("no encontrado") el resultado no se cachea
+    """
+    pass
+
+
+def _get_executor():
+    """Pool de hilos del proceso para las consultas concurrentes (se recrea tras fork)"""
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=GEOCODE_MAX_WORKERS, thread_name_prefix='geocode')
+            _executor_pid = os.getpid()
+        return _executor
+
+
 class LocalGISService:
     """Servicio para usar ArcGIS Server local"""
 
@@ -30,77 +95,44 @@ class LocalGISService:
 
     @staticmethod
     def get_service_status():
-        """Verificar el estado de los servicios de geocodificación"""
-        status = {}
-
-        # Verificar ArcGIS Server
-        try:
-            response = requests.get(f"{LocalGISService.BASE_URL}?f=json", timeout=5, verify=False)
-            status['arcgis_server'] = {
-                'available': response.status_code == 200,
-                'response_time': response.elapsed.total_seconds()
-            }
-        except:
-            status['arcgis_server'] = {
-                'available': False,
-                'response_time': None
-            }
-
-        # Verificar OpenStreetMap
-        try:
-            response = requests.get("https://nominatim.openstreetmap.org/status", timeout=5)
-            status['openstreetmap'] = {
-                'available': response.status_code == 200,
-                'response_time': response.elapsed.total_seconds()
-            }
-        except:
-            status['openstreetmap'] = {
-                'available': False,
-                'response_time': None
-            }
-
+        """
+        Estado de los servicios de geocodificación
+
+        Devuelve el último sondeo de la tarea probe_geocoding_providers junto
+        con el estado de cada breaker; solo sondea en vivo si no hay uno
+        reciente (beat detenido)
+        """
+        status = circuit_breaker.get_status()
+        if status is None or time.time() - status['checked_at'] > 5 * 60:
+            LocalGISService.probe_services()
+            status = circuit_breaker.get_status()
         return status
 
     @staticmethod
-    def _clean_address(address):
-        """Limpia y normaliza la dirección"""
-        if not address:
-            return ""
-
-        # Convertir a minúsculas y limpiar espacios
-        clean = address.strip().lower()
-
-        # Normalizar abreviaciones comunes
-        replacements = {
-            'av.': 'avenida',
-            'ave.': 'avenida',
-            'c.': 'calle',
-            'col.': 'colonia',
-            'fracc.': 'fraccionamiento',
-            'priv.': 'privada',
-            'blvd.': 'boulevard',
-            'prol.': 'prolongación',
-            'calz.': 'calzada',
-            'carr.': 'carretera',
-            'no.': 'número',
-            'núm.': 'número',
-            '#': 'número'
-        }
-
-        for abbrev, full in replacements.items():
-            clean = clean.replace(abbrev, full)
+    def probe_services():
+        """Sondea ArcGIS (geocode y reverse) y Nominatim y actualiza los breakers"""
+        arcgis = circuit_breaker.probe('arcgis_geocode', f"{LocalGISService.BASE_URL}?f=json")
+        reverse = circuit_breaker.probe(
+            'arcgis_reverse', f"{LocalGISService.GEOCODE_URL}/reverseGeocode",
+            params={'location': '-106.0889,28.6353', 'f': 'json'}
+        )
+        osm = circuit_breaker.probe('nominatim', "https://nominatim.openstreetmap.org/status")
+
+        return circuit_breaker.save_status({
+            'arcgis_server': arcgis,
+            'arcgis_reverse': reverse,
+            'openstreetmap': osm,
+        })
 
-        # Limpiar espacios múltiples
-        clean = ' '.join(clean.split())
-
-        return clean
+    @staticmethod
+    def _clean_address(address):
+        """Limpia y normaliza la dirección (ver address_normalizer.clean)"""
+        return address_normalizer.clean(address)
 
     @staticmethod
     def _is_postal_code(address):
         """Detecta si la dirección es principalmente un código postal"""
-        # Código postal mexicano: 5 dígitos
-        postal_pattern = r'^\s*\d{5}\s*$'
-        return bool(re.match(postal_pattern, address.strip()))
+        return address_normalizer.is_postal_code(address)
 
     @staticmethod
     def _has_street_number(address):
@@ -181,27 +213,16 @@ class LocalGISService:
 
             logger.info(f"Geocodificando con ArcGIS (timeout={timeout}s): {clean_address}")
 
-            response = requests.get(
-                url,
-                params=params,
-                timeout=timeout,
-                verify=False,
-                headers={
-                    'User-Agent': 'DesUr-LocalGIS/1.0',
-                    'Accept': 'application/json',
-                    'Connection': 'close'  # Evitar conexiones persistentes
-                }
-            )
+            # Sesión keep-alive del pool: sin handshake TCP/TLS por consulta
+            response = circuit_breaker.guarded_get('arcgis_geocode', url, params=params, timeout=timeout)
 
             if response.status_code != 200:
-                logger.warning(f"ArcGIS respondió con código {response.status_code}")
-                return None
+                raise GeocodeUnavailable(f"ArcGIS respondió con código {response.status_code}")
 
             data = response.json()
 
             if 'error' in data:
-                logger.warning(f"Error en respuesta ArcGIS: {data['error']}")
-                return None
+                raise GeocodeUnavailable(f"Error en respuesta ArcGIS: {data['error']}")
 
             if 'candidates' in data and len(data['candidates']) > 0:
                 best_candidate = max(data['candidates'], key=lambda x: x.get('score', 0))
@@ -226,49 +247,220 @@ class LocalGISService:
 
             return None
 
-        except requests.exceptions.Timeout:
+        except CircuitOpenError as e:
+            # Se omite sin consultar, pero no prueba que la dirección no exista
+            logger.debug("ArcGIS marcado como caído - se omite")
+            raise GeocodeUnavailable(str(e)) from e
+        except GeocodeUnavailable as e:
+            logger.warning(str(e))
+            raise
+        except requests.exceptions.Timeout as e:
             logger.warning(f"Timeout ArcGIS después de {timeout}s - Fallback a OSM")
-            return None
-        except requests.exceptions.ConnectionError:
+            raise GeocodeUnavailable(f"Timeout ArcGIS ({timeout}s)") from e
+        except requests.exceptions.ConnectionError as e:
             logger.warning("Error de conexión ArcGIS - Fallback a OSM")
-            return None
+            raise GeocodeUnavailable("Error de conexión ArcGIS") from e
         except Exception as e:
             logger.error(f"Error inesperado en ArcGIS: {str(e)}")
+            raise GeocodeUnavailable(f"Error inesperado en ArcGIS: {str(e)}") from e
+
+    @staticmethod
+    def geocode_address(address, raise_errors=False):
+        """
+        Geocodifica usando la caché (LRU + tabla) antes que los proveedores
+
+        Args:
+            raise_errors: True para propagar GeocodeDeadlineExceeded y
+                GeocodeUnavailable en lugar de devolver None (procesos por
+                lotes que deben reintentar más tarde)
+        """
+        clean_address = LocalGISService._clean_address(address)
+        try:
+            return geocache.cached(
+                geocache.forward_key(clean_address), 'forward',
+                lambda: LocalGISService._geocode_address_uncached(address, clean_address)
+            )
+        except GeocodeDeadlineExceeded:
+            logger.warning(f"Plazo de geocodificación agotado ({GEOCODE_DEADLINE}s): {clean_address}")
+            if raise_errors:
+                raise
+            return None
+        except GeocodeUnavailable as e:
+            logger.warning(f"Proveedores no disponibles para {clean_address}: {str(e)}")
+            if raise_errors:
+                raise
             return None
 
     @staticmethod
-    def geocode_address(address):
-        """Geocodifica con estrategia optimizada y fallbacks rápidos"""
+    def _geocode_address_uncached(address, clean_address):
+        """
+        Geocodifica lanzando los proveedores en paralelo con un plazo global
+
+        ArcGIS sale de inmediato; cada consulta a OSM se lanza GEOCODE_HEDGE_DELAY
+        segundos después de la anterior si nadie ha respondido todavía. Gana el
+        primer resultado con score >= GEOCODE_ACCEPT_SCORE; si ninguno lo
+        alcanza se devuelve el mejor obtenido antes del plazo
+
+        Raises:
+            GeocodeDeadlineExceeded: Si se agotó el plazo sin ningún resultado
+            GeocodeUnavailable: Si algún proveedor falló y ninguno encontró la dirección
+        """
         try:
-            clean_address = LocalGISService._clean_address(address)
             logger.info(f"Geocodificando: {address} -> {clean_address}")
+            candidates = []
 
-            # **Estrategia 1: Código postal directo (más rápido)**
+            # **Estrategia 1: Código postal en tabla local (sin red)**
             if LocalGISService._is_postal_code(clean_address):
                 logger.info("Detectado código postal")
-                result = LocalGISService._geocode_postal_code(clean_address)
+                result = LocalGISService._local_postal_code(clean_address)
                 if result:
                     return result
-
-            # **Estrategia 2: Direcciones residenciales específicas**
+                candidates.append(('OSM CP', lambda t: LocalGISService._try_osm_geocode(
+                    f"CP {clean_address}, Chihuahua, México", t)))
+
+            # **Estrategia 2: Catálogo municipal local (sin red)**
+            local = None
+            try:
+                local = local_geocoder.geocode(clean_address)
+            except Exception as e:
+                logger.warning(f"Geocodificador local no disponible: {str(e)}")
+            if local and local['score'] >= GEOCODE_ACCEPT_SCORE:
+                logger.info(f"Resuelto con catálogo local (score {local['score']})")
+                return local
+
+            # **Estrategia 3: Direcciones residenciales (calle + número)**
             if LocalGISService._detect_residential_address(clean_address):
-                logger.info("Detectada dirección residencial")
-                result = LocalGISService._geocode_house_number_fast(clean_address)
-                if result:
-                    return result
+                components = LocalGISService._parse_address_components(clean_address)
+                if components['number'] and components['street']:
+                    logger.info("Detectada dirección residencial")
+                    street, number = components['street'], components['number']
+                    candidates.extend([
+                        ('ArcGIS calle-número', lambda t: LocalGISService._try_arcgis_geocode(
+                            f"{street} {number}, Chihuahua", min(t, 2))),
+                        ('ArcGIS número-calle', lambda t: LocalGISService._try_arcgis_geocode(
+                            f"{number} {street}, Chihuahua", min(t, 2))),
+                        ('OSM calle-número', lambda t: LocalGISService._try_osm_geocode(
+                            f"{street} {number}, Chihuahua, México", t)),
+                    ])
+
+            # **Estrategia 4: ArcGIS con la dirección completa**
+            candidates.append(('ArcGIS', lambda t: LocalGISService._try_arcgis_geocode(clean_address, min(t, 3))))
+
+            # **Estrategia 5: OpenStreetMap como respaldo escalonado**
+            candidates.extend([
+                ('OSM estado', lambda t: LocalGISService._try_osm_geocode(
+                    f"{address}, Chihuahua, Chihuahua, México", t)),
+                ('OSM país', lambda t: LocalGISService._try_osm_geocode(
+                    f"{address}, Chihuahua, México", t)),
+            ])
+
+            # Una coincidencia ambigua del catálogo queda como respaldo
+            try:
+                result = LocalGISService._run_hedged(candidates)
+            except (GeocodeDeadlineExceeded, GeocodeUnavailable):
+                if local:
+                    return local
+                raise
+            if local and (not result or result.get('score', 0) < local['score']):
+                return local
+            return result
+
+        except (GeocodeDeadlineExceeded, GeocodeUnavailable):
+            raise
+        except Exception as e:
+            logger.error(f"Error en geocodificación: {str(e)}")
+            raise GeocodeUnavailable(str(e)) from e
 
-            # **Estrategia 3: ArcGIS con timeout corto (solo 1 intento)**
-            result = LocalGISService._try_arcgis_geocode(clean_address, timeout=3)
-            if result:
-                return result
+    @staticmethod
+    def _run_hedged(candidates, deadline=None, hedge_delay=None, accept_score=None):
+        """
+        Ejecuta consultas de geocodificación de forma concurrente y escalonada
+
+        Args:
+            candidates: Lista de (etiqueta, función(timeout) -> resultado o None).
+                        Las consultas de ArcGIS salen juntas al inicio; las de
+                        OSM se escalonan cada hedge_delay segundos
+            deadline: Segundos totales (default: GEOCODE_DEADLINE)
+            hedge_delay: Retraso entre consultas de respaldo (default: GEOCODE_HEDGE_DELAY)
+            accept_score: Score mínimo para aceptar sin esperar a los demás
+
+        Returns:
+            dict: Primer resultado aceptable o el de mayor score, None si
+                  todos los proveedores respondieron sin resultado
+
+        Raises:
+            GeocodeDeadlineExceeded: Si se agotó el plazo sin ningún resultado
+            GeocodeUnavailable: Si alguna consulta falló y ninguna dio resultado
+        """
+        deadline = GEOCODE_DEADLINE if deadline is None else deadline
+        hedge_delay = GEOCODE_HEDGE_DELAY if hedge_delay is None else hedge_delay
+        accept_score = GEOCODE_ACCEPT_SCORE if accept_score is None else accept_score
+
+        start = time.monotonic()
+        end = start + deadline
+
+        # Momento de lanzamiento: ArcGIS en 0, cada OSM un escalón más tarde
+        pending = []
+        hedge = 0
+        for label, fn in candidates:
+            if label.startswith('OSM'):
+                hedge += 1
+                pending.append((hedge * hedge_delay, label, fn))
+            else:
+                pending.append((0.0, label, fn))
+        pending.sort(key=lambda c: c[0])
+
+        executor = _get_executor()
+        running = {}
+        best = None
+        timed_out = False
+        failed = []
 
-            # **Estrategia 4: Fallback inmediato a OpenStreetMap**
-            logger.info("Fallback a OpenStreetMap")
-            return LocalGISService._geocode_with_osm_fast(address)
+        try:
+            while pending or running:
+                now = time.monotonic()
+                if now >= end:
+                    timed_out = True
+                    break
 
-        except Exception as e:
-            logger.error(f"Error en geocodificación: {str(e)}")
-            return LocalGISService._geocode_with_osm_fast(address)
+                # Lanzar las consultas cuyo escalón ya llegó; si no hay nada en
+                # curso no tiene sentido esperar, se adelanta la siguiente
+                while pending and (start + pending[0][0] <= now or not running):
+                    _, label, fn = pending.pop(0)
+                    running[executor.submit(fn, end - now)] = label
+
+                wake = end if not pending else min(end, start + pending[0][0])
+                done, _ = wait(list(running), timeout=max(0.0, wake - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    label = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning(f"Error en consulta {label}: {str(e)}")
+                        failed.append(label)
+                        continue
+                    if not result:
+                        continue
+                    if result.get('score', 0) >= accept_score:
+                        logger.info(f"Resultado aceptado de {label} en "
+                                    f"{time.monotonic() - start:.2f}s (score={result.get('score')})")
+                        return result
+                    if best is None or result.get('score', 0) > best.get('score', 0):
+                        best = result
+        finally:
+            # Las consultas en cola se cancelan; las que ya están en curso
+            # terminan solas al vencer su timeout y su resultado se descarta
+            for future in running:
+                future.cancel()
+
+        if best is None and timed_out:
+            raise GeocodeDeadlineExceeded()
+        # "No encontrado" solo si todos respondieron; una falla no prueba que no exista
+        if best is None and failed:
+            raise GeocodeUnavailable(f"Consultas fallidas: {', '.join(failed)}")
+        return best
 
     @staticmethod
     def _geocode_house_number_fast(address):
@@ -308,80 +500,146 @@ class LocalGISService:
             ]
 
             for query in search_queries:
-                try:
-                    url = "https://nominatim.openstreetmap.org/search"
-                    params = {
-                        'q': query,
-                        'format': 'json',
-                        'limit': 3,
-                        'addressdetails': 1,
-                        'countrycodes': 'mx',
-                        'bounded': 1,
-                        'viewbox': '-106.5,28.0,-106.0,29.0'
-                    }
+                result = LocalGISService._try_osm_geocode(query)
+                if result:
+                    return result
 
-                    headers = {
-                        'User-Agent': 'DesUr/1.0',
-                        'Accept': 'application/json'
-                    }
+            return None
 
-                    logger.info(f"Geocodificando con OSM: {query}")
+        except Exception as e:
+            logger.error(f"Error en OSM fallback: {str(e)}")
+            return None
 
-                    response = requests.get(
-                        url,
-                        params=params,
-                        headers=headers,
-                        timeout=5  # Timeout corto
-                    )
+    @staticmethod
+    def _nominatim_json(url, params, timeout):
+        """
+        Consulta a Nominatim respetando el límite compartido de consultas
+
+        Las respuestas se guardan en la caché compartida: la misma búsqueda
+        desde otro worker (o desde otra estrategia) no gasta un turno
+
+        Returns:
+            JSON de la respuesta
+
+        Raises:
+            GeocodeUnavailable: Si Nominatim respondió con error
+            RateLimitExceeded: Si no hubo turno antes del plazo
+            requests.exceptions.RequestException: Igual que guarded_get
+        """
+        key = 'gis:osm:' + hashlib.sha1(
+            f"{url}?{urllib.parse.urlencode(sorted(params.items()))}".encode('utf-8')
+        ).hexdigest()
+        cache = _shared_cache()
+        data = cache.get(key)
+        if data is not None:
+            logger.debug(f"Respuesta de Nominatim desde caché: {params}")
+            return data
+
+        def fetch():
+            response = circuit_breaker.guarded_get('nominatim', url, params=params, timeout=timeout)
+            if response.status_code != 200:
+                raise GeocodeUnavailable(f"Nominatim respondió con código {response.status_code}")
 
-                    if response.status_code != 200:
-                        continue
+            data = response.json()
+            cache.set(key, data, NOMINATIM_CACHE_TTL if data else geocache.NEGATIVE_TTL)
+            return data
 
-                    data = response.json()
-
-                    if data and len(data) > 0:
-                        best = data[0]
-
-                        # Extraer componentes de OSM
-                        address_parts = best.get('address', {})
-                        components = {
-                            'calle': address_parts.get('road', ''),
-                            'numero': address_parts.get('house_number', ''),
-                            'colonia': address_parts.get('neighbourhood', address_parts.get('suburb', '')),
-                            'codigo_postal': address_parts.get('postcode', ''),
-                            'ciudad': address_parts.get('city', 'Chihuahua'),
-                            'estado': address_parts.get('state', 'Chihuahua'),
-                            'full_address': best.get('display_name', query)
-                        }
-
-                        result = {
-                            'address': best.get('display_name', query),
-                            'lat': float(best['lat']),
-                            'lng': float(best['lon']),
-                            'score': 80,  # Score fijo para OSM
-                            'source': 'OpenStreetMap',
-                            'components': components
-                        }
-
-                        logger.info(f"Resultado OSM exitoso: {result['address']}")
-                        return result
+        # Una sola consulta (y un solo turno) para las búsquedas iguales en curso;
+        # la espera cubre el turno del límite (hasta la mitad del timeout) y la consulta
+        return singleflight.do(key, fetch, shared=True, wait=timeout * 1.5)
+
+    @staticmethod
+    def _osm_score(place):
+        """Score de un resultado de Nominatim según qué tan preciso es"""
+        address_parts = place.get('address', {})
+        try:
+            rank = int(place['place_rank'])
+        except (KeyError, TypeError, ValueError):
+            # Respuestas sin place_rank: se deduce de los componentes
+            rank = 30 if address_parts.get('house_number') else 26 if address_parts.get('road') else 17
+        for min_rank, score in OSM_RANK_SCORES:
+            if rank >= min_rank:
+                return score
+        return OSM_MIN_SCORE
+
+    @staticmethod
+    def _try_osm_geocode(query, timeout=5):
+        """Una consulta a Nominatim; None si no hay resultado, GeocodeUnavailable si falla"""
+        try:
+            url = "https://nominatim.openstreetmap.org/search"
+            params = {
+                'q': query,
+                'format': 'json',
+                'limit': 3,
+                'addressdetails': 1,
+                'countrycodes': 'mx',
+                'bounded': 1,
+                'viewbox': '-106.5,28.0,-106.0,29.0'
+            }
+
+            logger.info(f"Geocodificando con OSM: {query}")
+
+            data = LocalGISService._nominatim_json(url, params, timeout=min(timeout, 5))  # Timeout corto
+
+            if data and len(data) > 0:
+                best = data[0]
+
+                # Extraer componentes de OSM
+                address_parts = best.get('address', {})
+                components = {
+                    'calle': address_parts.get('road', ''),
+                    'numero': address_parts.get('house_number', ''),
+                    'colonia': address_parts.get('neighbourhood', address_parts.get('suburb', '')),
+                    'codigo_postal': address_parts.get('postcode', ''),
+                    'ciudad': address_parts.get('city', 'Chihuahua'),
+                    'estado': address_parts.get('state', 'Chihuahua'),
+                    'full_address': best.get('display_name', query)
+                }
+
+                result = {
+                    'address': best.get('display_name', query),
+                    'lat': float(best['lat']),
+                    'lng': float(best['lon']),
+                    'score': LocalGISService._osm_score(best),
+                    'source': 'OpenStreetMap',
+                    'components': components
+                }
 
-                except requests.exceptions.Timeout:
-                    logger.warning(f"Timeout OSM para: {query}")
-                    continue
-                except Exception as e:
-                    logger.warning(f"Error OSM para {query}: {str(e)}")
-                    continue
+                logger.info(f"Resultado OSM exitoso: {result['address']}")
+                return result
 
             return None
 
+        except CircuitOpenError as e:
+            # Se omite sin consultar, pero no prueba que la dirección no exista
+            logger.debug("Nominatim marcado como caído - se omite")
+            raise GeocodeUnavailable(str(e)) from e
+        except RateLimitExceeded as e:
+            # Límite propio, no respuesta del proveedor: no se cachea como "no encontrado"
+            logger.info("Sin turno para Nominatim dentro del plazo - se omite")
+            raise GeocodeUnavailable(str(e)) from e
+        except requests.exceptions.Timeout as e:
+            logger.warning(f"Timeout OSM para: {query}")
+            raise GeocodeUnavailable(f"Timeout OSM para: {query}") from e
+        except GeocodeUnavailable:
+            raise
         except Exception as e:
-            logger.error(f"Error en OSM fallback: {str(e)}")
-            return None
+            logger.warning(f"Error OSM para {query}: {str(e)}")
+            raise GeocodeUnavailable(f"Error OSM para {query}: {str(e)}") from e
 
     @staticmethod
     def _geocode_postal_code(postal_code):
         """Geocodificación específica para códigos postales"""
+        result = LocalGISService._local_postal_code(postal_code)
+        if result:
+            return result
+
+        # Si no está en la base local, intentar con OSM
+        return LocalGISService._geocode_with_osm_fast(f"CP {postal_code}, Chihuahua, México")
+
+    @staticmethod
+    def _local_postal_code(postal_code):
+        """Códigos postales conocidos, sin consultar proveedores externos"""
         try:
             # Códigos postales conocidos de Chihuahua
             postal_coords = {
@@ -414,8 +672,7 @@ class LocalGISService:
                     'components': components
                 }
 
-            # Si no está en la base local, intentar con OSM
-            return LocalGISService._geocode_with_osm_fast(f"CP {postal_code}, Chihuahua, México")
+            return None
 
         except Exception as e:
             logger.error(f"Error geocodificando CP: {str(e)}")
@@ -590,14 +847,9 @@ class LocalGISService:
                     'viewbox': '-106.5,28.0,-106.0,29.0'  # Bounding box para Chihuahua
                 }
 
-                headers = {'User-Agent': 'DesUr/1.0'}
-
                 logger.info(f"Geocodificando con OSM: {query}")
 
-                response = requests.get(url, params=params, headers=headers, timeout=10)
-                response.raise_for_status()
-
-                data = response.json()
+                data = LocalGISService._nominatim_json(url, params, timeout=10)
 
                 if data and len(data) > 0:
                     result = data[0]  # Tomar el primer resultado
@@ -676,19 +928,7 @@ class LocalGISService:
     @staticmethod
     def _detect_residential_address(address):
         """Detecta si es una dirección residencial específica"""
-        residential_keywords = [
-            'casa', 'num', 'número', '#', 'fraccionamiento', 'fracc',
-            'residencial', 'privada', 'quintas', 'villas', 'jardines',
-            'bosques', 'lomas', 'cerrada', 'andador', 'retorno'
-        ]
-
-        address_lower = address.lower()
-
-        # Debe tener un número Y una palabra clave residencial
-        has_number = bool(re.search(r'\d+', address_lower))
-        has_residential_keyword = any(keyword in address_lower for keyword in residential_keywords)
-
-        return has_number and (has_residential_keyword or len(address.split()) >= 3)
+        return address_normalizer.is_residential(address)
 
     @staticmethod
     def _enhanced_street_search(address):
@@ -739,110 +979,62 @@ class LocalGISService:
 
     @staticmethod
     def _parse_address_components(address):
-        """Extrae componentes de una dirección residencial mejorado"""
-        try:
-            components = {
-                'number': None,
-                'street': None,
-                'neighborhood': None,
-                'original': address
-            }
-
-            address_clean = address.lower().strip()
-
-            # Limpiar caracteres especiales y normalizar
-            address_clean = re.sub(r'[^\w\s]', ' ', address_clean)
-            address_clean = ' '.join(address_clean.split())
-
-            logger.info(f"Dirección limpia para parseo: {address_clean}")
-
-            # Patrones más específicos para números de casa
-            number_patterns = [
-                r'casa\s+(\d{1,4})\b',  # "casa 123" (máximo 4 dígitos)
-                r'num(?:ero)?\s+(\d{1,4})\b',  # "num 123" o "numero 123"
-                r'#\s*(\d{1,4})\b',  # "#123"
-                r'^(\d{1,4})\s+(?!cp|codigo)',  # Número al inicio pero no CP
-                r'\s(\d{1,4})\s*$',  # Número al final
-            ]
-
-            # Buscar número de casa
-            for pattern in number_patterns:
-                match = re.search(pattern, address_clean)
-                if match:
-                    potential_number = match.group(1)
-                    # Validar que no sea código postal (5 dígitos)
-                    if len(potential_number) <= 4:
-                        components['number'] = potential_number
-                        # Remover el número encontrado para limpiar la calle
-                        address_clean = re.sub(pattern, ' ', address_clean)
-                        break
-
-            # Limpiar la dirección después de extraer el número
-            address_clean = ' '.join(address_clean.split())
+        """Extrae componentes de una dirección residencial (memorizado)"""
+        components = address_normalizer.parse(address)
+        logger.debug(f"Componentes parseados: número={components['number']}, calle={components['street']}, colonia={components['neighborhood']}")
+        return components
 
-            # Detectar colonia/fraccionamiento
-            neighborhood_patterns = [
-                r'(?:fraccionamiento|fracc\.?)\s+([^,\d]+)',
-                r'(?:residencial|privada)\s+([^,\d]+)',
-                r'(?:quintas|villas|jardines|bosques|lomas)\s+([^,\d]+)',
-                r'(?:colonia|col\.?)\s+([^,\d]+)',
-            ]
-
-            for pattern in neighborhood_patterns:
-                match = re.search(pattern, address_clean)
-                if match:
-                    components['neighborhood'] = match.group(1).strip()
-                    # Remover la colonia del texto para obtener la calle
-                    address_clean = re.sub(pattern, '', address_clean)
-                    break
-
-            # Lo que queda debe ser la calle
-            street_clean = address_clean.strip()
-
-            # Remover palabras comunes que no son parte del nombre
-            stop_words = [
-                'calle', 'avenida', 'av', 'c', 'de', 'la', 'del', 'los', 'las',
-                'casa', 'numero', 'num', 'chihuahua', 'cp', 'codigo'
-            ]
-
-            street_words = []
-            for word in street_clean.split():
-                if word not in stop_words and len(word) > 1:
-                    street_words.append(word)
-
-            if street_words:
-                components['street'] = ' '.join(street_words).title()
+    @staticmethod
+    def reverse_geocode(lat, lng):
+        """
+        Geocodificación inversa: primero el índice espacial local (domicilio
+        conocido a menos de SPATIAL_INDEX_MAX_DISTANCE metros), después la
+        caché por coordenadas redondeadas y por último ArcGIS/OSM
+        """
+        try:
+            result = spatial_index.reverse_geocode(lat, lng)
+            if result:
+                return result
+        except Exception as e:
+            logger.warning(f"Índice espacial no disponible: {str(e)}")
 
-            logger.info(f"Componentes parseados: número={components['number']}, calle={components['street']}, colonia={components['neighborhood']}")
+        try:
+            result = geocache.cached(
+                geocache.reverse_key(lat, lng), 'reverse',
+                lambda: LocalGISService._reverse_geocode_uncached(lat, lng)
+            )
+        except GeocodeUnavailable as e:
+            logger.warning(f"Proveedores no disponibles para {lat}, {lng}: {str(e)}")
+            return None
+        if result:
+            # La entrada puede venir de un punto vecino: se devuelven las coordenadas pedidas
+            result['lat'], result['lng'] = lat, lng
+        return result
 
-            return components
+    @staticmethod
+    def _reverse_geocode_uncached(lat, lng):
+        """
+        Geocodificación inversa: coordenadas → dirección
 
-        except Exception as e:
-            logger.error(f"Error parseando componentes de dirección: {str(e)}")
-            return {
-                'number': None,
-                'street': None,
-                'neighborhood': None,
-                'original': address
-            }
+        Raises:
+            GeocodeUnavailable: Si algún proveedor falló y ninguno encontró dirección
+        """
+        logger.info(f"Geocodificación inversa para: {lat}, {lng}")
 
-    @staticmethod
-    def reverse_geocode(lat, lng):
-        """Geocodificación inversa: coordenadas → dirección"""
+        # Intentar con ArcGIS primero
+        arcgis_error = None
         try:
-            logger.info(f"Geocodificación inversa para: {lat}, {lng}")
-
-            # Intentar con ArcGIS primero
             result = LocalGISService._try_arcgis_reverse_geocode(lat, lng)
             if result:
                 return result
+        except GeocodeUnavailable as e:
+            arcgis_error = e
 
-            # Fallback a OpenStreetMap
-            return LocalGISService._reverse_geocode_with_osm(lat, lng)
-
-        except Exception as e:
-            logger.error(f"Error en geocodificación inversa: {str(e)}")
-            return None
+        # Fallback a OpenStreetMap
+        result = LocalGISService._reverse_geocode_with_osm(lat, lng)
+        if result is None and arcgis_error is not None:
+            raise arcgis_error
+        return result
 
     @staticmethod
     def _try_arcgis_reverse_geocode(lat, lng, timeout=5):
@@ -859,17 +1051,10 @@ class LocalGISService:
 
             logger.info(f"Geocodificación inversa ArcGIS: {lat}, {lng}")
 
-            response = requests.get(
-                url,
-                params=params,
-                timeout=timeout,
-                verify=False,
-                headers={'User-Agent': 'Mozilla/5.0 (compatible; LocalGIS/1.0)'}
-            )
+            response = circuit_breaker.guarded_get('arcgis_reverse', url, params=params, timeout=timeout)
 
             if response.status_code != 200:
-                logger.warning(f"ArcGIS reverse geocode respondió con código {response.status_code}")
-                return None
+                raise GeocodeUnavailable(f"ArcGIS reverse geocode respondió con código {response.status_code}")
 
             data = response.json()
 
@@ -916,12 +1101,19 @@ class LocalGISService:
 
             return None
 
-        except requests.exceptions.Timeout:
+        except CircuitOpenError as e:
+            # Se omite sin consultar, pero no prueba que la dirección no exista
+            logger.debug("ArcGIS reverse marcado como caído - se omite")
+            raise GeocodeUnavailable(str(e)) from e
+        except GeocodeUnavailable as e:
+            logger.warning(str(e))
+            raise
+        except requests.exceptions.Timeout as e:
             logger.warning(f"Timeout en ArcGIS reverse geocode después de {timeout}s")
-            return None
+            raise GeocodeUnavailable(f"Timeout ArcGIS reverse ({timeout}s)") from e
         except Exception as e:
             logger.error(f"Error en ArcGIS reverse geocode: {str(e)}")
-            return None
+            raise GeocodeUnavailable(f"Error en ArcGIS reverse geocode: {str(e)}") from e
 
     @staticmethod
     def _reverse_geocode_with_osm(lat, lng):
@@ -940,20 +1132,9 @@ class LocalGISService:
 
             logger.info(f"Geocodificación inversa OSM: {lat}, {lng}")
 
-            response = requests.get(
-                url,
-                params=params,
-                timeout=3,
-                headers={'User-Agent': 'LocalGIS/1.0 (compatible)'}
-            )
+            data = LocalGISService._nominatim_json(url, params, timeout=3)
 
-            if response.status_code != 200:
-                logger.warning(f"OSM reverse geocode respondió con código {response.status_code}")
-                return None
-
-            data = response.json()
-
-            if 'display_name' in data:
+            if data and 'display_name' in data:
                 address_details = data.get('address', {})
 
                 components = {
@@ -979,9 +1160,19 @@ class LocalGISService:
 
             return None
 
+        except CircuitOpenError as e:
+            # Se omite sin consultar, pero no prueba que la dirección no exista
+            logger.debug("Nominatim marcado como caído - se omite")
+            raise GeocodeUnavailable(str(e)) from e
+        except RateLimitExceeded as e:
+            # Límite propio, no respuesta del proveedor: no se cachea como "no encontrado"
+            logger.info("Sin turno para Nominatim dentro del plazo - se omite")
+            raise GeocodeUnavailable(str(e)) from e
+        except GeocodeUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error en OSM reverse geocode: {str(e)}")
-            return None
+            raise GeocodeUnavailable(f"Error en OSM reverse geocode: {str(e)}") from e
 
     @staticmethod
     def validate_address(address):
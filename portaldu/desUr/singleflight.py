@@ -0,0 +1,140 @@
+"""
+Agrupación de consultas idénticas simultáneas (single-flight)
+Cuando varios hilos piden lo mismo a un servicio externo al mismo tiempo
+(GetColonias en hora pico, la misma dirección geocodificada desde dos
+pestañas) solo el primero consulta; los demás esperan y reciben su
+resultado o su excepción
+
+Con shared=True también se agrupan entre procesos: el primero toma un
+candado corto en la caché compartida (cache.add) y publica el resultado
+bajo la clave de su turno; los workers que llegan mientras tanto lo leen
+de ahí. Sin caché compartida disponible cada proceso consulta por su cuenta
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+logger = logging.getLogger(__name__)
+
+# Espera máxima (s) por la consulta de otro hilo o proceso antes de hacer la propia
+WAIT = getattr(settings, 'SINGLEFLIGHT_WAIT', 20)
+# Vigencia (s) del resultado publicado para los otros procesos
+RESULT_TTL = getattr(settings, 'SINGLEFLIGHT_RESULT_TTL', 10)
+# Intervalo (s) con el que los otros procesos revisan si ya hay resultado
+POLL_INTERVAL = 0.05
+
+_lock = threading.Lock()
+# clave -> _Call en curso en este proceso
+_calls = {}
+_pid = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _shared_cache():
+    try:
+        return caches['shared']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _cache_key(key):
+    return 'sf:' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _do_shared(key, fn, wait):
+    """Ejecuta fn una vez entre procesos: toma el candado o espera al que lo tiene"""
+    cache = _shared_cache()
+    lock_key = _cache_key(key)
+    turn = uuid.uuid4().hex
+
+    taken = cache.add(lock_key, turn, timeout=int(wait) + 1)
+    if taken is None:
+        # Redis no disponible (IGNORE_EXCEPTIONS): cada proceso consulta
+        return fn()
+
+    if taken:
+        try:
+            result = fn()
+            cache.set(f'{lock_key}:{turn}', (result,), timeout=RESULT_TTL)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    leader = cache.get(lock_key)
+    deadline = time.monotonic() + wait
+    while leader and time.monotonic() < deadline:
+        entry = cache.get(f'{lock_key}:{leader}')
+        if entry is not None:
+            logger.debug(f"Resultado compartido por otro proceso: {key}")
+            return entry[0]
+        if cache.get(lock_key) != leader:
+            # Terminó (quizá con error) sin publicar; un último vistazo y se consulta
+            entry = cache.get(f'{lock_key}:{leader}')
+            if entry is not None:
+                return entry[0]
+            break
+        time.sleep(POLL_INTERVAL)
+    return fn()
+
+
+def do(key, fn, shared=False, wait=WAIT):
+    """
+    Ejecuta fn() una sola vez para las llamadas simultáneas con la misma clave
+
+    Args:
+        key: Texto que identifica la consulta (URL y parámetros)
+        fn: Función sin argumentos que hace la consulta
+        shared: True para agrupar también entre procesos (el resultado
+            debe poder guardarse en la caché)
+        wait: Segundos máximos de espera por la consulta de otro
+
+    Returns:
+        El resultado de fn(), propio o de la llamada que ya estaba en curso
+
+    Raises:
+        La excepción de fn(), también para quienes esperaban su resultado
+    """
+    global _pid
+
+    with _lock:
+        if _pid != os.getpid():
+            # Tras un fork las consultas del padre no terminan en este proceso
+            _calls.clear()
+            _pid = os.getpid()
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        if not call.done.wait(wait):
+            logger.warning(f"Consulta en curso tardó más de {wait}s, se repite: {key}")
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _do_shared(key, fn, wait) if shared else fn()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            if _calls.get(key) is call:
+                del _calls[key]
+        call.done.set()
@@ -0,0 +1,286 @@
+"""
+Índice espacial en memoria para geocodificación inversa local
+Los puntos de domicilio conocidos (números exteriores del catálogo municipal
+y resultados de geocodificación en caché) se guardan en arreglos NumPy
+ordenados por celda de una rejilla regular sobre el área de cobertura.
+Un clic en el mapa solo revisa su celda y las vecinas que alcanza
+MAX_DISTANCE: la respuesta sale del proceso sin consultar a ArcGIS ni a OSM
+
+El índice se genera con rebuild() (tarea rebuild_spatial_index) en un .npz
+compacto y cada worker lo carga al iniciar; si el archivo cambia se recarga
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = getattr(settings, 'SPATIAL_INDEX_PATH',
+                     os.path.join(settings.BASE_DIR, 'data', 'spatial_index.npz'))
+# Distancia máxima (m) para aceptar el punto más cercano como la dirección del clic
+MAX_DISTANCE = getattr(settings, 'SPATIAL_INDEX_MAX_DISTANCE', 25)
+
+# Área de cobertura (la misma que valida reverse_geocode_view) y tamaño de celda:
+# 0.0005° ≈ 55 m de latitud y ≈ 49 m de longitud a 28°N. Las celdas que se
+# revisan alrededor del clic se calculan con la distancia máxima, así que
+# MAX_DISTANCE puede ser mayor que una celda
+LAT_MIN, LAT_MAX = 27.0, 30.0
+LNG_MIN, LNG_MAX = -107.5, -105.0
+CELL_DEG = 0.0005
+
+FILE_CHECK_INTERVAL = 60
+EARTH_RADIUS = 6371000.0
+
+# Componentes que se guardan por punto
+FIELDS = ('calle', 'numero', 'colonia', 'codigo_postal', 'source')
+
+
+def _cell_keys(lat, lng, cell, ncols):
+    rows = np.floor((lat - LAT_MIN) / cell).astype(np.int64)
+    cols = np.floor((lng - LNG_MIN) / cell).astype(np.int64)
+    return rows * ncols + cols
+
+
+class SpatialIndex:
+    """Puntos ordenados por celda con el inicio de cada celda"""
+
+    def __init__(self, arrays):
+        self.lat = arrays['lat']
+        self.lng = arrays['lng']
+        self.cells = arrays['cells']
+        self.starts = arrays['starts']
+        self.cell = float(arrays['cell'])
+        self.ncols = int(arrays['ncols'])
+        self.fields = {name: arrays[name] for name in FIELDS}
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _rings(self, lat, max_distance):
+        """
+        Celdas vecinas (filas, columnas) a revisar para cubrir max_distance
+
+        El ancho de la celda en metros se toma en la latitud más alejada del
+        ecuador que alcanza la búsqueda, donde la longitud es más angosta
+        """
+        cell_m = np.radians(self.cell) * EARTH_RADIUS
+        lat_edge = min(abs(lat) + np.degrees(max_distance / EARTH_RADIUS), 89.0)
+        rows = int(np.ceil(max_distance / cell_m))
+        cols = int(np.ceil(max_distance / (cell_m * np.cos(np.radians(lat_edge)))))
+        return max(rows, 1), max(cols, 1)
+
+    def _candidates(self, lat, lng, max_distance=MAX_DISTANCE):
+        """Índices de los puntos en la celda de (lat, lng) y las vecinas a menos de max_distance"""
+        row = int((lat - LAT_MIN) // self.cell)
+        col = int((lng - LNG_MIN) // self.cell)
+        nrows, ncols = self._rings(lat, max_distance)
+        # Las columnas fuera de la rejilla se descartan para no caer en otra fila
+        keys = np.array([r * self.ncols + c
+                         for r in range(max(row - nrows, 0), row + nrows + 1)
+                         for c in range(max(col - ncols, 0), min(col + ncols, self.ncols - 1) + 1)],
+                        dtype=np.int64)
+        pos = np.searchsorted(self.cells, keys)
+        found = pos < len(self.cells)
+        found[found] = self.cells[pos[found]] == keys[found]
+
+        ranges = [np.arange(self.starts[p], self.starts[p + 1]) for p in pos[found]]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def nearest(self, lat, lng, max_distance=MAX_DISTANCE):
+        """
+        Punto más cercano a (lat, lng)
+
+        Returns:
+            tuple (índice, distancia en metros) o None si no hay ninguno
+            a menos de max_distance
+        """
+        idx = self._candidates(lat, lng, max_distance)
+        if not len(idx):
+            return None
+
+        # Equirectangular: suficiente a escala de decenas de metros
+        dlat = np.radians(self.lat[idx] - lat)
+        dlng = np.radians(self.lng[idx] - lng) * np.cos(np.radians(lat))
+        distances = EARTH_RADIUS * np.hypot(dlat, dlng)
+
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None
+        return int(idx[best]), float(distances[best])
+
+    def get_result(self, i, distance):
+        """Resultado con el formato de LocalGISService para el punto i"""
+        values = {name: str(self.fields[name][i]) for name in FIELDS}
+        street = f"{values['numero']} {values['calle']}".strip()
+        full_address = ', '.join(p for p in (street, values['colonia'], 'Chihuahua') if p)
+        return {
+            'address': full_address,
+            'lat': float(self.lat[i]),
+            'lng': float(self.lng[i]),
+            'source': values['source'],
+            'distance': round(distance, 1),
+            'components': {
+                'calle': values['calle'],
+                'numero': values['numero'],
+                'colonia': values['colonia'],
+                'codigo_postal': values['codigo_postal'],
+                'ciudad': 'Chihuahua',
+                'estado': 'Chihuahua',
+                'full_address': full_address,
+            },
+        }
+
+
+_lock = threading.Lock()
+_index = None
+_mtime = None
+_checked_at = 0.0
+
+
+def get_index():
+    """Índice del proceso (None si aún no se ha generado el archivo)"""
+    global _index, _mtime, _checked_at
+
+    now = time.monotonic()
+    if now - _checked_at < FILE_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        _checked_at = now
+        try:
+            mtime = os.path.getmtime(INDEX_PATH)
+        except OSError:
+            return _index
+        if mtime != _mtime:
+            try:
+                start = time.monotonic()
+                _index = SpatialIndex.load(INDEX_PATH)
+                _mtime = mtime
+                logger.info(f"Índice espacial cargado: {len(_index)} puntos "
+                            f"en {time.monotonic() - start:.3f}s")
+            except Exception as e:
+                logger.error(f"No se pudo cargar el índice espacial: {str(e)}")
+        return _index
+
+
+def warm():
+    """Carga el índice al iniciar el worker"""
+    return get_index()
+
+
+def reverse_geocode(lat, lng):
+    """
+    Dirección conocida más cercana a las coordenadas
+
+    Returns:
+        dict con el formato de LocalGISService o None si no hay índice o
+        ningún punto está a menos de MAX_DISTANCE metros
+    """
+    index = get_index()
+    if not index:
+        return None
+    hit = index.nearest(float(lat), float(lng))
+    if hit is None:
+        return None
+    return index.get_result(*hit)
+
+
+def _catalog_points():
+    """Números exteriores del catálogo municipal con coordenadas"""
+    from .models import NumeroExterior
+
+    rows = NumeroExterior.objects.filter(lat__isnull=False, lng__isnull=False).values_list(
+        'lat', 'lng', 'calle__nombre', 'numero', 'calle__colonia__nombre')
+    for lat, lng, calle, numero, colonia in rows.iterator(chunk_size=5000):
+        yield lat, lng, (calle, numero, colonia, '', 'Catastro')
+
+
+def _cache_points():
+    """Resultados de geocodificación directa en caché con calle y número"""
+    from django.utils import timezone
+
+    from .models import GeocodeCache
+
+    rows = GeocodeCache.objects.filter(
+        kind='forward', expires_at__gt=timezone.now(), result__isnull=False
+    ).values_list('result', flat=True)
+    for result in rows.iterator(chunk_size=2000):
+        components = (result or {}).get('components') or {}
+        if not components.get('calle') or not components.get('numero'):
+            continue
+        try:
+            lat, lng = float(result['lat']), float(result['lng'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        yield lat, lng, (
+            components['calle'], str(components['numero']), components.get('colonia', ''),
+            components.get('codigo_postal', ''), result.get('source', ''),
+        )
+
+
+def rebuild(path=None):
+    """
+    Genera el archivo del índice a partir del catálogo y la caché
+
+    Los puntos repetidos (mismas coordenadas a 5 decimales) se guardan una
+    vez, con prioridad al catálogo municipal. El archivo se escribe aparte y
+    se reemplaza de forma atómica para que los workers nunca lean uno a medias
+
+    Returns:
+        int: Puntos en el índice
+    """
+    path = path or INDEX_PATH
+    seen = set()
+    lats, lngs = [], []
+    columns = {name: [] for name in FIELDS}
+
+    for source in (_catalog_points(), _cache_points()):
+        for lat, lng, values in source:
+            if not (LAT_MIN <= lat < LAT_MAX and LNG_MIN <= lng < LNG_MAX):
+                continue
+            key = (round(lat, 5), round(lng, 5))
+            if key in seen:
+                continue
+            seen.add(key)
+            lats.append(lat)
+            lngs.append(lng)
+            for name, value in zip(FIELDS, values):
+                columns[name].append(value or '')
+
+    lat = np.array(lats, dtype=np.float64)
+    lng = np.array(lngs, dtype=np.float64)
+    ncols = int(np.ceil((LNG_MAX - LNG_MIN) / CELL_DEG))
+    cells = _cell_keys(lat, lng, CELL_DEG, ncols)
+
+    order = np.argsort(cells, kind='stable')
+    cells = cells[order]
+    unique_cells, starts = np.unique(cells, return_index=True)
+
+    arrays = {
+        'lat': lat[order],
+        'lng': lng[order],
+        'cells': unique_cells,
+        'starts': np.append(starts, len(cells)).astype(np.int64),
+        'cell': np.float64(CELL_DEG),
+        'ncols': np.int64(ncols),
+    }
+    for name in FIELDS:
+        arrays[name] = np.array(columns[name], dtype=str)[order] if columns[name] else np.array([], dtype=str)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+    logger.info(f"Índice espacial generado: {len(lat)} puntos en {len(unique_cells)} celdas")
+    return len(lat)
@@ -0,0 +1,205 @@
+"""
+Caché de calles por colonia de WsDomicilios en dos niveles
+1. LRU en memoria del proceso (STREET_CACHE_SIZE colonias)
+2. Caché compartida (Redis) entre todos los workers
+
+Cada entrada guarda la hora en que se consultó el servicio. Mientras tenga
+menos de FRESH_TTL segundos se usa tal cual; después, y hasta STALE_TTL, se
+sigue respondiendo con ella mientras un hilo la actualiza en segundo plano
+(una sola actualización por colonia entre todos los procesos). Si el
+servicio falla se conserva la lista anterior
+
+La tarea warm_street_cache precarga las colonias más capturadas en
+solicitudes para que la primera búsqueda del día tampoco espere al servicio
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.db.models import Count
+
+from .local_geocoder import normalize
+from .models import Colonia, soli
+
+logger = logging.getLogger(__name__)
+
+# Antigüedad (s) hasta la que una lista se usa sin actualizarla
+FRESH_TTL = getattr(settings, 'STREET_CACHE_FRESH_TTL', 3600)
+# Antigüedad (s) máxima con la que se responde mientras se actualiza
+STALE_TTL = getattr(settings, 'STREET_CACHE_STALE_TTL', 7 * 24 * 3600)
+# Colonias en la LRU de cada proceso
+LRU_SIZE = getattr(settings, 'STREET_CACHE_SIZE', 256)
+# Colonias que precarga warm_street_cache
+WARM_COLONIAS = getattr(settings, 'STREET_CACHE_WARM_COLONIAS', 100)
+
+# Segundos que una actualización en curso bloquea a las demás
+REFRESH_LOCK_TIMEOUT = 60
+
+_lock = threading.Lock()
+# id_colonia -> (consultado en epoch, calles)
+_lru = OrderedDict()
+_refreshing = set()
+
+_executor = None
+_executor_pid = None
+
+
+def _shared_cache():
+    try:
+        return caches['shared']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _key(id_colonia):
+    return f'wsd:calles:{id_colonia}'
+
+
+def _get_executor():
+    """Hilo del proceso para las actualizaciones en segundo plano (se recrea tras fork)"""
+    global _executor, _executor_pid
+
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='street-cache')
+            _executor_pid = os.getpid()
+            _refreshing.clear()
+        return _executor
+
+
+def _lru_get(id_colonia):
+    with _lock:
+        entry = _lru.get(id_colonia)
+        if entry is not None:
+            _lru.move_to_end(id_colonia)
+        return entry
+
+
+def _lru_set(id_colonia, entry):
+    with _lock:
+        _lru[id_colonia] = entry
+        _lru.move_to_end(id_colonia)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _lookup(id_colonia):
+    """(consultado en, calles) de la LRU o de la caché compartida, o None"""
+    entry = _lru_get(id_colonia)
+    if entry is None:
+        entry = _shared_cache().get(_key(id_colonia))
+        if entry is not None:
+            entry = tuple(entry)
+            _lru_set(id_colonia, entry)
+    return entry
+
+
+def refresh(client, id_colonia):
+    """
+    Consulta las calles al servicio y las guarda en ambos niveles
+
+    Returns:
+        list: Calles, o None si el servicio no respondió
+    """
+    calles = client.fetch_calles(id_colonia)
+    if calles is None or client.mock_mode:
+        # Los datos simulados no se comparten con los demás workers
+        return calles
+
+    entry = (time.time(), calles)
+    _lru_set(id_colonia, entry)
+    _shared_cache().set(_key(id_colonia), entry, timeout=STALE_TTL)
+    return calles
+
+
+def _refresh_background(client, id_colonia):
+    def run():
+        try:
+            refresh(client, id_colonia)
+        except Exception as e:
+            logger.warning(f"No se pudieron actualizar las calles de la colonia {id_colonia}: {str(e)}")
+        finally:
+            with _lock:
+                _refreshing.discard(id_colonia)
+            _shared_cache().delete(f'{_key(id_colonia)}:refresh')
+
+    executor = _get_executor()
+    with _lock:
+        if id_colonia in _refreshing:
+            return
+        _refreshing.add(id_colonia)
+    # Otro proceso ya la está actualizando (None = sin caché compartida: se actualiza)
+    if _shared_cache().add(f'{_key(id_colonia)}:refresh', 1, timeout=REFRESH_LOCK_TIMEOUT) is False:
+        with _lock:
+            _refreshing.discard(id_colonia)
+        return
+    executor.submit(run)
+
+
+def get_calles(client, id_colonia):
+    """
+    Calles de una colonia, del caché si es posible
+
+    Args:
+        client: WsDomicilios con token vigente
+        id_colonia: Id de la colonia en WsDomicilios
+
+    Returns:
+        list: Calles como las devuelve GetCalles, o None si no hay caché y
+        el servicio no respondió
+    """
+    entry = _lookup(id_colonia)
+    if entry is not None:
+        age = time.time() - entry[0]
+        if age < FRESH_TTL:
+            return entry[1]
+        if age < STALE_TTL:
+            _refresh_background(client, id_colonia)
+            return entry[1]
+
+    calles = refresh(client, id_colonia)
+    if calles is None and entry is not None:
+        logger.warning(f"WsDomicilios no respondió; se usan calles anteriores de la colonia {id_colonia}")
+        return entry[1]
+    return calles
+
+
+def popular_colonias(limit=WARM_COLONIAS):
+    """Ids de las colonias con más solicitudes capturadas"""
+    ids = dict(Colonia.objects.values_list('nombre_norm', 'id_colonia'))
+    popular = []
+    rows = (soli.objects.exclude(colonia__isnull=True).exclude(colonia='')
+            .values('colonia').annotate(total=Count('pk')).order_by('-total'))
+    for nombre, _ in rows.values_list('colonia', 'total').iterator():
+        id_colonia = ids.get(normalize(nombre))
+        if id_colonia is not None and id_colonia not in popular:
+            popular.append(id_colonia)
+            if len(popular) >= limit:
+                break
+    return popular
+
+
+def warm(client, limit=WARM_COLONIAS):
+    """
+    Precarga las colonias más usadas que no estén frescas
+
+    Returns:
+        dict: Conteos de colonias actualizadas, vigentes y fallidas
+    """
+    stats = {'refreshed': 0, 'fresh': 0, 'failed': 0}
+    for id_colonia in popular_colonias(limit):
+        entry = _lookup(id_colonia)
+        # Se renueva antes de vencer para que las búsquedas nunca esperen
+        if entry is not None and time.time() - entry[0] < FRESH_TTL / 2:
+            stats['fresh'] += 1
+        elif refresh(client, id_colonia) is None:
+            stats['failed'] += 1
+        else:
+            stats['refreshed'] += 1
+    return stats
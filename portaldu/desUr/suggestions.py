@@ -0,0 +1,173 @@
+"""
+Índice de sugerencias "¿quisiste decir?" para direcciones no encontradas
+Se alimenta de las geocodificaciones exitosas (GeocodeCache) y de las
+direcciones capturadas en solicitudes (soli.dirr). Cada dirección se indexa
+por trigramas de su forma normalizada; una consulta cuenta los trigramas
+en común con cada dirección y ordena por similitud, prefijo común y
+frecuencia de uso
+
+El índice vive en memoria de cada proceso y se actualiza de forma
+incremental: cada REFRESH_INTERVAL segundos solo se leen las filas nuevas
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+from .local_geocoder import normalize
+from .models import GeocodeCache, soli
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = getattr(settings, 'SUGGESTIONS_REFRESH_INTERVAL', 300)
+# Similitud mínima (0-1) para ofrecer una sugerencia
+MIN_SCORE = getattr(settings, 'SUGGESTIONS_MIN_SCORE', 0.45)
+# Trigramas presentes en más entradas que esto no ayudan a distinguir
+MAX_POSTINGS = 5000
+
+
+def trigrams(norm):
+    """Trigramas de un texto normalizado, con bordes marcados"""
+    padded = f'  {norm} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestionIndex:
+    """Direcciones conocidas indexadas por trigrama"""
+
+    def __init__(self):
+        # id -> dict(address, norm, weight, lat, lng)
+        self.entries = []
+        # norm -> id
+        self.by_norm = {}
+        # trigrama -> set de ids
+        self.postings = defaultdict(set)
+        # Marcas de la última actualización incremental
+        self.cache_updated_at = None
+        self.soli_pk = 0
+
+    def add(self, address, weight=1, lat=None, lng=None):
+        """Agrega una dirección o suma su peso si ya existe"""
+        norm = normalize(address)
+        if len(norm) < 3:
+            return
+        entry_id = self.by_norm.get(norm)
+        if entry_id is not None:
+            entry = self.entries[entry_id]
+            entry['weight'] += weight
+            if lat is not None and entry['lat'] is None:
+                entry['lat'], entry['lng'] = lat, lng
+            return
+
+        entry_id = len(self.entries)
+        self.entries.append({'address': address.strip(), 'norm': norm, 'weight': weight,
+                             'lat': lat, 'lng': lng, 'grams': len(trigrams(norm))})
+        self.by_norm[norm] = entry_id
+        for gram in trigrams(norm):
+            self.postings[gram].add(entry_id)
+
+    def refresh(self):
+        """Agrega las geocodificaciones y solicitudes nuevas desde la última vez"""
+        geocodes = GeocodeCache.objects.filter(kind='forward', result__isnull=False)
+        if self.cache_updated_at is not None:
+            geocodes = geocodes.filter(updated_at__gt=self.cache_updated_at)
+        latest = geocodes.aggregate(latest=Max('updated_at'))['latest']
+        for result, hits in geocodes.values_list('result', 'hits').iterator(chunk_size=2000):
+            if result and result.get('address'):
+                self.add(result['address'], weight=hits + 1, lat=result.get('lat'), lng=result.get('lng'))
+        if latest is not None:
+            self.cache_updated_at = latest
+
+        # Direcciones de solicitudes agrupadas: el peso es cuántas veces se capturó
+        rows = soli.objects.filter(pk__gt=self.soli_pk).exclude(dirr='')
+        latest_pk = rows.aggregate(latest=Max('pk'))['latest']
+        for dirr, times in rows.values('dirr').annotate(times=Count('pk')).values_list('dirr', 'times'):
+            self.add(dirr, weight=times)
+        if latest_pk is not None:
+            self.soli_pk = latest_pk
+
+    def search(self, query, limit=3, min_score=MIN_SCORE):
+        """
+        Direcciones parecidas a query
+
+        Returns:
+            list: dicts address, lat, lng, score (0-1) de mayor a menor
+        """
+        norm = normalize(query)
+        grams = trigrams(norm)
+        if not grams:
+            return []
+
+        overlap = Counter()
+        common_grams = 0
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids and len(ids) > MAX_POSTINGS:
+                common_grams += 1
+            elif ids:
+                overlap.update(ids)
+        # Los trigramas demasiado comunes no cuentan a favor ni en contra
+        grams_count = len(grams) - common_grams
+        if not grams_count:
+            return []
+
+        ranked = []
+        for entry_id, common in overlap.items():
+            entry = self.entries[entry_id]
+            # Cuánto de la consulta aparece en la dirección (las guardadas suelen
+            # ser más largas) y Jaccard; el prefijo común y el uso desempatan
+            contained = common / grams_count
+            jaccard = common / (grams_count + entry['grams'] - common)
+            score = 0.7 * contained + 0.3 * jaccard
+            if entry['norm'].startswith(norm[:8]):
+                score += 0.1
+            if score < min_score:
+                continue
+            ranked.append((score + 0.01 * math.log1p(entry['weight']), min(score, 1.0), entry))
+
+        ranked.sort(key=lambda r: r[0], reverse=True)
+        return [
+            {'address': entry['address'], 'lat': entry['lat'], 'lng': entry['lng'], 'score': round(score, 2)}
+            for _, score, entry in ranked[:limit]
+        ]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_lock = threading.Lock()
+_index = SuggestionIndex()
+_refreshed_at = 0.0
+
+
+def get_index():
+    """Índice del proceso, actualizado si pasó REFRESH_INTERVAL"""
+    global _refreshed_at
+
+    now = time.monotonic()
+    if now - _refreshed_at < REFRESH_INTERVAL:
+        return _index
+
+    with _lock:
+        if time.monotonic() - _refreshed_at >= REFRESH_INTERVAL:
+            start = time.monotonic()
+            before = len(_index)
+            try:
+                _index.refresh()
+            except DatabaseError as e:
+                logger.warning(f"No se pudo actualizar el índice de sugerencias: {str(e)}")
+            _refreshed_at = time.monotonic()
+            if len(_index) != before:
+                logger.info(f"Índice de sugerencias: {len(_index) - before} nuevas, {len(_index)} en total "
+                            f"({time.monotonic() - start:.2f}s)")
+    return _index
+
+
+def suggest(address, limit=3):
+    """Sugerencias ordenadas para una dirección no encontrada"""
+    return get_index().search(address, limit=limit)
@@ -142,3 +142,174 @@ def backup_database():
     except Exception as e:
         logger.error(f"Error al crear backup: {str(e)}")
         return {"status": "error", "error": str(e)}
+
+@shared_task(bind=True, soft_time_limit=120, time_limit=180)
+def generate_document_pdf(self, uuid, asunto, puo_session='general'):
+    """
+    Tarea para renderizar y guardar el PDF de un trámite fuera del request
+
+    Crea el registro Files al terminar; el id de la tarea funciona como
+    id de trabajo para consultar el estado desde la vista pdf_job_status
+    """
+    from portaldu.desUr.documents import save_document_file
+
+    try:
+        doc = save_document_file(uuid, asunto, puo_session)
+        logger.info(f"PDF de trámite generado: {doc.nomDoc} (tarea {self.request.id})")
+        return {"status": "success", "file_id": doc.fDoc_ID, "nomDoc": doc.nomDoc}
+    except Exception as e:
+        logger.error(f"Error al generar PDF de trámite {uuid}: {str(e)}")
+        return {"status": "error", "uuid": uuid, "error": str(e)}
+
+@shared_task(bind=True, soft_time_limit=120, time_limit=180)
+def generate_pp_document_pdf(self, uuid, categoria):
+    """
+    Tarea para renderizar y guardar el PDF de presupuesto participativo
+    """
+    from portaldu.desUr.documents import save_pp_document_file
+
+    try:
+        doc = save_pp_document_file(uuid, categoria)
+        logger.info(f"PDF de presupuesto participativo generado: {doc.nomDoc} (tarea {self.request.id})")
+        return {"status": "success", "file_id": doc.fDoc_ID, "nomDoc": doc.nomDoc}
+    except Exception as e:
+        logger.error(f"Error al generar PDF de presupuesto participativo {uuid}: {str(e)}")
+        return {"status": "error", "uuid": uuid, "error": str(e)}
+
+@shared_task(bind=True, soft_time_limit=120, time_limit=180)
+def update_expediente(self, soli_id):
+    """
+    Tarea para armar o actualizar el expediente de una solicitud
+
+    Se encola cuando llega un adjunto a una solicitud que ya tiene
+    expediente; solo se anexan las páginas nuevas
+    """
+    from portaldu.desUr.expediente import get_expediente_by_id
+
+    try:
+        expediente = get_expediente_by_id(soli_id)
+        return {"status": "success", "soli_id": soli_id, "paginas": expediente.paginas}
+    except Exception as e:
+        logger.error(f"Error al actualizar expediente de solicitud {soli_id}: {str(e)}")
+        return {"status": "error", "soli_id": soli_id, "error": str(e)}
+
+@shared_task
+def purge_geocode_cache():
+    """
+    Tarea para eliminar entradas vencidas de la caché de geocodificación
+    """
+    from portaldu.desUr.geocache import purge_expired
+
+    try:
+        deleted = purge_expired()
+        logger.info(f"Caché de geocodificación: {deleted} entradas vencidas eliminadas")
+        return {"status": "success", "deleted": deleted}
+    except Exception as e:
+        logger.error(f"Error al depurar caché de geocodificación: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+@shared_task(soft_time_limit=30, time_limit=45)
+def probe_geocoding_providers():
+    """
+    Tarea para sondear ArcGIS y Nominatim
+
+    Actualiza los circuit breakers compartidos y el estado que devuelve
+    LocalGISService.get_service_status(), para que las peticiones no tengan
+    que descubrir una caída esperando el timeout
+    """
+    from portaldu.desUr.services import LocalGISService
+
+    try:
+        status = LocalGISService.probe_services()
+        return {
+            "status": "success",
+            "available": {name: info['available'] for name, info in status.items() if isinstance(info, dict)},
+        }
+    except Exception as e:
+        logger.error(f"Error al sondear proveedores de geocodificación: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+@shared_task(bind=True, soft_time_limit=3 * 3600, time_limit=3 * 3600 + 300)
+def sync_address_catalog(self, colonia_ids=None, with_numbers=True):
+    """
+    Tarea para copiar el catálogo municipal de domicilios a las tablas locales
+    """
+    from portaldu.desUr.address_catalog import sync_catalog
+
+    try:
+        run = sync_catalog(colonia_ids=colonia_ids, with_numbers=with_numbers)
+        if with_numbers:
+            rebuild_spatial_index.delay()
+        return {"status": run.status, "colonias": run.colonias, "failed": run.failed,
+                "requests": run.requests, **run.stats}
+    except Exception as e:
+        logger.error(f"Error al sincronizar catálogo de domicilios: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+
+@shared_task
+def sync_colonias():
+    """
+    Tarea para actualizar el catálogo local de colonias (autocompletado)
+    """
+    from portaldu.desUr.address_catalog import sync_colonias as sync
+
+    try:
+        count = sync()
+        return {"status": "success", "colonias": count}
+    except Exception as e:
+        logger.error(f"Error al sincronizar colonias: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+
+@shared_task
+def warm_street_cache():
+    """
+    Tarea para precargar las calles de las colonias más usadas
+    """
+    from portaldu.desUr.address_catalog import get_client
+    from portaldu.desUr.street_cache import warm
+
+    try:
+        stats = warm(get_client())
+        return {"status": "success", **stats}
+    except Exception as e:
+        logger.error(f"Error al precargar calles: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+
+@shared_task
+def rebuild_spatial_index():
+    """
+    Tarea para regenerar el índice espacial de geocodificación inversa
+    """
+    from portaldu.desUr.spatial_index import rebuild
+
+    try:
+        points = rebuild()
+        return {"status": "success", "points": points}
+    except Exception as e:
+        logger.error(f"Error al regenerar índice espacial: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+
+@shared_task(bind=True, soft_time_limit=1800, time_limit=1900)
+def geocode_backfill(self, target='soli', limit=1000, restart=False):
+    """
+    Tarea para geocodificar por lotes soli ('soli') o PpGeneral ('pp')
+
+    Procesa hasta limit registros y se vuelve a encolar mientras queden
+    pendientes; el avance se guarda en BackfillCheckpoint
+    """
+    from portaldu.desUr.geocode_backfill import UNAVAILABLE_RETRY, backfill
+
+    try:
+        stats = backfill(target, limit=limit, restart=restart)
+        if not stats['finished']:
+            # Con los proveedores caídos se espera antes de reintentar el mismo lote
+            countdown = UNAVAILABLE_RETRY if stats['interrupted'] else 5
+            geocode_backfill.apply_async(args=[target, limit], countdown=countdown)
+        return {"status": "success", "target": target, **stats}
+    except Exception as e:
+        logger.error(f"Error en geocodificación por lotes ({target}): {str(e)}")
+        return {"status": "error", "error": str(e)}
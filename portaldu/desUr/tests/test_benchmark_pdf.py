@@ -0,0 +1,48 @@
+"""
+Benchmark de render PDF como prueba de pytest
+Corre el comando benchmark_pdf con los mismos factories y casos (13 asuntos
+DOP y 5 categorías de presupuesto participativo) y verifica que cada caso
+genere su PDF. Las métricas quedan en el reporte de pytest (record_property)
+
+    pytest portaldu/desUr/tests/test_benchmark_pdf.py -m benchmark
+"""
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from portaldu.desUr.documents import ASUNTOS
+from portaldu.desUr.factories import PP_FACTORIES
+from portaldu.desUr.pdf_service import WEASYPRINT_AVAILABLE
+
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.django_db,
+    pytest.mark.skipif(not WEASYPRINT_AVAILABLE, reason="WeasyPrint no está disponible"),
+]
+
+ATTACHMENTS = (0, 5)
+
+
+def test_benchmark_pdf(tmp_path, record_property):
+    output = tmp_path / 'benchmark_pdf.json'
+    call_command(
+        'benchmark_pdf',
+        iterations=1,
+        warmup=0,
+        attachments=','.join(str(n) for n in ATTACHMENTS),
+        output=str(output),
+        stdout=StringIO(),
+    )
+
+    results = json.loads(output.read_text(encoding='utf-8'))['results']
+    assert len(results) == len(ASUNTOS) * len(ATTACHMENTS) + len(PP_FACTORIES)
+
+    for result in results:
+        assert result['size_bytes'] > 0, result['case']
+        record_property(result['case'], {
+            'p50_ms': result['p50_ms'],
+            'py_heap_peak_kb': result['py_heap_peak_kb'],
+            'rss_peak_kb': result['rss_peak_kb'],
+        })
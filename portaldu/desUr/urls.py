@@ -243,6 +243,26 @@ urlpatterns = [
     # Template: documet/save.html (confirmación)
     path('save/', views.save_document, name="saveD1"),
 
+    # Estado de un trabajo de generación de PDF (AJAX)
+    # GET - Consultado por documet/save.html mientras Celery genera el PDF
+    # Response: {'job_id': str, 'state': str, 'ready': bool, 'download_url': str}
+    # @login_required, @desur_access_required
+    path('pdf/jobs/<str:job_id>/', views.pdf_job_status, name='pdf_job_status'),
+
+    # Descarga del PDF generado por un trabajo terminado
+    # GET - FileResponse con el PDF guardado en Files
+    # 404 si el trabajo no existe, sigue en proceso o falló
+    path('pdf/jobs/<str:job_id>/download/', views.pdf_job_download, name='pdf_job_download'),
+
+    # Descarga protegida del PDF final de un trámite
+    # GET - Valida sesión y acceso CMIN/DesUr; soporta ETag, 304 y Range
+    # En producción nginx envía el archivo vía X-Accel-Redirect
+    path('archivos/<int:file_id>/', views.file_download, name='file_download'),
+
+    # Descarga protegida de un adjunto del ciudadano (SubirDocs)
+    # GET - Mismas validaciones y soporte de caché/Range que file_download
+    path('adjuntos/<int:doc_id>/', views.adjunto_download, name='adjunto_download'),
+
     # ============================================================================
     # SERVICIOS DE GEOLOCALIZACIÓN
     # ============================================================================
@@ -4,10 +4,11 @@ Maneja todas las operaciones relacionadas con solicitudes ciudadanas, documentos
 """
 import base64
 import uuid
-from io import BytesIO
 import re
 import json
 import logging
+import os
+import threading
 from datetime import date
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -15,9 +16,10 @@ from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.core.mail import EmailMessage
 from django.db import transaction
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -25,24 +27,21 @@ from django.views.decorators.http import require_http_methods
 from .WSDService import WsDomicilios
 from .WsConfig import WSDConfig
 from .services import LocalGISService
-
-# Imports para PDF (weasyprint)
-try:
-    from weasyprint import HTML
-except ImportError:
-    # Si weasyprint no está disponible, crear un mock
-    class HTML:
-        def __init__(self, **kwargs):
-            pass
-        def write_pdf(self, target=None):
-            return b"PDF content not available"
+from .pdf_service import render_pdf
+from .pdf_pool import PdfRenderError
+from .file_delivery import serve_file
+from .suggestions import suggest
+from . import colonia_index
+from .address_catalog import local_calles, local_colonias_by_cp, local_numeros
+from .folios import allocate_folio, allocate_pp_folio, get_puo_txt
+from .documents import render_document_pdf, save_document_file, save_pp_document_file
+from .tasks import generate_document_pdf, generate_pp_document_pdf
 
 # Usar el modelo unificado de usuarios de CMIN
 from portaldu.cmin.models import Users, LoginDate, Licitaciones
 
 # Imports de modelos locales de DesUr
-from .models import (data, soli, Files, Uuid,
-                     PpCS, PpEscuela, PpGeneral, PpPluvial, PpParque, PpInfraestructura,
+from .models import (data, soli, Files, Uuid, PpGeneral,
                      SubirDocs, Pagos)
 from .forms import (GeneralRender, CsRender, EscuelaRender, PluvialRender, ParqueRender,
                     DesUrLogin, InfraestructuraRender)
@@ -858,96 +857,20 @@ def document(request):
     if not uuid:
         return redirect('home')
 
-    datos = get_object_or_404(data, fuuid__uuid=uuid)
-    #solicitud = get_object_or_404(soli, data_ID=datos)
-    #ultima_solicitud = soli.objects.filter(data_ID=datos).last()
+    asunto = request.session.get('asunto', 'Sin asunto')
+    puo = request.session.get('puo', 'general')
+
     try:
-        ultima_solicitud = soli.objects.filter(data_ID=datos).latest('fecha')
+        entry = render_document_pdf(uuid, asunto, puo)[-1]
     except soli.DoesNotExist:
-        logger.error(request, "No hay solicitud")
+        logger.error("No hay solicitud")
         return redirect('soli')
+    except (PdfRenderError, MemoryError) as e:
+        return pdf_render_failed(e)
 
-    documentos = SubirDocs.objects.filter(fuuid__uuid=uuid)
-
-    asunto = request.session.get('asunto', 'Sin asunto')
-    puo = request.session.get('puo', 'Sin PUO')
-    print(puo)
-
-    uuid_obj = get_object_or_404(Uuid, uuid=uuid)
-
-    if ultima_solicitud and ultima_solicitud.folio:
-        puo_txt, _ = gen_folio(uuid_obj, ultima_solicitud.puo)
-        folio = ultima_solicitud.folio
-    else:
-        puo_session = request.session.get('puo', 'general')
-        puo_txt, folio = gen_folio(uuid_obj, puo_session)
-    print(asunto)
-    print(puo_txt)
-
-    match asunto:
-        case "DOP00001":
-            asunto = "Arreglo de calles de terracería - DOP00001"
-        case "DOP00002":
-            asunto = "Bacheo de calles - DOP00002"
-        case "DOP00003":
-            asunto = "Limpieza de arroyos al sur de la ciudad - DOP00003"
-        case "DOP00004":
-            asunto = "Limpieza o mantenimiento de rejillas pluviales - DOP00004"
-        case "DOP00005":
-            asunto = "Pago de costo de participación en licitaciones de obra pública - DOP00005"
-        case "DOP00006":
-            asunto = "Rehabilitación de calles - DOP00006"
-        case "DOP00007":
-            asunto = "Retiro de escombro y material de arrastre - DOP00007"
-        case "DOP00008":
-            asunto = "Solicitud de material caliche/fresado - DOP00008"
-        case "DOP00009":
-            asunto = "Solicitud de pavimentación de calles - DOP00009"
-        case "DOP00010":
-            asunto = "Solicitud de reductores de velocidad - DOP00010"
-        case "DOP00011":
-            asunto = "Solicitud de pintura para señalamientos viales - DOP00011"
-        case "DOP00012":
-            asunto = "Arreglo de derrumbe de bardas - DOP00012"
-        case "DOP00013":
-            asunto = "Tapiado - DOP00013"
-
-    context = {
-        "asunto": asunto,
-        "datos": {
-            "nombre": datos.nombre,
-            "pApe": datos.pApe,
-            "mApe": datos.mApe,
-            "bDay": datos.bDay,
-            "tel": datos.tel,
-            "curp": datos.curp,
-            "sexo": datos.sexo,
-            "dir": datos.dirr,
-            "disc":datos.disc,
-            "etnia":datos.etnia,
-            "vul": datos.vul if datos.vul else "No pertenece a un grupo vulnerable",
-        },
-        "soli": {
-            "dir": ultima_solicitud.dirr if ultima_solicitud else "",
-            "info": ultima_solicitud.info,
-            "descc": ultima_solicitud.descc if ultima_solicitud else "",
-            "foto": ultima_solicitud.foto,
-            "fecha": ultima_solicitud.fecha,
-        },
-        'puo':puo_txt,
-        'documentos':documentos,
-        'folio': folio,
-    }
-
-    html = render_to_string("documet/document.html", context)
-    pdf_out = HTML(string=html, base_url=request.build_absolute_uri('/'))
-    final_pdf = pdf_out.write_pdf()
-    response = HttpResponse(final_pdf, content_type="application/pdf")
-    response["Content-Disposition"] = "inline; filename=información_general.pdf"
-    return response
-
-
-    #return render(request, "documet/document.html", context)
+    # Se envía el PDF de la caché en streaming (ETag/304 y Range incluidos)
+    return serve_file(request, entry.archivo, filename="información_general.pdf",
+                      content_type="application/pdf")
 
 
 @login_required
@@ -963,25 +886,24 @@ def save_document(request):
         HttpResponse con confirmación de documento guardado
 
     Process:
-        1. Obtiene datos del ciudadano y solicitud
-        2. Procesa documentos temporales en base64 desde formulario
-        3. Genera folio si no existe
-        4. Renderiza template HTML con contexto completo
-        5. Convierte HTML a PDF usando WeasyPrint
-        6. Guarda PDF en modelo Files asociado a la solicitud
-        7. Muestra confirmación con link al documento
+        1. Valida que existan datos del ciudadano y solicitud
+        2. Encola la tarea generate_document_pdf en Celery
+        3. Muestra confirmación inmediatamente con el id del trabajo
+        4. La página consulta pdf_job_status hasta que el PDF está listo
 
-    Document Processing:
-        - Lee documentos temporales en formato base64 del POST
-        - Decodifica y guarda cada documento en SubirDocs
-        - Valida formato JSON de cada documento temporal
+    Background (tarea de Celery):
+        - Genera folio si no existe
+        - Renderiza template HTML y lo convierte a PDF con WeasyPrint
+        - Guarda PDF en modelo Files asociado a la solicitud
+
+    Fallback:
+        Si el broker no está disponible el PDF se genera en el request
 
     Naming Convention:
         Archivo: 'VS_{asunto}_{nombre}_{apellido}.pdf'
 
     Side Effects:
-        - Crea registros en SubirDocs para documentos temporales
-        - Crea registro en Files con PDF final
+        - Crea registro en Files con PDF final (desde la tarea)
         - Guarda archivo físico en media/documents/
 
     Context:
@@ -997,95 +919,22 @@ def save_document(request):
         return redirect('home')
 
     datos = get_object_or_404(data, fuuid__uuid=uuid)
-    uid = get_object_or_404(Uuid, uuid=uuid)
-    #solicitud = get_object_or_404(soli, data_ID=datos)
-    #solicitud = soli.objects.filter(data_ID=datos).select_related('data_ID')
-
-    try:
-        solicitud = soli.objects.filter(data_ID=datos).latest('fecha')
-    except soli.DoesNotExist:
+    if not soli.objects.filter(data_ID=datos).exists():
         return HttpResponse("No hay solicitud", status=400)
 
-    print(solicitud)
-    documentos = SubirDocs.objects.filter(fuuid__uuid=uuid).order_by('-nomDoc')
-
-
     asunto = request.session.get('asunto', 'Sin asunto')
-    puo = request.session.get('puo', 'Sin PUO')
-    print(puo)
-    print(asunto)
+    puo = request.session.get('puo', 'general')
 
-    if solicitud and solicitud.folio:
-        puo_txt, folio = gen_folio(uid, solicitud.puo), solicitud.folio
+    job_id = enqueue_pdf_job(generate_document_pdf, uuid, asunto, puo)
+    if job_id:
+        return render(request, 'documet/save.html', {'job_id': job_id})
 
-        puo_txt = puo_txt[0]
-        folio = solicitud.folio
-    else:
-        puo_txt, folio = gen_folio(uid, solicitud.puo if solicitud else 'general')
-
-    match asunto:
-        case "DOP00001":
-            asunto = "Arreglo de calles de terracería - DOP00001"
-        case "DOP00002":
-            asunto = "Bacheo de calles - DOP00002"
-        case "DOP00003":
-            asunto = "Limpieza de arroyos al sur de la ciudad - DOP00003"
-        case "DOP00004":
-            asunto = "Limpieza o mantenimiento de rejillas pluviales - DOP00004"
-        case "DOP00005":
-            asunto = "Pago de costo de participación en licitaciones de obra pública - DOP00005"
-        case "DOP00006":
-            asunto = "Rehabilitación de calles - DOP00006"
-        case "DOP00007":
-            asunto = "Retiro de escombro y material de arrastre - DOP00007"
-        case "DOP00008":
-            asunto = "Solicitud de material caliche/fresado - DOP00008"
-        case "DOP00009":
-            asunto = "Solicitud de pavimentación de calles - DOP00009"
-        case "DOP00010":
-            asunto = "Solicitud de reductores de velocidad - DOP00010"
-        case "DOP00011":
-            asunto = "Solicitud de pintura para señalamientos viales - DOP00011"
-        case "DOP00012":
-            asunto = "Arreglo de derrumbe de bardas - DOP00012"
-        case "DOP00013":
-            asunto = "Tapiado - DOP00013"
-
-    context = {
-        "asunto": asunto,
-        "datos": {
-            "nombre": datos.nombre,
-            "pApe": datos.pApe,
-            "mApe": datos.mApe,
-            "bDay": datos.bDay,
-            "tel": datos.tel,
-            "curp": datos.curp,
-            "sexo": datos.sexo,
-            "dir": datos.dirr,
-            "disc": datos.disc,
-            "etnia": datos.etnia,
-            "vul": datos.vul if datos.vul else "No pertenece a un grupo vulnerable",
-        },
-        "soli": {
-            "dir": solicitud.dirr if solicitud else "",
-            "info": solicitud.info,
-            "desc": solicitud.descc if solicitud else "",
-            "foto": solicitud.foto,
-            "fecha": solicitud.fecha,
-        },
-        'puo': puo_txt,
-        'documentos': documentos,
-        'folio': folio,
-    }
-    html = render_to_string("documet/document.html", context)
-    buffer = BytesIO()
-    pdf_out = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf(buffer)
-    pdf_file = ContentFile(buffer.getvalue())
-    nomDoc = f'VS_{asunto}_{datos.nombre}_{datos.pApe}.pdf'
-    doc = Files(nomDoc=nomDoc, fuuid=uid, soli_FK=solicitud)
-    doc.finalDoc.save(nomDoc, pdf_file)
-
-    return render(request, 'documet/save.html', {'doc':doc})
+    # Sin broker disponible: generar el documento en línea como respaldo
+    try:
+        doc = save_document_file(uuid, asunto, puo)
+    except (PdfRenderError, MemoryError) as e:
+        return pdf_render_failed(e)
+    return render(request, 'documet/save.html', {'doc': doc})
 
 @login_required
 @desur_access_required
@@ -1120,7 +969,7 @@ def pp_document(request):
         DOP-CPP-{id:05d}-{uuid[:4]}/{año}
 
     Side Effects:
-        - Genera PDF y lo guarda en PpFiles
+        - Encola generate_pp_document_pdf, que genera el PDF y lo guarda en Files
         - Asocia documento con PpGeneral y UUID de sesión
 
     Template:
@@ -1132,232 +981,19 @@ def pp_document(request):
     if not uuid:
         return redirect('home')
 
-    uuid_object = get_object_or_404(Uuid, uuid=uuid)
-    gen_data = get_object_or_404(PpGeneral, fuuid__uuid=uuid)
+    get_object_or_404(PpGeneral, fuuid__uuid=uuid)
     cat = request.session.get('categoria', 'sin categoria')
-    propuesta = None
-    num_folio = gen_pp_folio(gen_data.fuuid)
-    context = {}
-    instalaciones_dict = dict(PpGeneral.INSTALATION_CHOICES)
-    estados_dict = dict(PpGeneral.CHOICES_STATE)
-
-    match cat:
-        case "parque":
-            cat = "Parques"
-            propuesta = PpParque.objects.filter(fk_pp=gen_data).last()
-
-            propuesta_data = {}
-            if propuesta:
-                propuesta_data = {
-                    'cancha_futbol_rapido': propuesta.cancha_futbol_rapido,
-                    'cancha_futbol_soccer': propuesta.cancha_futbol_soccer,
-                    'cancha_futbol_7x7': propuesta.cancha_futbol_7x7,
-                    'cancha_beisbol': propuesta.cancha_beisbol,
-                    'cancha_softbol': propuesta.cancha_softbol,
-                    'cancha_usos_multiples': propuesta.cancha_usos_multiples,
-                    'cancha_otro': propuesta.cancha_otro,
-                    'alumbrado_rehabilitacion': propuesta.alumbrado_rehabilitacion,
-                    'alumbrado_nuevo': propuesta.alumbrado_nuevo,
-                    'juegos_dog_park': propuesta.juegos_dog_park,
-                    'juegos_infantiles': propuesta.juegos_infantiles,
-                    'juegos_ejercitadores': propuesta.juegos_ejercitadores,
-                    'juegos_otros': propuesta.juegos_otro,
-                    'techumbre_domo': propuesta.techumbre_domo,
-                    'techumbre_kiosko': propuesta.techumbre_kiosko,
-                    'equipamiento_botes': propuesta.equipamiento_botes,
-                    'equipamiento_bancas': propuesta.equipamiento_bancas,
-                    'equipamiento_andadores': propuesta.equipamiento_andadores,
-                    'equipamiento_rampas': propuesta.equipamiento_rampas,
-                }
-
-            context = {
-                "cat":cat,
-                "datos":{
-                    "nombre": gen_data.nombre_promovente,
-                    "telefono": gen_data.telefono,
-                    "direccion": gen_data.direccion_proyecto,
-                    "desc": gen_data.desc_p,
-                    "fecha": gen_data.fecha_pp,
-                    "notas": gen_data.notas_importantes,
-                    "instalaciones": gen_data.instalation_choices
-                },
-                "propuesta": propuesta_data,
-                "notas_parque": propuesta.notas_parque,
-                "folio": num_folio,
-                "instalaciones_dict": instalaciones_dict,
-                "estados_dict": estados_dict,
-            }
-
-        case "escuela":
-            cat = "Escuelas"
-            propuesta = PpEscuela.objects.filter(fk_pp=gen_data).last()
-
-            propuesta_data = {}
-            if propuesta:
-                propuesta_data = {
-                    'rehabilitacion_baños': propuesta.rehabilitacion_baños,
-                    'rehabilitacion_salones': propuesta.rehabilitacion_salones,
-                    'rehabilitacion_electricidad': propuesta.rehabilitacion_electricidad,
-                    'rehabilitacion_gimnasio': propuesta.rehabilitacion_gimnasio,
-                    'rehabilitacion_otro': propuesta.rehabilitacion_otro,
-                    'construccion_domo': propuesta.construccion_domo,
-                    'construccion_aula': propuesta.construccion_aula,
-                    'cancha_futbol_rapido': propuesta.cancha_futbol_rapido,
-                    'cancha_usos_multiples': propuesta.cancha_usos_multiples,
-                    'cancha_futbol_7x7': propuesta.cancha_futbol_7x7,
-                }
 
-            context = {
-                "cat": cat,
-                "datos": {
-                    "nombre": gen_data.nombre_promovente,
-                    "telefono": gen_data.telefono,
-                    "direccion": gen_data.direccion_proyecto,
-                    "desc": gen_data.desc_p,
-                    "fecha": gen_data.fecha_pp,
-                    "instalaciones": gen_data.instalation_choices,
-                    "notas": gen_data.notas_importantes,
-                },
-                "nom_escuela": propuesta.nom_escuela,
-                "propuesta": propuesta_data,
-                "notas": propuesta.notas_escuela,
-                "folio": num_folio,
-                "instalaciones_dict": instalaciones_dict,
-                "estados_dict": estados_dict,
-            }
-
-        case "cs":
-            cat = "Centro comunitario - Salón de usos múltiples"
-            propuesta = PpCS.objects.filter(fk_pp=gen_data).last()
-
-            propuesta_data = {}
-            if propuesta:
-                propuesta_data = {
-                    'rehabilitacion_baños': propuesta.rehabilitacion_baños,
-                    'rehabilitacion_salones': propuesta.rehabilitacion_salones,
-                    'rehabilitacion_electricidad': propuesta.rehabilitacion_electricidad,
-                    'rehabilitacion_gimnasio': propuesta.rehabilitacion_gimnasio,
-                    'construccion_domo': propuesta.construccion_domo,
-                    'construccion_salon': propuesta.construccion_salon,
-                    'construccion_otro': propuesta.construccion_otro,
-                }
-
-            context = {
-                "cat": cat,
-                "datos": {
-                    "nombre": gen_data.nombre_promovente,
-                    "telefono": gen_data.telefono,
-                    "direccion": gen_data.direccion_proyecto,
-                    "desc": gen_data.desc_p,
-                    "fecha": gen_data.fecha_pp,
-                    "instalaciones": gen_data.instalation_choices,
-                    "notas": gen_data.notas_importantes,
-                },
-                "notas": propuesta.notas_propuesta,
-                "propuesta": propuesta_data,
-                "folio": num_folio,
-                "instalaciones_dict": instalaciones_dict,
-                "estados_dict": estados_dict,
-            }
-        case "infraestructura":
-            cat = "Infraestructura"
-            propuesta = PpInfraestructura.objects.filter(fk_pp=gen_data).last()
-
-            propuesta_data = {}
-            if propuesta:
-                propuesta_data = {
-                    'infraestructura_barda': propuesta.infraestructura_barda,
-                    'infraestructura_baquetas': propuesta.infraestructura_banquetas,
-                    'infraestructura_muro': propuesta.infraestructura_muro,
-                    'infraestructura_camellon': propuesta.infraestructura_camellon,
-                    'infraestructura_crucero': propuesta.infraestructura_crucero,
-                    'infraestructura_ordenamiento': propuesta.infraestructura_ordenamiento,
-                    'infraestructura_er': propuesta.infraestructura_er,
-                    'infraestructura_mejora': propuesta.infraestructura_mejora,
-                    'infraestructura_peatonal': propuesta.infraestructura_peatonal,
-                    'infraestructura_bayoneta': propuesta.infraestructura_bayoneta,
-                    'infraestructura_topes': propuesta.infraestructura_topes,
-                    'infraestructura_puente': propuesta.infraestructura_puente,
-                    'pavimentacion_asfalto': propuesta.pavimentacion_asfalto,
-                    'paviementacion_rehabilitacion': propuesta.pavimentacion_rehabilitacion,
-                    'señalamiento_pintura': propuesta.señalamiento_pintura,
-                    'señalamiento_señales': propuesta.señalamiento_señales,
-                }
+    job_id = enqueue_pdf_job(generate_pp_document_pdf, uuid, cat)
+    if job_id:
+        return render(request, 'documet/save.html', {"job_id": job_id})
 
-            context = {
-                "cat": cat,
-                "datos": {
-                    "nombre": gen_data.nombre_promovente,
-                    "telefono": gen_data.telefono,
-                    "direccion": gen_data.direccion_proyecto,
-                    "desc": gen_data.desc_p,
-                    "fecha": gen_data.fecha_pp,
-                    "instalaciones": gen_data.instalation_choices,
-                    "notas": gen_data.notas_importantes,
-                },
-                "notas": propuesta.notas_propuesta,
-                "propuesta": propuesta_data,
-                "folio": num_folio,
-                "instalaciones_dict": instalaciones_dict,
-                "estados_dict": estados_dict,
-            }
-
-        case "pluviales":
-            cat = "Soluciones pluviales"
-            propuesta = PpPluvial.objects.filter(fk_pp=gen_data).last()
-
-            propuesta_data = {}
-            if propuesta:
-                propuesta_data = {
-                    'pluvial_muro_contencion': propuesta.pluvial_muro_contencion,
-                    'pluvial_canalizacion': propuesta.pluvial_canalizacion,
-                    'pluvial_puente_peatonal': propuesta.pluvial_puente_peatonal,
-                    'pluvial_vado': propuesta.pluvial_vado,
-                    'pluvial_puente': propuesta.pluvial_puente,
-                    'pluvial_desalojo': propuesta.pluvial_desalojo,
-                    'pluvial_rejillas': propuesta.pluvial_rejillas,
-                    'pluvial_lavaderos': propuesta.pluvial_lavaderos,
-                    'pluvial_obra_hidraulica': propuesta.pluvial_obra_hidraulica,
-                    'pluvial_reposicion_piso': propuesta.pluvial_reposicion_piso,
-                    'pluvial_proteccion_inundaciones': propuesta.pluvial_proteccion_inundaciones,
-                }
-
-            context = {
-                "cat": cat,
-                "datos": {
-                    "nombre": gen_data.nombre_promovente,
-                    "telefono": gen_data.telefono,
-                    "direccion": gen_data.direccion_proyecto,
-                    "desc": gen_data.desc_p,
-                    "fecha": gen_data.fecha_pp,
-                    "instalaciones": gen_data.instalation_choices,
-                    "notas": gen_data.notas_importantes,
-                },
-                "propuesta": propuesta_data,
-                "notas": propuesta.notas_propuesta,
-                "folio": num_folio,
-                "instalaciones_dict": instalaciones_dict,
-                "estados_dict": estados_dict,
-            }
-
-
-
-    #html = render_to_string("documet/pp_document.html", context)
-    #pdf_out = HTML(string=html, base_url=request.build_absolute_uri('/'))
-    #final_pdf = pdf_out.write_pdf()
-    #response = HttpResponse(final_pdf, content_type="application/pdf")
-    #response["Content-Disposition"] = "inline; filename=información_general.pdf"
-    #return response
-
-    html = render_to_string("documet/pp_document.html", context)
-    buffer = BytesIO()
-    pdf_out = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf(buffer)
-    pdf_file = ContentFile(buffer.getvalue())
-    nomDoc = f'VS_{cat}_{gen_data.nombre_promovente}_Presupuesto_Participativo.pdf'
-    doc = Files(nomDoc=nomDoc, fuuid=uuid_object, pp_FK=gen_data)
-    doc.finalDoc.save(nomDoc, pdf_file)
-
-    return render(request, 'documet/save.html', {"doc":doc})
+    # Sin broker disponible: generar el documento en línea como respaldo
+    try:
+        doc = save_pp_document_file(uuid, cat)
+    except (PdfRenderError, MemoryError) as e:
+        return pdf_render_failed(e)
+    return render(request, 'documet/save.html', {"doc": doc})
 
 @login_required
 @desur_access_required
@@ -1410,14 +1046,171 @@ def document2(request):
         },
     }
     html = render_to_string("documet/document2.html", context)
-    pdf_out = HTML(string=html, base_url=request.build_absolute_uri('/'))
-    final_pdf = pdf_out.write_pdf()
+    try:
+        final_pdf = render_pdf(html)
+    except (PdfRenderError, MemoryError) as e:
+        return pdf_render_failed(e)
     response = HttpResponse(final_pdf, content_type="application/pdf")
     response["Content-Disposition"] = "inline; filename=información_general.pdf"
 
     return response
     #return render(request, "documet/document2.html")
 
+def pdf_render_failed(error):
+    """
+    Respuesta para el usuario cuando el renderer PDF no pudo generar el documento
+
+    Args:
+        error: PdfRenderError (tiempo límite, renderer caído) o MemoryError
+
+    Returns:
+        HttpResponse 503 con un mensaje para reintentar
+    """
+    logger.error(f"Error al renderizar PDF: {str(error)}")
+    return HttpResponse("No fue posible generar el documento en este momento, intente de nuevo", status=503)
+
+def enqueue_pdf_job(task, *args):
+    """
+    Encola una tarea de generación de PDF en Celery
+
+    Args:
+        task: Tarea de Celery (generate_document_pdf / generate_pp_document_pdf)
+        *args: Argumentos de la tarea
+
+    Returns:
+        str: id del trabajo, o None si el broker no está disponible
+    """
+    try:
+        return task.delay(*args).id
+    except Exception as e:
+        logger.error(f"No se pudo encolar {task.name}: {str(e)}")
+        return None
+
+
+@login_required
+@desur_access_required
+def pdf_job_status(request, job_id):
+    """
+    Consultar el estado de un trabajo de generación de PDF
+
+    Args:
+        request: HttpRequest
+        job_id: id de la tarea de Celery devuelto al encolar
+
+    Returns:
+        JsonResponse con:
+            - job_id, state (PENDING, STARTED, SUCCESS, FAILURE...), ready
+            - file_id, nomDoc y download_url cuando el PDF ya está guardado
+            - error si la tarea falló
+
+    Note:
+        Usado por documet/save.html para hacer polling mientras se genera el PDF
+    """
+    from celery.result import AsyncResult
+
+    result = AsyncResult(job_id)
+    response = {
+        'job_id': job_id,
+        'state': result.state,
+        'ready': result.ready(),
+    }
+
+    if result.successful():
+        payload = result.result or {}
+        if payload.get('status') == 'success':
+            response.update({
+                'file_id': payload['file_id'],
+                'nomDoc': payload['nomDoc'],
+                'download_url': reverse('pdf_job_download', args=[job_id]),
+            })
+        else:
+            response['state'] = 'FAILURE'
+            response['error'] = payload.get('error', 'Error desconocido')
+    elif result.failed():
+        response['error'] = str(result.result)
+
+    return JsonResponse(response)
+
+
+@login_required
+@desur_access_required
+def pdf_job_download(request, job_id):
+    """
+    Descargar el PDF generado por un trabajo terminado
+
+    Args:
+        request: HttpRequest
+        job_id: id de la tarea de Celery
+
+    Returns:
+        PDF como descarga (serve_file), o 404 si el trabajo no ha terminado
+    """
+    from celery.result import AsyncResult
+
+    result = AsyncResult(job_id)
+    payload = result.result if result.successful() else None
+    if not isinstance(payload, dict) or payload.get('status') != 'success':
+        raise Http404("Documento no disponible")
+
+    doc = get_object_or_404(Files, fDoc_ID=payload['file_id'])
+    if not doc.can_download(request.user, request.COOKIES.get('uuid')):
+        return HttpResponse("No autorizado", status=403)
+    return serve_file(request, doc.finalDoc, filename=doc.nomDoc, as_attachment=True,
+                      content_type='application/pdf')
+
+
+@login_required
+def adjunto_download(request, doc_id):
+    """
+    Entregar un adjunto del ciudadano (SubirDocs.doc) con permisos
+
+    Args:
+        request: HttpRequest
+        doc_id: ID del registro SubirDocs
+
+    Returns:
+        Respuesta de serve_file (streaming o X-Accel-Redirect)
+
+    Permisos:
+        SubirDocs.can_download: CMIN ve todos; campo solo los de sus
+        solicitudes o del trámite en curso
+    """
+    if not (request.user.has_cmin_access() or request.user.has_desur_access()):
+        return HttpResponse("No autorizado", status=403)
+
+    doc = get_object_or_404(SubirDocs.objects.select_related('fuuid'), doc_ID=doc_id)
+    if not doc.can_download(request.user, request.COOKIES.get('uuid')):
+        return HttpResponse("No autorizado", status=403)
+    return serve_file(request, doc.doc)
+
+
+@login_required
+def file_download(request, file_id):
+    """
+    Entregar el PDF final de un trámite (Files.finalDoc) con permisos
+
+    Args:
+        request: HttpRequest
+        file_id: ID del registro Files
+
+    Returns:
+        Respuesta de serve_file: streaming con ETag/Last-Modified y Range,
+        o X-Accel-Redirect a nginx en producción
+
+    Permisos:
+        Files.can_download: CMIN ve todos; campo solo los de sus solicitudes
+        o del trámite en curso. Los documentos ya no se publican
+        directamente en /media/
+    """
+    if not (request.user.has_cmin_access() or request.user.has_desur_access()):
+        return HttpResponse("No autorizado", status=403)
+
+    doc = get_object_or_404(Files.objects.select_related('soli_FK', 'fuuid'), fDoc_ID=file_id)
+    if not doc.can_download(request.user, request.COOKIES.get('uuid')):
+        return HttpResponse("No autorizado", status=403)
+    return serve_file(request, doc.finalDoc, filename=doc.nomDoc, content_type='application/pdf')
+
+
 @login_required
 @desur_access_required
 def clear(request):
@@ -1448,7 +1241,7 @@ def clear(request):
 
 def gen_folio(uid, puo):
     """
-    Genera folio único para trámites con formato estandarizado y validaciones
+    Genera folio único para trámites con formato estandarizado
 
     Args:
         uid: UUID object o string con el UUID de sesión
@@ -1457,29 +1250,14 @@ def gen_folio(uid, puo):
     Returns:
         tuple: (puo_txt, folio)
             - puo_txt: Descripción legible del tipo de proceso
-            - folio: Folio generado con formato DOP-{PUO}-{id:05d}-{uuid[:4]}/{año}
+            - folio: Folio con formato DOP-{PUO}-{número:05d}-{uuid[:4]}/{año}
 
     Folio Format:
-        DOP-{PUO}-{id:05d}-{uuid_prefix}/{year}
-        - DOP: Gobierno de Obra Pública
-        - PUO: Código del proceso (3 letras)
-        - id: ID numérico con padding de 5 dígitos
+        DOP-{PUO}-{número:05d}-{uuid_prefix}/{year}
+        - número: Consecutivo por PUO y año (ver folios.py)
         - uuid_prefix: Primeros 4 caracteres del UUID
         - year: Últimos 2 dígitos del año actual
-
-    Procesos Válidos (PUO):
-        - OFI: Oficio
-        - CRC: CRC (Comité de Recursos Ciudadanos)
-        - MEC: Marca el cambio
-        - DLO: Diputado Local
-        - DFE: Diputado Federal
-        - REG: Regidores
-        - DEA: Despacho del Alcalde
-        - EVA: Evento con el Alcalde
-        - PED: Presencial en Dirección
-        - VIN: Vinculación (default si PUO no reconocido)
-        - PPA: Presupuesto participativo
-        - CPC: Coordinación de Participación Ciudadana
+        Los PUO no reconocidos usan la serie VIN
 
     Error Handling:
         Si ocurre error, retorna ('Error', 'ERROR-{uuid[:8]}')
@@ -1495,100 +1273,16 @@ def gen_folio(uid, puo):
         else:
             raise ValueError(f"UUID inválido {type(uid)}")
 
-
-        uuid_id = uuid_obj.prime
         uid_str = str(uuid_obj.uuid)
-
-        fecha = date.today()
-        year_str = str(fecha.year)
-        year_slice = year_str[2:4]
-
-        match puo:
-            case 'OFI':
-                folio = f'DOP-OFI-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Oficio'
-            case 'CRC':
-                folio = f'DOP-CRC-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'CRC'
-            case 'MEC':
-                folio = f'DOP-MEC-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Marca el cambio'
-            case 'DLO':
-                folio = f'DOP-DLO-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Diputado Local'
-            case 'DFE':
-                folio = f'DOP-DFE-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Diputado Federal'
-            case 'REG':
-                folio = f'DOP-REG-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Regidores'
-            case 'DEA':
-                folio = f'DOP-DEA-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Despacho del Alcalde'
-            case 'EVA':
-                folio = f'DOP-EVA-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Evento con el Alcalde'
-            case 'PED':
-                folio = f'DOP-PED-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Presencial en Dirección'
-            case 'VIN':
-                folio = f'DOP-VIN-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Vinculación'
-            case 'PPA':
-                folio = f'DOP-PPA-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Presupuesto participativo'
-            case 'CPC':
-                folio = f'DOP-CPC-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'Coordinación de Participación Ciudadana'
-            case _:
-                folio = f'DOP-VIN-{uuid_id:05d}-{uid_str[:4]}/{year_slice}'
-                puo_txt = 'General'
+        folio = allocate_folio(puo, uid_str)
 
         logger.info(f"Folio generado correctamente: {folio}")
-        return puo_txt, folio
+        return get_puo_txt(puo), folio
 
     except Exception as e:
         logger.error(f"Error generando folio: {str(e)}")
         return 'Error', f'ERROR-{uid_str[:8]}'
 
-def gen_pp_folio(fuuid):
-    """
-    Genera folio específico para propuestas de Presupuesto Participativo
-
-    Args:
-        fuuid: Objeto Uuid de la sesión
-
-    Returns:
-        str: Folio con formato DOP-CPP-{id:05d}-{uuid[:4]}/{año}
-
-    Folio Format:
-        DOP-CPP-{id:05d}-{uuid_prefix}/{year}
-        - CPP: Código fijo para Presupuesto Participativo
-        - id: ID del registro PpGeneral con padding de 5 dígitos
-        - uuid_prefix: Primeros 4 caracteres del UUID
-        - year: Últimos 2 dígitos del año actual
-
-    Error Handling:
-        Si ocurre error, retorna 'ERROR-PP-{uuid[:8]}'
-    """
-    try:
-        pp_info = PpGeneral.objects.filter(fuuid=fuuid).last()
-        uid_str = str(fuuid.uuid)
-        id_pp = pp_info.pk if pp_info else 0 # Valor por defecto
-
-        fecha = date.today()
-        year_str = str(fecha.year)
-        year_slice = year_str[2:4]
-
-        folio = f'DOP-CPP-{id_pp:05d}-{uid_str[:4]}/{year_slice}'
-
-        logger.debug("Folio de PP generado correctamente")
-        return folio
-
-    except Exception as e:
-        logger.error(f"Error generando folio PP: {str(e)}")
-        return f'ERROR-PP-{str(fuuid.uuid)[:8]}'
-
 def validar_curp(curp):
     """
     Valida formato de CURP según estándar mexicano oficial
@@ -2213,7 +1907,7 @@ def geocode_view(request):
                 return JsonResponse({
                     'success': False,
                     'error': 'No se encontró la dirección',
-                    'suggestions': LocalGISService._get_suggestions(address),
+                    **_get_suggestions(address),
                     'processing_time': processing_time
                 })
 
@@ -2241,23 +1935,27 @@ def geocode_view(request):
             'processing_time': processing_time
         })
 
-@staticmethod
 def _get_suggestions(address):
-    """Proporciona sugerencias para direcciones no encontradas"""
-    suggestions = []
+    """
+    Sugerencias para direcciones no encontradas
 
-    # Sugerencias basadas en la entrada
-    if any(word in address.lower() for word in ['casa', 'num', '#']):
-        suggestions.append("Intenta: 'Calle [nombre] [número], Chihuahua'")
+    Returns:
+        dict: suggestions (textos para mostrar, máximo 3) y candidates
+              (dirección, coordenadas y score de cada sugerencia)
+    """
+    try:
+        candidates = suggest(address)
+    except Exception as e:
+        logger.warning(f"Índice de sugerencias no disponible: {str(e)}")
+        candidates = []
 
-    if 'burkina faso' in address.lower():
-        suggestions.extend([
-            "Calle Burkina Faso 1721, Chihuahua",
-            "1721 Burkina Faso, Bosques del Pedregal",
-            "Burkina Faso, CP 31203"
-        ])
+    suggestions = [c['address'] for c in candidates]
 
-    return suggestions[:3]  # Máximo 3 sugerencias
+    # Sin parecidas conocidas: indicar el formato esperado
+    if not suggestions and any(word in address.lower() for word in ['casa', 'num', '#']):
+        suggestions.append("Intenta: 'Calle [nombre] [número], Chihuahua'")
+
+    return {'suggestions': suggestions[:3], 'candidates': candidates}
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -2337,14 +2035,44 @@ def reverse_geocode_view(request):
         })
 
 # Implementación de WsDomicilios
+_wsd_client = None
+_wsd_client_pid = None
+_wsd_client_lock = threading.Lock()
+
+
 def get_wsd_client():
-    config = WSDConfig()
+    """
+    Cliente de WsDomicilios del proceso
+
+    Se reutiliza entre peticiones para conservar el token (compartido) y la
+    sesión NTLM de cada hilo; las vistas llaman ensure_token(), que solo va
+    al servicio cuando el token está por vencer. Tras un fork cada worker
+    crea el suyo
+    """
+    global _wsd_client, _wsd_client_pid
+
+    with _wsd_client_lock:
+        if _wsd_client is None or _wsd_client_pid != os.getpid():
+            config = WSDConfig()
+            _wsd_client = WsDomicilios(
+                base_url=config.BASE_URL,
+                windows_user=config.WINDOWS_USER,
+                windows_password=config.WINDOWS_PASSWORD
+            )
+            _wsd_client_pid = os.getpid()
+        return _wsd_client
+
+def _wsd_client_with_token():
+    """Cliente de WsDomicilios con token vigente, o None si el servicio no responde"""
+    client = get_wsd_client()
+    return client if client.ensure_token() else None
+
 
-    return WsDomicilios(
-        base_url=config.BASE_URL,
-        windows_user=config.WINDOWS_USER,
-        windows_password=config.WINDOWS_PASSWORD
-    )
+def _wsd_unavailable():
+    return JsonResponse({
+        'success': False,
+        'error': 'No se pudo conectar al servicio'
+    })
 
 def consulta_colonias(request):
     """
@@ -2353,7 +2081,7 @@ def consulta_colonias(request):
     try:
         client = get_wsd_client()
 
-        if not client.get_token(client.windows_user, client.windows_password):
+        if not client.ensure_token():
             messages.error(request, "No se pudo conectar al servicio de domicilios.")
             return redirect('home')
 
@@ -2382,17 +2110,10 @@ def get_calles(request):
         #body = json.loads(request.body)
         data = json.loads(request.body)
 
-        client = get_wsd_client()
-        if not client.get_token(client.windows_user, client.windows_password):
-            return JsonResponse({
-                'success': False,
-                'error': 'No se pudo conectar al servicio'
-            })
-
-        # Búsqueda de colonias
+        # Búsqueda de colonias en el catálogo local (sin consultar el servicio)
         if 'search_colonia' in data:
             query = data['search_colonia']
-            colonias = client.search_colonia(query)
+            colonias = colonia_index.search(query)
 
             logger.debug(f"query: {query}")
             logger.debug(f"Colonias: {len(colonias) if colonias else 0}")
@@ -2410,6 +2131,8 @@ def get_calles(request):
                 'total': len(colonias) if colonias else 0
             })
 
+        # Calles, números y CP salen de las tablas locales (sync_address_catalog);
+        # el servicio solo se consulta si la colonia aún no está sincronizada
         #Búsqueda por CP
         if 'search_cp' in data:
             cp = data['search_cp'].strip()
@@ -2420,7 +2143,12 @@ def get_calles(request):
                     'error': 'El código postal debe ser un número de 5 dígitos'
                 })
 
-            colonias = client.search_colonia_by_cp(cp)
+            colonias = local_colonias_by_cp(cp)
+            if colonias is None:
+                client = _wsd_client_with_token()
+                if client is None:
+                    return _wsd_unavailable()
+                colonias = client.search_colonia_by_cp(cp)
 
             logger.debug(f"Búsqueda por cp {cp}")
             logger.debug(f"Volonias encontradas: {len(colonias) if colonias else 0}")
@@ -2441,7 +2169,12 @@ def get_calles(request):
         if 'id_colonia' in data and 'search_calle' in data:
             id_colonia = int(data['id_colonia'])
             query = data['search_calle']
-            calles = client.search_calle(id_colonia, query)
+            calles = local_calles(id_colonia, query)
+            if calles is None:
+                client = _wsd_client_with_token()
+                if client is None:
+                    return _wsd_unavailable()
+                calles = client.search_calle(id_colonia, query)
 
             calles_formateadas = [{
                 'id': c.get('id_calle'),
@@ -2458,7 +2191,12 @@ def get_calles(request):
         if 'id_colonia' in data and 'id_calle' in data:
             id_colonia = int(data['id_colonia'])
             id_calle = int(data['id_calle'])
-            numeros = client.get_ext_num(id_colonia, id_calle)
+            numeros = local_numeros(id_colonia, id_calle)
+            if numeros is None:
+                client = _wsd_client_with_token()
+                if client is None:
+                    return _wsd_unavailable()
+                numeros = client.get_ext_num(id_colonia, id_calle) or []
 
             numeros_formateados = [{
                 'numero': n.get('numero', '')
@@ -2498,12 +2236,6 @@ def domicilios(request):
           modals/buscar_direccion.html
       """
     try:
-        client = get_wsd_client()
-
-        if not client.get_token(client.windows_user, client.windows_password):
-            messages.error(request, "No se pudo conectar al sercivio")
-            return redirect('home')
-
         nombre_colonia = request.POST.get('colonia', '').strip()
         nombre_calle = request.POST.get('calle', '').strip()
         id_colonia = request.POST.get('id_colonia')
@@ -2513,21 +2245,26 @@ def domicilios(request):
 
         #Buscar colonias
         if nombre_colonia:
-            resultados['colonias'] = client.search_colonia(nombre_colonia)
+            resultados['colonias'] = colonia_index.search(nombre_colonia)
 
-        # Buscar calles
+        # Buscar calles (catálogo local; el servicio solo si la colonia no está sincronizada)
         if id_colonia and nombre_calle:
-            resultados['calles'] = client.search_calle(
-                int(id_colonia),
-                nombre_calle
-            )
+            resultados['calles'] = local_calles(int(id_colonia), nombre_calle)
 
         # Obtener números de calle
         if id_colonia and id_calle:
-            resultados['numeros'] = client.get_ext_num(
-                int(id_colonia),
-                int(id_calle)
-            )
+            resultados['numeros'] = local_numeros(int(id_colonia), int(id_calle))
+
+        if None in (resultados.get('calles', []), resultados.get('numeros', [])):
+            client = _wsd_client_with_token()
+            if client is None:
+                messages.error(request, "No se pudo conectar al sercivio")
+                return redirect('home')
+
+            if resultados.get('calles', []) is None:
+                resultados['calles'] = client.search_calle(int(id_colonia), nombre_calle)
+            if resultados.get('numeros', []) is None:
+                resultados['numeros'] = client.get_ext_num(int(id_colonia), int(id_calle))
 
         context = {
             'resultados': resultados,
@@ -2590,6 +2327,8 @@ def gen_render(request):
             logger.info("Formulario de PP válido, guardando datos")
             instance = form.save(commit=False)
             instance.fuuid = uuid_obj  # Asegurar que el fuuid esté asignado
+            if not instance.folio:
+                instance.folio = allocate_pp_folio(uuid_obj.uuid)
             instance.save()
 
             # Redireccionar según categoría